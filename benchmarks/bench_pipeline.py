@@ -0,0 +1,259 @@
+"""
+Stage-level benchmark on synthetic documents.
+
+Generates captures with known page corners (see synthetic.py), runs every
+DocumentProcessor stage on them and reports per-stage throughput, peak
+memory and corner error. Fully offline; run from the repository root:
+
+    python -m benchmarks.bench_pipeline --sizes 1600x1200,4000x3000 --count 3 --output bench.json
+    python -m benchmarks.bench_pipeline --compare bench.json          # compare a new run
+
+The JSON output is meant to be diffed between revisions (--compare).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processor import DocumentProcessor
+from src.rectify import order_points
+from benchmarks.synthetic import make_document, BACKGROUNDS
+
+
+def measure(func, *args, **kwargs):
+    """
+    Runs func once; returns (result, seconds, peak MB of Python/NumPy allocations).
+    OpenCV's internal scratch memory is not visible to tracemalloc, so the peak
+    is a lower bound; the process-wide max RSS is reported separately.
+    """
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - base
+    return result, seconds, peak / (1024 * 1024)
+
+
+def corner_error(found, truth):
+    found = order_points(np.asarray(found, dtype=np.float32).reshape(4, 2))
+    truth = order_points(np.asarray(truth, dtype=np.float32).reshape(4, 2))
+    return np.linalg.norm(found - truth, axis=1)
+
+
+def max_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024.0 if platform.system() != "Darwin" else rss / (1024.0 * 1024.0)
+    except ImportError:
+        return None
+
+
+def run_case(processor, path, truth, modes):
+    """
+    Times each stage on one capture. Returns {stage: (seconds, peak_mb, megapixels)}
+    plus detection info and corner errors.
+    """
+    stages = {}
+
+    source, t, mem = measure(processor.open_image, path)
+    (working, sx, sy), t2, mem2 = measure(source.working_image, processor.DETECT_HEIGHT)
+    stages["decode_reduced"] = (t + t2, max(mem, mem2), working.shape[0] * working.shape[1] / 1e6)
+
+    (corners, info), t, mem = measure(processor.detect, source)
+    stages["detect"] = (t, mem, working.shape[0] * working.shape[1] / 1e6)
+    coarse_error = corner_error(corners, truth)
+
+    img, t, mem = measure(source.full)
+    mp = img.shape[0] * img.shape[1] / 1e6
+    stages["decode_full"] = (t, mem, mp)
+
+    refined, t, mem = measure(processor.refine, img, corners)
+    stages["refine"] = (t, mem, mp)
+    refined_error = corner_error(refined, truth)
+
+    for mode in modes:
+        warped, t, mem = measure(processor.rectify, img, refined)
+        out_mp = warped.shape[0] * warped.shape[1] / 1e6
+        stages["rectify"] = (t, mem, out_mp)
+
+        _, t, mem = measure(processor.enhance, warped, mode)
+        stages[f"enhance_{mode}"] = (t, mem, out_mp)
+
+        final, t, mem = measure(processor.rectify_enhance, img, refined, mode)
+        stages[f"rectify_enhance_{mode}"] = (t, mem, out_mp)
+
+        ext = ".png" if mode == "scan" else ".jpg"
+        _, t, mem = measure(cv2.imencode, ext, final)
+        stages[f"encode_{mode}"] = (t, mem, out_mp)
+
+    return {
+        "stages": stages,
+        "detector": info["detector"],
+        "method": info["method"],
+        "confidence": info["confidence"],
+        "corner_error_px": coarse_error.tolist(),
+        "refined_error_px": refined_error.tolist(),
+    }
+
+
+def summarise(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+def run(args):
+    sizes = [tuple(int(v) for v in s.lower().split("x")) for s in args.sizes.split(",")]
+    backgrounds = args.backgrounds.split(",")
+    modes = args.modes.split(",")
+    for bg in backgrounds:
+        if bg not in BACKGROUNDS:
+            raise SystemExit(f"Unknown background {bg}; choose from {', '.join(BACKGROUNDS)}")
+
+    processor = DocumentProcessor(detector=args.detector)
+    tracemalloc.start()
+
+    cases = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm-up: first calls pay for OpenCV's lazy initialisation
+        image, truth = make_document(800, 600, "plain", seed=args.seed)
+        path = os.path.join(tmp, "warmup.jpg")
+        cv2.imwrite(path, image)
+        run_case(processor, path, truth, modes)
+
+        for width, height in sizes:
+            for bg in backgrounds:
+                for i in range(args.count):
+                    seed = args.seed + i
+                    image, truth = make_document(width, height, bg, seed=seed)
+                    path = os.path.join(tmp, f"{width}x{height}_{bg}_{seed}.jpg")
+                    cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+                    del image
+
+                    result = run_case(processor, path, truth, modes)
+                    result.update({"size": f"{width}x{height}", "background": bg, "seed": seed})
+                    cases.append(result)
+                    print(f"{width}x{height} {bg:<9} seed={seed}: {result['detector']}/{result['method']} "
+                          f"error {max(result['corner_error_px']):.1f}px -> {max(result['refined_error_px']):.1f}px",
+                          file=sys.stderr)
+
+    tracemalloc.stop()
+
+    # Aggregate per size and stage
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "cv2_threads": cv2.getNumThreads(),
+            "detector": args.detector,
+            "args": vars(args),
+        },
+        "stages": {},
+        "accuracy": {},
+        "max_rss_mb": max_rss_mb(),
+        "cases": cases,
+    }
+
+    for size in sorted({c["size"] for c in cases}):
+        size_cases = [c for c in cases if c["size"] == size]
+        stage_names = size_cases[0]["stages"].keys()
+        report["stages"][size] = {}
+        for name in stage_names:
+            secs = [c["stages"][name][0] for c in size_cases]
+            peaks = [c["stages"][name][1] for c in size_cases]
+            mps = [c["stages"][name][2] for c in size_cases]
+            report["stages"][size][name] = {
+                "ms": {k: v * 1000 for k, v in summarise(secs).items()},
+                "mp_per_s": float(np.sum(mps) / np.sum(secs)) if np.sum(secs) > 0 else None,
+                "peak_mb": float(np.max(peaks)),
+            }
+
+    for bg in backgrounds:
+        bg_cases = [c for c in cases if c["background"] == bg]
+        methods = {}
+        for c in bg_cases:
+            key = f"{c['detector']}/{c['method']}"
+            methods[key] = methods.get(key, 0) + 1
+        report["accuracy"][bg] = {
+            "corner_error_px": summarise([e for c in bg_cases for e in c["corner_error_px"]]),
+            "refined_error_px": summarise([e for c in bg_cases for e in c["refined_error_px"]]),
+            "methods": methods,
+        }
+
+    # Stage results keep (seconds, MB, MP) tuples per case; make them readable
+    for c in cases:
+        c["stages"] = {k: {"ms": v[0] * 1000, "peak_mb": v[1], "mp": v[2]} for k, v in c["stages"].items()}
+    return report
+
+
+def print_report(report, baseline=None):
+    for size, stages in report["stages"].items():
+        print(f"\n== {size} ==")
+        print(f"{'stage':<26}{'mean ms':>10}{'p95 ms':>10}{'MP/s':>10}{'peak MB':>10}" + ("   vs base" if baseline else ""))
+        for name, s in stages.items():
+            line = f"{name:<26}{s['ms']['mean']:>10.1f}{s['ms']['p95']:>10.1f}" \
+                   f"{(s['mp_per_s'] or 0):>10.1f}{s['peak_mb']:>10.1f}"
+            base = baseline["stages"].get(size, {}).get(name) if baseline else None
+            if base:
+                delta = (s["ms"]["mean"] / base["ms"]["mean"] - 1) * 100 if base["ms"]["mean"] else 0
+                line += f"   {delta:+6.1f}%"
+            print(line)
+
+    print("\n== accuracy (corner error, px) ==")
+    for bg, acc in report["accuracy"].items():
+        line = f"{bg:<10} coarse mean {acc['corner_error_px']['mean']:6.1f} max {acc['corner_error_px']['max']:6.1f} | " \
+               f"refined mean {acc['refined_error_px']['mean']:6.1f} max {acc['refined_error_px']['max']:6.1f} | {acc['methods']}"
+        base = baseline["accuracy"].get(bg) if baseline else None
+        if base:
+            line += f" | base coarse mean {base['corner_error_px']['mean']:.1f}"
+        print(line)
+    if report.get("max_rss_mb"):
+        print(f"\nmax RSS: {report['max_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocAUG synthetic stage benchmark")
+    parser.add_argument("--sizes", default="1600x1200,4000x3000", help="Comma-separated WxH capture sizes")
+    parser.add_argument("--backgrounds", default=",".join(BACKGROUNDS), help="Comma-separated backgrounds")
+    parser.add_argument("--modes", default="scan,color", help="Enhancement modes to time")
+    parser.add_argument("--count", type=int, default=3, help="Captures per size and background")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--detector", default="cascade", choices=["cascade", "fast", "watershed"])
+    parser.add_argument("--output", "-o", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+CPU split benchmark: throughput and tail latency of a warm process pool for
+different workers x OpenCV-threads splits of the same cores (src.resources).
+
+    python -m benchmarks.bench_resources --size 2400x1800 --count 48 --output splits.json
+    python -m benchmarks.bench_resources --splits 1x4,2x2,4x1,4x4 --affinity
+
+Each split gets a fresh pool, warmed before timing. Requests are kept
+in flight at 2 per worker (like run_combined), so latency includes queueing:
+p50/p95/p99 of submit-to-result time, next to the in-worker service time.
+"4x4" on 4 cores is the oversubscribed layout a pool of processors had before
+the resource plan (every worker running OpenCV on all cores).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import batch
+from src.resources import ResourcePlan, available_cores
+from benchmarks.synthetic import make_document, BACKGROUNDS
+
+
+def default_splits(cores):
+    """
+    Every workers x threads split that uses all cores, plus the oversubscribed one.
+    """
+    splits = [(w, cores // w) for w in range(1, cores + 1) if cores % w == 0]
+    if cores > 1:
+        splits.append((cores, cores))
+    return splits
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=np.float64) * 1000
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+            "p99": float(np.percentile(values, 99)), "max": float(values.max())}
+
+
+def _init_quiet(*initargs):
+    # The processor prints a line per saved image; keep the table readable
+    sys.stdout = open(os.devnull, "w")
+    batch._init_worker(*initargs)
+
+
+def _warm():
+    batch._worker_processor.detect(np.full((600, 800, 3), 128, np.uint8))
+    return os.getpid()
+
+
+def run_split(paths, out_dir, plan, enhance_mode, detector):
+    """
+    Runs every path through a warm pool laid out by plan.
+    Returns (wall seconds, end-to-end latencies, service times, failures).
+    """
+    options = {"detector": detector, "activity_log": None}
+    with ProcessPoolExecutor(max_workers=plan.workers, initializer=_init_quiet,
+                             initargs=("cpu", options, False, plan, plan.counter())) as pool:
+        for future in [pool.submit(_warm) for _ in range(plan.workers)]:
+            future.result()
+
+        latencies, service, failed = [], [], 0
+        pending = {}
+        queue = list(paths)
+        window = 2 * plan.workers
+        start = time.perf_counter()
+        while queue or pending:
+            while queue and len(pending) < window:
+                path = queue.pop(0)
+                out = os.path.join(out_dir, os.path.basename(path))
+                pending[pool.submit(batch._process_one, path, out, enhance_mode)] = time.perf_counter()
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in done:
+                latencies.append(now - pending.pop(future))
+                result = future.result()
+                service.append(result["seconds"])
+                failed += result["status"] != "ok"
+        wall = time.perf_counter() - start
+    return wall, latencies, service, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocAUG workers x threads benchmark")
+    parser.add_argument("--cores", type=int, default=None, help="Core budget (default: all available)")
+    parser.add_argument("--splits", type=str, default=None,
+                        help="Comma-separated WORKERSxTHREADS, e.g. 1x4,2x2,4x1 (default: all splits of --cores)")
+    parser.add_argument("--affinity", action="store_true", help="Pin workers to cores")
+    parser.add_argument("--size", type=str, default="2400x1800", help="Capture size WxH")
+    parser.add_argument("--count", type=int, default=32, help="Images per split")
+    parser.add_argument("--background", type=str, default="wood", choices=BACKGROUNDS)
+    parser.add_argument("--enhance", type=str, default="scan", choices=["scan", "color", "original"])
+    parser.add_argument("--detector", type=str, default="cascade", choices=["cascade", "fast", "watershed"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    cores = args.cores or available_cores()
+    if args.splits:
+        splits = [tuple(int(v) for v in s.lower().split("x")) for s in args.splits.split(",")]
+    else:
+        splits = default_splits(cores)
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "cores": cores,
+            "args": vars(args),
+        },
+        "splits": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.count):
+            image, _ = make_document(width, height, args.background, seed=args.seed + i)
+            path = os.path.join(tmp, f"doc_{i:03d}.jpg")
+            cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+            paths.append(path)
+        out_dir = os.path.join(tmp, "out")
+        os.makedirs(out_dir)
+
+        print(f"{'split':>7} {'img/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'service p50':>12} "
+              f"{'service p99':>12}")
+        for workers, threads in splits:
+            plan = ResourcePlan(cores=cores, workers=workers, threads=threads, affinity=args.affinity)
+            wall, latencies, service, failed = run_split(paths, out_dir, plan, args.enhance, args.detector)
+            latency, service_ms = percentiles(latencies), percentiles(service)
+            name = f"{workers}x{threads}"
+            report["splits"][name] = {
+                "workers": workers,
+                "threads": threads,
+                "oversubscription": round(workers * threads / cores, 2),
+                "throughput": len(paths) / wall,
+                "latency_ms": latency,
+                "service_ms": service_ms,
+                "failed": failed,
+            }
+            print(f"{name:>7} {len(paths) / wall:7.2f} {latency['p50']:8.0f} {latency['p95']:8.0f} "
+                  f"{latency['p99']:8.0f} {service_ms['p50']:12.0f} {service_ms['p99']:12.0f}"
+                  + (f"  ({failed} failed)" if failed else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
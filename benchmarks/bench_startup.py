@@ -0,0 +1,131 @@
+"""
+Startup-time benchmark: each scenario runs in a fresh interpreter, so imports,
+DocumentProcessor construction and discovery are measured as a user sees them.
+
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+    python -m benchmarks.bench_startup --compare startup.json --max-regression 20
+
+Exits with status 1 if a scenario exceeds its --budget or regresses more than
+--max-regression percent against --compare, so it can gate CI.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> python arguments (run from the repository root)
+SCENARIOS = {
+    "interpreter": ["-c", "pass"],
+    "import_processor": ["-c", "import src.processor"],
+    "construct_processor": ["-c", "from src.processor import DocumentProcessor; DocumentProcessor()"],
+    "cli_help": ["main.py", "--help"],
+    "import_gui": ["-c", "import gui"],
+    "first_detect": ["-c", "import numpy as np; from src.processor import DocumentProcessor; "
+                           "DocumentProcessor().detect(np.full((600, 800, 3), 128, np.uint8))"],
+}
+
+
+def time_scenario(args, runs, env):
+    """
+    Wall time in ms of each of 'runs' fresh interpreter invocations.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable] + args, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed: {proc.stderr.decode(errors='replace')[-500:]}")
+        times.append(elapsed)
+    return times
+
+
+def parse_budgets(items):
+    budgets = {}
+    for item in items or []:
+        name, _, ms = item.partition("=")
+        budgets[name] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocAUG startup-time benchmark")
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreter runs per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios")
+    parser.add_argument("--output", "-o", default=None, help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Fail if a scenario's median is this many percent slower than the baseline")
+    parser.add_argument("--budget", action="append", metavar="NAME=MS",
+                        help="Fail if the scenario's median exceeds MS (repeatable)")
+    args = parser.parse_args()
+
+    # Private discovery cache, so results do not depend on the user's cache state
+    cache = tempfile.mkdtemp(prefix="docaug-startup-")
+    env = dict(os.environ, DOCAUG_CACHE_DIR=cache)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "runs": args.runs,
+        },
+        "scenarios": {},
+    }
+    names = [n for n in args.scenarios.split(",") if n]
+    try:
+        for name in names:
+            if name not in SCENARIOS:
+                raise SystemExit(f"Unknown scenario {name}; choose from {', '.join(SCENARIOS)}")
+            # One untimed run fills the OS file cache and the discovery cache
+            time_scenario(SCENARIOS[name], 1, env)
+            times = sorted(time_scenario(SCENARIOS[name], args.runs, env))
+            report["scenarios"][name] = {
+                "median_ms": times[len(times) // 2],
+                "min_ms": times[0],
+                "max_ms": times[-1],
+            }
+    finally:
+        shutil.rmtree(cache, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    budgets = parse_budgets(args.budget)
+    failures = []
+    print(f"{'scenario':<22}{'median ms':>11}{'min ms':>9}{'max ms':>9}" + ("   vs base" if baseline else ""))
+    for name, s in report["scenarios"].items():
+        line = f"{name:<22}{s['median_ms']:>11.1f}{s['min_ms']:>9.1f}{s['max_ms']:>9.1f}"
+        base = baseline["scenarios"].get(name) if baseline else None
+        if base:
+            delta = (s["median_ms"] / base["median_ms"] - 1) * 100
+            line += f"   {delta:+6.1f}%"
+            if args.max_regression is not None and delta > args.max_regression:
+                failures.append(f"{name}: {delta:+.1f}% vs baseline")
+        if name in budgets and s["median_ms"] > budgets[name]:
+            failures.append(f"{name}: {s['median_ms']:.1f}ms > budget {budgets[name]:.0f}ms")
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if failures:
+        print("\nStartup regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Orientation regression check: runs the native estimator on the repository's
+sample photo (rectified first) and on synthetic pages, each at 0/90/180/270
+degrees, and counts answers that are wrong but confident enough to be used
+without Tesseract (confidence >= --threshold).
+
+    python -m benchmarks.check_orientation
+    python -m benchmarks.check_orientation --count 20 --threshold 0.5
+
+Exits with status 1 on any confident wrong answer, so it can gate CI.
+"""
+import os
+import sys
+import glob
+import argparse
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.processor import DocumentProcessor
+from src.orientation import estimate_orientation
+from benchmarks.synthetic import render_page
+
+# Rotation applied to the upright page -> the correction the estimator must report
+ROTATIONS = {0: None, 90: cv2.ROTATE_90_COUNTERCLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_CLOCKWISE}
+
+
+def check_page(name, page, threshold):
+    """
+    Returns the number of confident wrong answers over the four rotations.
+    """
+    errors = 0
+    cells = []
+    for expected, code in ROTATIONS.items():
+        result = estimate_orientation(page if code is None else cv2.rotate(page, code))
+        wrong = result["rotate"] != expected
+        confident = result["confidence"] >= threshold
+        errors += wrong and confident
+        mark = "FAIL" if wrong and confident else ("low" if wrong else "ok")
+        cells.append(f"{expected:>3}->{result['rotate']:>3} @{result['confidence']:.2f} {mark:<4}")
+    print(f"{name:<10} " + "  ".join(cells))
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocAUG orientation regression check")
+    parser.add_argument("--count", type=int, default=8, help="Synthetic pages")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="Confidence at which the native answer is used (orientation_threshold)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    errors = 0
+    samples = sorted(glob.glob(os.path.join(ROOT, "*.jpeg")) + glob.glob(os.path.join(ROOT, "*.jpg")))
+    if samples:
+        processor = DocumentProcessor(activity_log=None)
+        for i, path in enumerate(samples):
+            page, _ = processor.render(path, enhance_mode="original")
+            errors += check_page(f"sample{i}", page, args.threshold)
+    for i in range(args.count):
+        page = render_page(1240, 1754, np.random.default_rng(args.seed + i))
+        errors += check_page(f"synth{args.seed + i}", page, args.threshold)
+
+    print(f"{errors} confident wrong answer(s)")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
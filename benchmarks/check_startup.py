@@ -0,0 +1,110 @@
+"""
+Startup check: starts the HTTP server and the hot-folder watcher with each
+option set that changes what their warm-up runs (pre-flight gate, result
+cache), then sends one synthetic document through each. Warm-up must not
+leave entries in the result cache.
+
+    python -m benchmarks.check_startup
+
+Exits with status 1 if either fails to start or to process the document,
+so it can gate CI.
+"""
+import os
+import sys
+import asyncio
+import tempfile
+import urllib.request
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.resources import ResourcePlan
+from src.server import DocumentServer
+from src.watch import HotFolder
+from benchmarks.synthetic import make_document
+
+# name -> options for a run in the temp directory tmp
+CONFIGS = {
+    "default": lambda tmp: {},
+    "preflight": lambda tmp: {"preflight": {}},
+    "cache": lambda tmp: {"result_cache": os.path.join(tmp, "cache")},
+}
+
+
+def _post(url, data):
+    request = urllib.request.Request(url, data=data, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _cache_entries(options):
+    directory = options.get("result_cache")
+    if not directory:
+        return 0
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+
+async def _serve_once(options, data):
+    server = DocumentServer(port=0, options=dict(options, activity_log=None), resources=ResourcePlan(workers=1))
+    await server.start()
+    try:
+        if _cache_entries(options):
+            return "warm-up wrote to the result cache"
+        url = f"http://{server.host}:{server.port}/process?enhance=scan&format=png"
+        return await asyncio.get_running_loop().run_in_executor(None, _post, url, data)
+    finally:
+        server.close()
+
+
+def check_server(options, data):
+    status = asyncio.run(_serve_once(options, data))
+    if isinstance(status, str):
+        return False, status
+    # 422 is a pre-flight rejection: the gate ran, which is all startup has to show
+    return status in (200, 422), f"HTTP {status}"
+
+
+def check_watch(options, image, tmp):
+    in_dir, out_dir = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+    os.makedirs(in_dir)
+    cv2.imwrite(os.path.join(in_dir, "doc.jpg"), image, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    watcher = HotFolder(in_dir, out_dir, options=dict(options, activity_log=None), settle=0, interval=0.1,
+                        resources=ResourcePlan(workers=1))
+    watcher.start()
+    try:
+        if _cache_entries(options):
+            return False, "warm-up wrote to the result cache"
+        while watcher.poll(timeout=watcher.interval):
+            pass
+    finally:
+        watcher.close()
+    return watcher.processed + watcher.failed == 1, f"{watcher.processed} processed, {watcher.failed} failed"
+
+
+def main():
+    image, _ = make_document(1200, 900, "wood", seed=0)
+    data = cv2.imencode(".jpg", image)[1].tobytes()
+    errors = 0
+    for name, make_options in CONFIGS.items():
+        for target in ("serve", "watch"):
+            try:
+                with tempfile.TemporaryDirectory() as tmp:
+                    options = make_options(tmp)
+                    if target == "serve":
+                        ok, detail = check_server(options, data)
+                    else:
+                        ok, detail = check_watch(options, image, tmp)
+            except Exception as e:
+                ok, detail = False, f"{type(e).__name__}: {e}"
+            errors += not ok
+            print(f"{name:<10} {target:<6} {'ok' if ok else 'FAIL':<5} {detail}")
+    print(f"{errors} failed startup(s)")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
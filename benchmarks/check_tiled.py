@@ -0,0 +1,60 @@
+"""
+Tiled-path parity check: rectify_enhance_tiled (memory-bounded strips, used
+with --memory-mb) against enhance(four_point_transform(...)) on synthetic
+captures, for every mode, in one strip and in many small ones.
+
+    python -m benchmarks.check_tiled
+    python -m benchmarks.check_tiled --count 8 --tolerance 0.01
+
+Exits with status 1 if the mean absolute difference of any output exceeds
+--tolerance, so it can gate CI. In one strip the tiled result is bit-exact;
+small strips differ by warp rounding at the strip edges (mean ~0.001).
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.enhance import enhance_scan, enhance_magic_color
+from src.rectify import four_point_transform
+from src.tiled import rectify_enhance_tiled
+from benchmarks.synthetic import make_document
+
+ENHANCE = {"scan": enhance_scan, "color": enhance_magic_color, "original": lambda image: image}
+
+# Capture sizes: page sides that are and are not multiples of the CLAHE grid
+SIZES = ((1200, 900), (1203, 917), (1600, 1200), (2481, 3507))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocAUG tiled-path parity check")
+    parser.add_argument("--count", type=int, default=len(SIZES), help="Synthetic captures")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Largest allowed mean absolute difference")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    errors = 0
+    for i in range(args.count):
+        width, height = SIZES[i % len(SIZES)]
+        image, quad = make_document(width, height, "wood", seed=args.seed + i)
+        warped = four_point_transform(image, quad)
+        cells = []
+        for mode, enhance in ENHANCE.items():
+            reference = enhance(warped.copy())
+            for memory_mb in (256, 4):
+                tiled = rectify_enhance_tiled(image, quad, mode, memory_mb=memory_mb)
+                diff = np.abs(tiled.astype(np.int16) - reference.astype(np.int16))
+                failed = diff.mean() > args.tolerance
+                errors += failed
+                cells.append(f"{mode}/{memory_mb}MB {diff.mean():.4f} (max {diff.max()}){' FAIL' if failed else ''}")
+        print(f"{width}x{height} seed {args.seed + i}: " + "  ".join(cells))
+
+    print(f"{errors} output(s) over tolerance")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
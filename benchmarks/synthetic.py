@@ -0,0 +1,140 @@
+"""
+Procedural test documents with known ground truth.
+
+A text page is rendered, warped by a random (but seeded) homography onto a
+textured or cluttered background, and the true page corners are returned.
+"""
+import cv2
+import numpy as np
+
+BACKGROUNDS = ("plain", "wood", "cluttered")
+
+_WORDS = ("invoice total amount date customer account number payment due "
+          "reference order item quantity price tax balance signature page "
+          "document scanner receipt address phone email summary notes").split()
+
+
+def render_page(width, height, rng):
+    """
+    White page with a title, paragraphs of pseudo text and a table.
+    """
+    page = np.full((height, width, 3), 242, np.uint8)
+    page += rng.integers(0, 8, (1, 1, 3), dtype=np.uint8)  # Paper tint
+
+    scale = width / 1000.0
+    margin = int(70 * scale)
+    line_h = int(34 * scale)
+    thickness = max(1, int(round(1.6 * scale)))
+
+    y = margin + int(40 * scale)
+    cv2.putText(page, "DOCUMENT %d" % rng.integers(1000, 9999), (margin, y),
+                cv2.FONT_HERSHEY_DUPLEX, 1.4 * scale, (20, 20, 20), thickness + 1, cv2.LINE_AA)
+    y += 2 * line_h
+
+    table_rows = int(rng.integers(3, 7))
+    while y < height - margin:
+        if table_rows and rng.random() < 0.08:
+            # A small ruled table
+            rows, cols = table_rows, 4
+            x0, x1 = margin, width - margin
+            cell_h = line_h
+            for r in range(rows + 1):
+                cv2.line(page, (x0, y + r * cell_h), (x1, y + r * cell_h), (40, 40, 40), thickness)
+            for c in range(cols + 1):
+                x = x0 + c * (x1 - x0) // cols
+                cv2.line(page, (x, y), (x, y + rows * cell_h), (40, 40, 40), thickness)
+            y += (rows + 1) * cell_h
+            table_rows = 0
+            continue
+
+        words = rng.choice(_WORDS, size=int(rng.integers(4, 10)))
+        text = " ".join(words)
+        cv2.putText(page, text, (margin, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.9 * scale, (25, 25, 25), thickness, cv2.LINE_AA)
+        y += line_h if rng.random() > 0.15 else 2 * line_h
+
+    return page
+
+
+def render_background(width, height, kind, rng):
+    if kind == "plain":
+        base = rng.integers(60, 140)
+        bg = np.full((height, width, 3), base, np.uint8)
+        noise = rng.normal(0, 4, (height // 4 + 1, width // 4 + 1, 3)).astype(np.float32)
+        noise = cv2.resize(noise, (width, height))
+        return np.clip(bg + noise, 0, 255).astype(np.uint8)
+
+    if kind == "wood":
+        xs = np.linspace(0, 40 * np.pi, width, dtype=np.float32)
+        ys = np.linspace(0, 3 * np.pi, height, dtype=np.float32)[:, None]
+        grain = np.sin(xs + 2 * np.sin(ys + xs / 15.0)) * 18
+        bg = np.stack([70 + grain, 100 + grain, 140 + grain], axis=2)
+        bg += rng.normal(0, 5, bg.shape).astype(np.float32)
+        return np.clip(bg, 0, 255).astype(np.uint8)
+
+    if kind == "cluttered":
+        bg = render_background(width, height, "plain", rng)
+        for _ in range(40):
+            color = tuple(int(v) for v in rng.integers(0, 255, 3))
+            if rng.random() < 0.5:
+                p0 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+                p1 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+                cv2.line(bg, p0, p1, color, int(rng.integers(2, max(3, width // 150))))
+            else:
+                center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+                axes = (int(rng.integers(10, width // 8)), int(rng.integers(10, height // 8)))
+                cv2.ellipse(bg, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+        return bg
+
+    raise ValueError(f"Unknown background: {kind}")
+
+
+def random_quad(width, height, rng, fill=(0.35, 0.7)):
+    """
+    Page corners (tl, tr, br, bl) for a perspective view covering 'fill' of the frame.
+    """
+    area = rng.uniform(*fill)
+    page_aspect = 1.414  # A4
+    ph = np.sqrt(area * width * height * page_aspect)
+    pw = ph / page_aspect
+    ph, pw = min(ph, 0.9 * height), min(pw, 0.9 * width)
+
+    cx = width / 2 + rng.uniform(-0.08, 0.08) * width
+    cy = height / 2 + rng.uniform(-0.08, 0.08) * height
+    angle = np.radians(rng.uniform(-15, 15))
+    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+
+    quad = np.array([[-pw / 2, -ph / 2], [pw / 2, -ph / 2], [pw / 2, ph / 2], [-pw / 2, ph / 2]])
+    # Keystone: shrink the top edge as if photographed at an angle
+    keystone = rng.uniform(0.0, 0.12)
+    quad[:2, 0] *= (1 - keystone)
+    quad += rng.normal(0, 0.01 * pw, quad.shape)
+    quad = quad @ rot.T + [cx, cy]
+
+    quad[:, 0] = np.clip(quad[:, 0], 2, width - 3)
+    quad[:, 1] = np.clip(quad[:, 1], 2, height - 3)
+    return quad.astype(np.float32)
+
+
+def make_document(width, height, background="plain", seed=0):
+    """
+    Returns (image, corners): a BGR capture of size width x height and the true
+    page corners (tl, tr, br, bl) in image coordinates.
+    """
+    rng = np.random.default_rng(seed)
+    corners = random_quad(width, height, rng)
+
+    page_w = int(np.linalg.norm(corners[1] - corners[0]))
+    page_h = int(np.linalg.norm(corners[3] - corners[0]))
+    page = render_page(max(page_w, 200), max(page_h, 280), rng)
+
+    image = render_background(width, height, background, rng)
+    src = np.array([[0, 0], [page.shape[1], 0], [page.shape[1], page.shape[0]], [0, page.shape[0]]], np.float32)
+    M = cv2.getPerspectiveTransform(src, corners)
+    cv2.warpPerspective(page, M, (width, height), dst=image, borderMode=cv2.BORDER_TRANSPARENT)
+
+    # Uneven lighting
+    gx = np.linspace(rng.uniform(0.8, 1.0), rng.uniform(0.9, 1.1), width, dtype=np.float32)
+    gy = np.linspace(rng.uniform(0.85, 1.0), rng.uniform(0.9, 1.05), height, dtype=np.float32)[:, None]
+    image = np.clip(image * (gx * gy)[:, :, None], 0, 255).astype(np.uint8)
+    return image, corners
@@ -1,10 +1,9 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
-from src.processor import DocumentProcessor
 import threading
+import logging
+# OpenCV, PIL and the processor are imported on first use so the window shows
+# immediately; _warm_up loads them in the background right after.
 
 class DocAugApp:
     def __init__(self, root):
@@ -13,14 +12,40 @@ class DocAugApp:
         self.root.geometry("1000x800")
         self.root.configure(bg="#2E2E2E")
 
-        self.processor = DocumentProcessor(mode='auto')
+        self._processor = None
+        self._processor_lock = threading.Lock()
         
         self.current_image = None
+        self.session = None # Cached corners / warp / results for the loaded image
         self.current_image_path = None # Track path for logging
         self.processed_image = None
+        self.rendering = False # Preview shown, full-resolution result still computing
+
+        # One background worker; newer requests replace pending ones
+        self.worker = None
+        self.orient_worker = None  # Same for auto-orient, so clicks never pile up threads
 
         self.setup_ui()
 
+        # Window first, then load the image stack without blocking it
+        self.root.after(100, lambda: threading.Thread(target=self._warm_up, daemon=True).start())
+
+    @property
+    def processor(self):
+        with self._processor_lock:
+            if self._processor is None:
+                from src.processor import DocumentProcessor
+                from src.resources import ResourcePlan
+                # One image at a time: all cores go to OpenCV (DOCAUG_CORES caps them)
+                ResourcePlan(workers=1).apply()
+                self._processor = DocumentProcessor(mode='auto')
+            return self._processor
+
+    def _warm_up(self):
+        print("DEBUG: Loading processing modules in the background...")
+        import PIL.ImageTk
+        self.processor
+
     def setup_ui(self):
         # Header
         header = tk.Frame(self.root, bg="#1E1E1E", height=60)
@@ -60,7 +85,11 @@ class DocAugApp:
                            bg="#2E2E2E", fg="white", selectcolor="#444", activebackground="#2E2E2E", activeforeground="white",
                            font=("Segoe UI", 10)).pack(side=tk.LEFT, padx=5)
 
-
+        # Progressive rendering: low-res preview first, full resolution in the background
+        self.progressive = tk.BooleanVar(value=True)
+        tk.Checkbutton(options_frame, text="Fast Preview", variable=self.progressive,
+                       bg="#2E2E2E", fg="white", selectcolor="#444", activebackground="#2E2E2E", activeforeground="white",
+                       font=("Segoe UI", 10)).pack(side=tk.LEFT, padx=15)
 
         # Main Content area
         self.content = tk.Frame(self.root, bg="#2E2E2E")
@@ -79,7 +108,10 @@ class DocAugApp:
             return
         
         try:
+            import cv2
+            from src.session import ProcessingSession
             self.current_image = cv2.imread(path)
+            self.session = ProcessingSession(self.processor, self.current_image)
             self.current_image_path = path
             self.display_image(self.current_image, self.panel_left)
             self.run_process()
@@ -88,52 +120,95 @@ class DocAugApp:
             messagebox.showerror("Error", str(e))
 
     def run_process(self):
-        if self.current_image is None:
+        if self.session is None:
             print("DEBUG: No image loaded.")
             return
         # Auto process
         self.status_loading(True)
         
-        # Run in thread
+        # Run on the background worker (replaces a pending run)
         enhance_mode = self.enhancement_mode.get()
-        threading.Thread(target=self.process_flow, args=(enhance_mode,)).start()
+        if self.worker is None:
+            from src.session import CoalescingWorker
+            self.worker = CoalescingWorker()
+        self.worker.submit(self.process_flow, self.session, enhance_mode, self.progressive.get())
 
-    def process_flow(self, enhance_mode):
+    def process_flow(self, session, enhance_mode, progressive, generation):
+        import cv2
         try:
             print(f"DEBUG: process_flow running with enhance: {enhance_mode}")
             
-            # Detect (Using new 'Smart Merged' logic)
-            pts = self.processor.detect_document(self.current_image)
+            # Detect (cached per image)
+            pts = session.corners()
             
             # Visualize detection on the original image (Left Panel)
-            debug_img = self.current_image.copy()
+            debug_img = session.image.copy()
             if pts is not None:
                 pts_int = pts.astype(int).reshape((-1, 1, 2))
                 # Use Green for the unified robust mode
                 cv2.polylines(debug_img, [pts_int], True, (0, 255, 0), 5) 
             
             # Update Left Panel with the debug image
-            self.root.after(0, lambda: self.display_image(debug_img, self.panel_left))
+            self.root.after(0, lambda: self.show_if_current(generation, debug_img, self.panel_left))
 
-            # Rectify
-            warped = self.processor.rectify(self.current_image, pts)
-            
-            # Enhance
-            self.processed_image = self.processor.enhance(warped, mode=enhance_mode)
-            print(f"DEBUG: Enhanced image shape: {self.processed_image.shape}")
+            if self.worker.is_stale(generation):
+                logging.debug("Newer request pending, skipping rectify/enhance")
+                return
+
+            if progressive and not session.has_result(enhance_mode):
+                # Proxy-resolution result first, from the detection working image
+                preview = session.preview(enhance_mode)
+                logging.debug(f"Preview shape: {preview.shape}")
+                self.root.after(0, lambda: self.show_preview(generation, preview))
+                if self.worker.is_stale(generation):
+                    return
+
+            # Rectify + Enhance at full resolution (warp cached per image, result per mode)
+            result = session.result(enhance_mode)
+            print(f"DEBUG: Enhanced image shape: {result.shape}")
             
             # Display
-            self.root.after(0, lambda: self.display_image(self.processed_image, self.panel_right))
-            self.root.after(0, lambda: self.status_loading(False))
+            self.root.after(0, lambda: self.show_result(generation, result))
             
             print("DEBUG: Processing complete.")
             
         except Exception as e:
             print(f"ERROR: {e}")
-            self.root.after(0, lambda: messagebox.showerror("Processing Error", str(e)))
-            self.root.after(0, lambda: self.status_loading(False))
+            self.root.after(0, lambda message=str(e): self.show_error(generation, message))
+
+    def show_if_current(self, generation, cv_img, label_widget):
+        # Results of superseded jobs are dropped
+        if not self.worker.is_stale(generation):
+            self.display_image(cv_img, label_widget)
+
+    def show_preview(self, generation, preview):
+        if self.worker.is_stale(generation):
+            return
+        # Not saveable: the full-resolution result replaces it when ready
+        self.processed_image = None
+        self.rendering = True
+        self.display_image(preview, self.panel_right)
+
+    def show_result(self, generation, result):
+        if self.worker.is_stale(generation):
+            return
+        self.processed_image = result
+        self.rendering = False
+        self.display_image(self.processed_image, self.panel_right)
+        self.status_loading(False)
+
+    def show_error(self, generation, message):
+        if self.worker.is_stale(generation):
+            return
+        # A preview may be on screen: nothing is rendering or saveable any more
+        self.processed_image = None
+        self.rendering = False
+        self.panel_right.config(text="Processing failed")
+        messagebox.showerror("Processing Error", message)
 
     def display_image(self, cv_img, label_widget):
+        import cv2
+        from PIL import Image, ImageTk
         # Resize to fit widget roughly
         h, w = cv_img.shape[:2]
         
@@ -160,12 +235,16 @@ class DocAugApp:
         label_widget.image = img_tk  # Keep reference
 
     def save_image(self):
+        if self.rendering:
+            messagebox.showinfo("Please wait", "The full-resolution result is still rendering.")
+            return
         if self.processed_image is None:
             messagebox.showwarning("Warning", "No processed image to save.")
             return
             
         path = filedialog.asksaveasfilename(defaultextension=".jpg", filetypes=[("JPEG", "*.jpg"), ("PNG", "*.png")])
         if path:
+            import cv2
             cv2.imwrite(path, self.processed_image)
             messagebox.showinfo("Success", f"Saved to {path}")
 
@@ -173,7 +252,15 @@ class DocAugApp:
         if is_loading:
             self.panel_right.config(text="Processing...")
         
+    def _busy_rendering(self):
+        # During a preview processed_image is None; rotating now would rotate the raw photo
+        if self.rendering:
+            messagebox.showinfo("Please wait", "The full-resolution result is still rendering.")
+        return self.rendering
+
     def auto_orient(self):
+        if self._busy_rendering():
+            return
         if self.current_image is None and self.processed_image is None:
             messagebox.showwarning("Warning", "Load an image or process one first.")
             return
@@ -182,30 +269,42 @@ class DocAugApp:
         target_img = self.processed_image if self.processed_image is not None else self.current_image
         
         self.status_loading(True)
-        # Run in thread
-        threading.Thread(target=self._run_auto_orient, args=(target_img,)).start()
+        # Run on the orientation worker (replaces a pending run)
+        if self.orient_worker is None:
+            from src.session import CoalescingWorker
+            self.orient_worker = CoalescingWorker(name="DocAUG-orient")
+        self.orient_worker.submit(self._run_auto_orient, target_img)
 
-    def _run_auto_orient(self, img):
+    def _run_auto_orient(self, img, generation):
         print("DEBUG: Running Auto-Orient...")
         try:
             rotated, was_rotated = self.processor.correct_orientation(img)
-            
-            if was_rotated:
-                print("DEBUG: Rotated.")
-                self.processed_image = rotated
-                self.root.after(0, lambda: self.display_image(self.processed_image, self.panel_right))
-                self.root.after(0, lambda: messagebox.showinfo("Orientation", "Image auto-rotated."))
-            else:
-                print("DEBUG: No rotation needed.")
-                self.root.after(0, lambda: messagebox.showinfo("Orientation", "Orientation deemed correct (0° detected)."))
-                
+            self.root.after(0, lambda: self.apply_orientation(generation, img, rotated if was_rotated else None))
         except Exception as e:
             print(f"DEBUG: Auto-Orient Error: {e}")
-            self.root.after(0, lambda: messagebox.showerror("Orientation Error", f"Failed to detect orientation.\nError: {e}"))
-            
-        self.root.after(0, lambda: self.status_loading(False))
+            self.root.after(0, lambda message=str(e): messagebox.showerror(
+                "Orientation Error", f"Failed to detect orientation.\nError: {message}"))
+            self.root.after(0, lambda: self.status_loading(False))
+
+    def apply_orientation(self, generation, source, rotated):
+        # UI thread. Dropped if auto-orient was pressed again or the image it
+        # looked at has been replaced by a newer result meanwhile
+        current = self.processed_image if self.processed_image is not None else self.current_image
+        if self.orient_worker.is_stale(generation) or self.rendering or current is not source:
+            return
+        if rotated is not None:
+            print("DEBUG: Rotated.")
+            self.processed_image = rotated
+            self.display_image(self.processed_image, self.panel_right)
+            messagebox.showinfo("Orientation", "Image auto-rotated.")
+        else:
+            print("DEBUG: No rotation needed.")
+            messagebox.showinfo("Orientation", "Orientation deemed correct (0° detected).")
+        self.status_loading(False)
 
     def manual_rotate(self, direction):
+        if self._busy_rendering():
+            return
         if self.processed_image is None:
              if self.current_image is None:
                 return
@@ -216,6 +315,7 @@ class DocAugApp:
         
         target = self.processed_image if self.processed_image is not None else self.current_image
         
+        import cv2
         if direction == 'left':
             rotated = cv2.rotate(target, cv2.ROTATE_90_COUNTERCLOCKWISE)
         else:
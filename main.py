@@ -1,10 +1,11 @@
 import argparse
 import logging
+import multiprocessing
 import sys
 import os
-from src.processor import DocumentProcessor
 
 def setup_logging():
+    os.makedirs("logs", exist_ok=True)
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
@@ -14,27 +15,369 @@ def setup_logging():
         ]
     )
 
+def parse_corners(text):
+    """
+    Parses "x1,y1 x2,y2 x3,y3 x4,y4" (spaces or semicolons between points).
+    """
+    points = [p for p in text.replace(";", " ").split() if p]
+    if len(points) != 4:
+        raise ValueError(f"Expected 4 corners, got {len(points)}: {text}")
+    return [[float(v) for v in p.split(",")] for p in points]
+
+def processor_options(args):
+    options = {
+        "refine_corners": args.refine,
+        "detector": args.detector,
+        "confidence_threshold": args.confidence,
+        "cache_remaps": args.cache_remaps,
+        "memory_budget_mb": args.memory_mb,
+        "encode_options": {
+            "jpeg_quality": args.jpeg_quality,
+            "png_compression": args.png_compression,
+            "bilevel": args.bilevel,
+        },
+    }
+
+    if args.preflight:
+        options["preflight"] = {"min_sharpness": args.min_sharpness}
+
+    if args.activity_log:
+        from src.logger import ActivityLogger
+        options["activity_log"] = ActivityLogger(args.activity_log, max_bytes=args.activity_log_mb * 1024 * 1024)
+
+    if args.cache_dir:
+        from src.cache import ResultCache
+        options["result_cache"] = ResultCache(None if args.cache_dir == "default" else args.cache_dir,
+                                              max_mb=args.cache_mb, store_outputs=not args.cache_corners_only)
+
+    # Fixed-camera station: lock the quad once, skip detection for every image
+    if args.corners:
+        options["locked_corners"] = parse_corners(args.corners)
+    elif args.calibrate:
+        from src.processor import DocumentProcessor
+        calibrator = DocumentProcessor(mode=args.mode, refine_corners=args.refine,
+                                       detector=args.detector, confidence_threshold=args.confidence)
+        corners = calibrator.calibrate(args.calibrate)
+        logging.info("Calibrated corners: " + " ".join(f"{x:.1f},{y:.1f}" for x, y in corners))
+        options["locked_corners"] = corners.tolist()
+    return options
+
+def resource_plan(args, pool=True):
+    """
+    The --cores/--workers/--threads split. pool=False: one processor in this
+    process, which gets all the cores for OpenCV.
+    """
+    from src.resources import ResourcePlan
+    return ResourcePlan(cores=args.cores, workers=args.workers if pool else 1,
+                        threads=args.threads, affinity=args.affinity and pool)
+
+def make_metrics(args):
+    if not args.metrics:
+        return None
+    from src.metrics import Metrics
+    return Metrics()
+
+def save_metrics(metrics, args):
+    if metrics is not None:
+        metrics.write(args.metrics)
+        logging.info(f"Metrics written to {args.metrics}")
+
+def run_batch_mode(args):
+    from src.batch import collect_inputs, run_batch, run_combined, write_summary
+    from src.output import DOCUMENT_EXTENSIONS
+
+    inputs = collect_inputs(args.input, recursive=args.recursive)
+    if not inputs:
+        logging.error(f"No input images matched: {args.input}")
+        return
+
+    logging.info(f"Batch: {len(inputs)} image(s) from {args.input}")
+    metrics = make_metrics(args)
+
+    # -o scans.pdf / scans.tif: one multi-page document instead of a directory
+    if args.output.lower().endswith(DOCUMENT_EXTENSIONS):
+        results = run_combined(inputs, args.output, mode=args.mode, enhance_mode=args.enhance,
+                               options=processor_options(args), metrics=metrics, dpi=args.dpi,
+                               resources=resource_plan(args))
+        save_metrics(metrics, args)
+        summary_path = args.summary or os.path.splitext(args.output)[0] + "_summary.csv"
+        write_summary(results, summary_path)
+        ok = sum(1 for r in results if r["status"] == "ok")
+        logging.info(f"Document done: {ok} page(s), {len(results) - ok} left out (failed or rejected). "
+                     f"Summary: {summary_path}")
+        return
+
+    runner = run_batch
+    extra = {"multi": args.multi}
+    if args.shared_memory:
+        from src.transport import run_batch_shared
+        runner = run_batch_shared
+        extra = {"slot_mb": args.slot_mb}
+    elif args.pipeline:
+        from src.batch import run_pipeline
+        runner = run_pipeline
+        extra = {}
+    results = runner(
+        inputs, args.output,
+        mode=args.mode,
+        enhance_mode=args.enhance,
+        resources=resource_plan(args, pool=not args.pipeline),
+        resume=args.resume,
+        ext=args.ext,
+        options=processor_options(args),
+        metrics=metrics,
+        **extra
+    )
+    save_metrics(metrics, args)
+
+    summary_path = args.summary or os.path.join(args.output, "batch_summary.csv")
+    write_summary(results, summary_path)
+
+    ok = sum(1 for r in results if r["status"] == "ok")
+    failed = sum(1 for r in results if r["status"] == "failed")
+    skipped = sum(1 for r in results if r["status"] == "skipped")
+    rejected = sum(1 for r in results if r["status"] == "rejected")
+    logging.info(f"Batch done: {ok} ok, {failed} failed, {skipped} skipped, {rejected} rejected. "
+                 f"Summary: {summary_path}")
+    if rejected:
+        reasons = {}
+        for r in results:
+            if r["status"] == "rejected":
+                reasons[r["reason"]] = reasons.get(r["reason"], 0) + 1
+        logging.info("Rejected: " + ", ".join(f"{reason} {count}" for reason, count in sorted(reasons.items())))
+
+    detectors = {}
+    for r in results:
+        if r.get("detector"):
+            detectors[r["detector"]] = detectors.get(r["detector"], 0) + 1
+    if ok:
+        rates = ", ".join(f"{name} {count} ({100.0 * count / ok:.0f}%)" for name, count in sorted(detectors.items()))
+        logging.info(f"Detectors used: {rates}")
+    if args.cache_dir:
+        log_cache_hits(results)
+
+def log_cache_hits(results):
+    processed = [r for r in results if r["status"] == "ok"]
+    if processed:
+        outputs = sum(1 for r in processed if r.get("cached") == "output")
+        corners = sum(1 for r in processed if r.get("cached") == "corners")
+        logging.info(f"Result cache: {outputs} output hit(s), {corners} corner hit(s), "
+                     f"{len(processed) - outputs - corners} miss(es)")
+
+def run_stream_mode(args):
+    from src.processor import DocumentProcessor
+    from src.stream import scan_stream
+
+    resource_plan(args, pool=False).apply()
+    metrics = make_metrics(args)
+    processor = DocumentProcessor(mode=args.mode, metrics=metrics, **processor_options(args))
+    logging.info(f"Scanning video stream {args.input}")
+    results, stats = scan_stream(args.input, args.output, processor, enhance_mode=args.enhance,
+                                 ext=args.ext or ".png", max_frames=args.max_frames,
+                                 keyframe_interval=args.keyframe_interval)
+    save_metrics(metrics, args)
+    logging.info(f"Stream done: {stats['documents']} document(s) from {stats['frames']} frame(s), "
+                 f"{stats['keyframes']} keyframe detection(s), {stats['fps']} fps")
+
+def run_watch_mode(args):
+    import signal
+    import threading
+    from src.watch import HotFolder
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())  # Service managers stop with SIGTERM
+    watcher = HotFolder(args.input, args.output, mode=args.mode, enhance_mode=args.enhance, ext=args.ext,
+                        options=processor_options(args), resources=resource_plan(args),
+                        recursive=args.recursive, interval=args.watch_interval, settle=args.settle,
+                        archive_dir=args.archive, index_path=args.index, multi=args.multi)
+    watcher.run(stop=stop, once=args.once)
+
 def main():
     setup_logging()
     parser = argparse.ArgumentParser(description="Automatic Document Image Rectification Tool")
-    parser.add_argument("--input", "-i", type=str, required=True, help="Path to input image")
-    parser.add_argument("--output", "-o", type=str, required=True, help="Path to output image")
+    parser.add_argument("--input", "-i", type=str, default=None,
+                        help="Path to input image, or a directory, glob pattern or @file-list for batch mode")
+    parser.add_argument("--output", "-o", type=str, default=None,
+                        help="Path to output image (.png, .jpg, .tif, .pdf); in batch mode an output "
+                             "directory, or a .pdf/.tif file to combine all pages into one document")
     parser.add_argument("--mode", "-m", type=str, default="auto", choices=["auto", "cpu", "gpu"], help="Processing mode")
-    
+    parser.add_argument("--enhance", "-e", type=str, default="scan", choices=["scan", "color", "original"], help="Output style")
+    parser.add_argument("--refine", action="store_true", help="Refine detected corners at full resolution (sub-pixel)")
+    parser.add_argument("--detector", type=str, default="cascade", choices=["cascade", "fast", "watershed"],
+                        help="Detection strategy: fast detector with watershed fallback (cascade), or a single detector")
+    parser.add_argument("--confidence", type=float, default=0.6,
+                        help="Minimum fast-detector confidence before falling back to watershed (cascade only)")
+
+    parser.add_argument("--metrics", type=str, default=None, metavar="PATH",
+                        help="Write per-stage timings and counters to PATH (.json, or .prom for Prometheus text)")
+    parser.add_argument("--multi", action="store_true",
+                        help="Several documents per image (e.g. receipts on a table): each gets a numbered output")
+    parser.add_argument("--preflight", action="store_true",
+                        help="Reject blurry, badly exposed or document-less captures before the full-resolution work")
+    parser.add_argument("--min-sharpness", type=float, default=30.0,
+                        help="Pre-flight sharpness threshold (variance of the Laplacian at detection size)")
+    parser.add_argument("--activity-log", type=str, default=None, metavar="PATH",
+                        help="Write a per-image JSON Lines log with sizes and stage timings, e.g. "
+                             "logs/activity.jsonl (.md for the Markdown table). Collects stage metrics")
+    parser.add_argument("--activity-log-mb", type=int, default=10,
+                        help="Rotate the activity log at this size (default: 10, 5 backups kept)")
+    parser.add_argument("--memory-mb", type=int, default=None,
+                        help="Rectify and enhance in strips to keep peak memory near this budget (very large scans)")
+
+    output = parser.add_argument_group("output encoding")
+    output.add_argument("--jpeg-quality", type=int, default=None,
+                        help="JPEG quality 0-100 for .jpg output and colour pages in PDF/TIFF documents")
+    output.add_argument("--png-compression", type=int, default=None, choices=range(10), metavar="0-9",
+                        help="PNG zlib level (lower is faster, higher is smaller)")
+    output.add_argument("--no-bilevel", dest="bilevel", action="store_false",
+                        help="Store scan output as 8-bit grayscale instead of 1-bit (PNG, G4 TIFF, PDF)")
+    output.add_argument("--dpi", type=int, default=300,
+                        help="Resolution used for PDF page size (default: 300)")
+
+    cache = parser.add_argument_group("result cache")
+    cache.add_argument("--cache-dir", type=str, default=None, metavar="DIR",
+                       help='Reuse results of identical inputs from DIR ("default": the per-user cache directory)')
+    cache.add_argument("--cache-mb", type=int, default=1024,
+                       help="Result cache size; least recently used entries are evicted beyond it (default: 1024)")
+    cache.add_argument("--cache-corners-only", action="store_true",
+                       help="Cache detected corners only, not the encoded outputs")
+
+    station = parser.add_argument_group("fixed-camera station")
+    station.add_argument("--cache-remaps", action="store_true",
+                         help="Cache rectification remap tables for recently used quads")
+    station.add_argument("--calibrate", type=str, default=None, metavar="IMAGE",
+                         help="Detect the quad once on IMAGE and reuse it for every input (skips detection)")
+    station.add_argument("--corners", type=str, default=None,
+                         help='Lock the quad to explicit corners: "x1,y1 x2,y2 x3,y3 x4,y4" (skips detection)')
+
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--workers", "-w", type=int, default=None,
+                       help="Worker processes (default: one per core, or cores / --threads)")
+    batch.add_argument("--recursive", "-r", action="store_true", help="Recurse into sub-directories")
+    batch.add_argument("--no-resume", dest="resume", action="store_false",
+                       help="Reprocess files even if their output is already up to date")
+    batch.add_argument("--summary", type=str, default=None,
+                       help="Summary file (.csv or .json), default: <output>/batch_summary.csv")
+    batch.add_argument("--ext", type=str, default=None, help="Output extension, e.g. .png (default: same as input)")
+    batch.add_argument("--shared-memory", action="store_true",
+                       help="Decode in a separate process and pass frames to workers through shared memory")
+    batch.add_argument("--pipeline", action="store_true",
+                       help="One process instead of a worker pool, with file reading and writing overlapping "
+                            "the image work in threads (few cores, slow storage)")
+    batch.add_argument("--slot-mb", type=int, default=64,
+                       help="Shared-memory frame slot size in MB; caps the image size (default: 64, ~21MP)")
+
+    resources = parser.add_argument_group("CPU resources")
+    resources.add_argument("--cores", type=int, default=None,
+                           help="Cores to use in total (default: all available; env DOCAUG_CORES)")
+    resources.add_argument("--threads", type=int, default=None,
+                           help="OpenCV threads per worker (default: cores / workers; all cores for one image)")
+    resources.add_argument("--affinity", action="store_true",
+                           help="Pin each worker process to its own block of cores (Linux)")
+
+    stream = parser.add_argument_group("stream mode")
+    stream.add_argument("--stream", action="store_true",
+                        help="Scan documents from a video: --input is a video file, stream URL or camera index "
+                             "(e.g. 0), --output a directory")
+    stream.add_argument("--keyframe-interval", type=int, default=30,
+                        help="Run full detection at least every N frames; corners are tracked in between")
+    stream.add_argument("--max-frames", type=int, default=None, help="Stop after N frames (cameras run until then)")
+
+    watch = parser.add_argument_group("watch mode")
+    watch.add_argument("--watch", action="store_true",
+                       help="Keep watching the --input directory and process files as they arrive")
+    watch.add_argument("--watch-interval", type=float, default=1.0, metavar="SECONDS",
+                       help="Seconds between directory polls (default: 1)")
+    watch.add_argument("--settle", type=float, default=2.0, metavar="SECONDS",
+                       help="A file is taken once unchanged for this long (default: 2)")
+    watch.add_argument("--archive", type=str, default=None, metavar="DIR",
+                       help="Move processed inputs here (default: leave them, marked done in the index)")
+    watch.add_argument("--index", type=str, default=None, metavar="PATH",
+                       help="File index (default: OUTPUT/.docaug-index.sqlite)")
+    watch.add_argument("--once", action="store_true",
+                       help="Exit once everything in the folder is processed (e.g. from cron)")
+
+    service = parser.add_argument_group("service mode")
+    service.add_argument("--serve", action="store_true",
+                         help="Run the HTTP processing service instead of processing files (uses --workers)")
+    service.add_argument("--host", type=str, default="127.0.0.1", help="Address to bind (default: localhost only)")
+    service.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    service.add_argument("--max-queue", type=int, default=None,
+                         help="Requests queued beyond the busy workers before answering 503 (default: 2x workers)")
+
     args = parser.parse_args()
-    
+
+    if args.serve:
+        from src.server import serve
+        serve(host=args.host, port=args.port, max_queue=args.max_queue, mode=args.mode,
+              enhance_mode=args.enhance, options=processor_options(args), resources=resource_plan(args))
+        return
+    if not args.input or not args.output:
+        parser.error("--input and --output are required (or use --serve)")
+    from src.batch import is_batch_spec
+    from src.output import DOCUMENT_EXTENSIONS
+
+    combined = is_batch_spec(args.input) and args.output.lower().endswith(DOCUMENT_EXTENSIONS)
+    if args.multi and (args.stream or args.shared_memory or combined):
+        parser.error("--multi works with single images and directory batches only")
+    if args.pipeline and (args.multi or args.shared_memory or combined or args.watch or not is_batch_spec(args.input)):
+        parser.error("--pipeline works with batches into an output directory, without --multi or --shared-memory")
+    if args.watch and (args.stream or args.shared_memory or combined or not os.path.isdir(args.input)):
+        parser.error("--watch needs an --input directory and an --output directory")
+    if args.watch and os.path.realpath(args.input) in {os.path.realpath(d) for d in (args.output, args.archive) if d}:
+        parser.error("--watch needs --output and --archive outside the watched directory (a sub-directory is fine)")
+
+    if args.watch:
+        try:
+            run_watch_mode(args)
+        except Exception as e:
+            logging.error(f"Watch failed: {e}", exc_info=True)
+        return
+
+    if args.stream:
+        try:
+            run_stream_mode(args)
+        except Exception as e:
+            logging.error(f"Stream failed: {e}", exc_info=True)
+        return
+
+    if is_batch_spec(args.input):
+        try:
+            run_batch_mode(args)
+        except Exception as e:
+            logging.error(f"Batch failed: {e}", exc_info=True)
+        return
+
     if not os.path.exists(args.input):
         logging.error(f"Input file not found: {args.input}")
         return
 
     logging.info(f"Starting processing for {args.input}")
-    
+
     try:
-        processor = DocumentProcessor(mode=args.mode)
-        processor.process(args.input, args.output)
+        from src.processor import DocumentProcessor
+        from src.preflight import PreflightRejected
+        resource_plan(args, pool=False).apply()
+        metrics = make_metrics(args)
+        processor = DocumentProcessor(mode=args.mode, metrics=metrics, **processor_options(args))
+        try:
+            if args.multi:
+                infos = processor.process_all(args.input, args.output, enhance_mode=args.enhance)
+                save_metrics(metrics, args)
+                logging.info(f"Found {len(infos)} document(s): " + ", ".join(i["output"] for i in infos))
+                return
+            info = processor.process(args.input, args.output, enhance_mode=args.enhance)
+        except PreflightRejected as e:
+            logging.warning(f"Rejected by pre-flight check ({e.reason}): {e.message} {e.checks}")
+            return
+        save_metrics(metrics, args)
+        logging.info(f"Detected with {info['detector']} ({info['method']}, confidence {info['confidence']})")
+        if processor.result_cache is not None:
+            logging.info(f"Result cache: {info['cached'] or 'miss'} ({processor.result_cache.stats()})")
         logging.info(f"Successfully saved to {args.output}")
     except Exception as e:
         logging.error(f"Processing failed: {e}", exc_info=True)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
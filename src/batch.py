@@ -0,0 +1,452 @@
+import os
+import glob
+import csv
+import json
+import time
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .preflight import PreflightRejected
+from .output import documents_marker, read_documents_marker
+from .resources import ResourcePlan, apply_worker
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+
+# Per output directory: the parameters each output was written with (see OutputParams)
+PARAMS_NAME = ".docaug-params.json"
+
+# One warm DocumentProcessor per worker process (set by _init_worker)
+_worker_processor = None
+
+
+def is_batch_spec(spec):
+    """
+    True if the --input value names more than one image:
+    a directory, a glob pattern or an @file-list.
+    """
+    return spec.startswith("@") or os.path.isdir(spec) or glob.has_magic(spec)
+
+
+def collect_inputs(spec, recursive=False):
+    """
+    Expands an input spec into a sorted list of (input_path, relative_name).
+    Supported specs:
+    - directory: all images inside (optionally recursive)
+    - glob pattern: e.g. "scans/*.jpg"
+    - @list.txt: one path per line, blank lines and '#' comments ignored
+    """
+    if spec.startswith("@"):
+        with open(spec[1:], "r", encoding="utf-8") as f:
+            paths = [line.strip() for line in f]
+        paths = [p for p in paths if p and not p.startswith("#")]
+        return _relative_names(paths)
+
+    if os.path.isdir(spec):
+        found = []
+        for dirpath, dirnames, filenames in os.walk(spec):
+            for name in filenames:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(dirpath, name)
+                    found.append((path, os.path.relpath(path, spec)))
+            if not recursive:
+                break
+        return sorted(found)
+
+    paths = glob.glob(spec, recursive=recursive)
+    return sorted(_relative_names([p for p in paths if os.path.isfile(p)]))
+
+
+def _relative_names(paths):
+    """
+    (path, name) pairs with names relative to the deepest common parent, so
+    a/img.jpg and b/img.jpg keep distinct outputs (files of one directory
+    simply keep their base name). Paths listed twice are processed once.
+    """
+    unique = []
+    seen = set()
+    for p in paths:
+        key = os.path.normcase(os.path.abspath(p))
+        if key not in seen:
+            seen.add(key)
+            unique.append(p)
+    if not unique:
+        return []
+    try:
+        parent = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in unique])
+    except ValueError:
+        # Different drives (Windows): no common parent
+        names = [os.path.basename(p) for p in unique]
+        clashes = sorted({n for n in names if names.count(n) > 1})
+        if clashes:
+            raise ValueError(f"Inputs on different drives share output names: {', '.join(clashes)}")
+        return list(zip(unique, names))
+    return [(p, os.path.relpath(os.path.abspath(p), parent)) for p in unique]
+
+
+def output_path_for(rel_name, output_dir, ext=None):
+    """
+    Maps an input's relative name to its output path, keeping sub-directories.
+    """
+    out = os.path.join(output_dir, rel_name)
+    if ext:
+        out = os.path.splitext(out)[0] + ext
+    return out
+
+
+def is_up_to_date(input_path, output_path, multi=False):
+    """
+    True if output exists and is newer than its input (used for --resume, with
+    OutputParams for the options it was written with).
+    multi: the numbered outputs of process_all, all of them as listed in their
+    completion marker.
+    """
+    if multi:
+        outputs = read_documents_marker(output_path)
+        if not outputs:
+            return False
+        return all(is_up_to_date(input_path, path) for path in [documents_marker(output_path)] + outputs)
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+
+class OutputParams:
+    """
+    The processing parameters each output of a directory was written with
+    (output name -> DocumentProcessor.output_digest, in <output_dir>/.docaug-params.json),
+    so resume only skips outputs written with the current options: a re-run
+    with another enhance mode, encoder setting or --refine redoes them.
+    Outputs with no entry (written before this file existed, or lost with an
+    interrupted run) count as stale. Only the parent process reads and writes it.
+    """
+    def __init__(self, output_dir, processor, enhance_mode):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, PARAMS_NAME)
+        self._processor = processor
+        self._enhance_mode = enhance_mode
+        self._current = {}  # ext -> digest
+        self._changed = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.digests = json.load(f)
+        except (OSError, ValueError):
+            self.digests = {}
+
+    def _name(self, output_path, multi):
+        # Numbered outputs are recorded under their completion marker
+        path = documents_marker(output_path) if multi else output_path
+        return os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+
+    def current(self, output_path):
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext not in self._current:
+            self._current[ext] = self._processor.output_digest(self._enhance_mode, ext)
+        return self._current[ext]
+
+    def is_current(self, output_path, multi=False):
+        return self.digests.get(self._name(output_path, multi)) == self.current(output_path)
+
+    def record(self, output_path, multi=False):
+        self.digests[self._name(output_path, multi)] = self.current(output_path)
+        self._changed = True
+
+    def save(self):
+        if not self._changed:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{self.path}.part{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.digests, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._changed = False
+
+
+def _init_worker(mode, options=None, collect_metrics=False, resources=None, counter=None):
+    global _worker_processor
+    apply_worker(resources, counter)
+    from .processor import DocumentProcessor
+    from .metrics import Metrics
+    metrics = Metrics() if collect_metrics else None
+    _worker_processor = DocumentProcessor(mode=mode, metrics=metrics, **(options or {}))
+
+
+def _process_one(input_path, output_path, enhance_mode, multi=False):
+    """
+    Runs one file inside a worker. Never raises: errors are reported in the result
+    so one bad image cannot take down the batch.
+    multi: write every document found in the image (numbered outputs).
+    """
+    start = time.perf_counter()
+    result = {"input": input_path, "output": output_path, "status": "ok", "error": "", "seconds": 0.0}
+    try:
+        out_dir = os.path.dirname(output_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        if multi:
+            # process_all writes each numbered output atomically itself
+            infos = _worker_processor.process_all(input_path, output_path, enhance_mode=enhance_mode)
+            result.update(documents=len(infos), output=";".join(i["output"] for i in infos),
+                          detector=infos[0]["detector"] if infos else None,
+                          corners=[i["corners"] for i in infos])
+        else:
+            # process() writes through a temp name and renames, like process_all
+            info = _worker_processor.process(input_path, output_path, enhance_mode=enhance_mode)
+            if info:
+                result.update(info)
+    except PreflightRejected as e:
+        result.update(status="rejected", reason=e.reason, error=str(e))
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    if _worker_processor is not None and _worker_processor.metrics.enabled:
+        # Shipped back per file and merged by the parent
+        result["metrics"] = _worker_processor.metrics.drain()
+    return result
+
+
+def _submit(pool, fn, *args):
+    """
+    pool.submit, but a pool that is already broken gives a failed future
+    instead of raising, so the caller handles it like any other crashed job.
+    """
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+
+
+def _crashed(input_path, output_path, error):
+    return {"input": input_path, "output": output_path, "status": "failed",
+            "error": f"Worker process died: {error}", "seconds": 0.0}
+
+
+def run_batch(inputs, output_dir, mode="auto", enhance_mode="scan", workers=None,
+              resume=True, ext=None, options=None, metrics=None, multi=False, resources=None):
+    """
+    Processes many images over a process pool with one warm processor per worker.
+    inputs: list of (input_path, relative_name) as returned by collect_inputs.
+    options: extra DocumentProcessor keyword arguments (e.g. refine_corners).
+    metrics: optional src.metrics.Metrics that collects the workers' instrumentation.
+    multi: every document in an image gets its own numbered output (<name>_1.png, ...).
+    resources: src.resources.ResourcePlan (default: `workers` processes, the
+    remaining cores as OpenCV threads).
+    Returns a list of per-file result dicts (status: ok / failed / skipped).
+    """
+    params = output_params(output_dir, mode, enhance_mode, options)
+    results, jobs = _plan_jobs(inputs, output_dir, resume, ext, multi, params)
+    if not jobs:
+        return results
+
+    plan = (resources or ResourcePlan(workers=workers)).for_jobs(len(jobs))
+    logging.info(f"Processing {len(jobs)} image(s) on {plan.workers} worker(s) x {plan.threads} thread(s)")
+
+    try:
+        with ProcessPoolExecutor(max_workers=plan.workers, initializer=_init_worker,
+                                 initargs=(mode, options, metrics is not None, plan, plan.counter())) as pool:
+            futures = {_submit(pool, _process_one, inp, out, enhance_mode, multi): (inp, out) for inp, out in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                inp, out = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (out of memory, crash in native code); every job
+                    # still queued fails the same way. Finished results are kept.
+                    result = _crashed(inp, out, e)
+                snapshot = result.pop("metrics", None)
+                if snapshot and metrics is not None:
+                    metrics.merge(snapshot)
+                if result["status"] == "ok":
+                    params.record(out, multi)
+                results.append(result)
+                _log_result(result, done, len(jobs))
+    finally:
+        params.save()
+
+    return results
+
+
+def run_pipeline(inputs, output_dir, mode="auto", enhance_mode="scan", resume=True, ext=None,
+                 options=None, metrics=None, resources=None, stage_workers=None):
+    """
+    Processes many images in this process with one processor, through the
+    threaded decode -> detect -> rectify -> encode pipeline (src.pipeline):
+    reading and writing files overlap the OpenCV work. Suits few cores or slow
+    storage, where a process pool would mostly wait on I/O.
+    Same inputs and results as run_batch (single document per image).
+    resources: src.resources.ResourcePlan for this process (default: all cores
+    to OpenCV); stage_workers: threads per stage, e.g. {"decode": 3}.
+    """
+    from .pipeline import Pipeline
+    from .processor import DocumentProcessor
+    processor = DocumentProcessor(mode=mode, metrics=metrics, **(options or {}))
+    params = output_params(output_dir, mode, enhance_mode, options, processor)
+    results, jobs = _plan_jobs(inputs, output_dir, resume, ext, params=params)
+    if not jobs:
+        return results
+
+    plan = resources or ResourcePlan(workers=1)
+    plan.apply()
+    logging.info(f"Processing {len(jobs)} image(s) in a pipeline, {plan.threads} OpenCV thread(s)")
+    pipeline = Pipeline(processor, enhance_mode=enhance_mode, workers=stage_workers)
+    try:
+        for done, result in enumerate(pipeline.run(jobs), 1):
+            if result["status"] == "ok":
+                params.record(result["output"])
+            results.append(result)
+            _log_result(result, done, len(jobs))
+    finally:
+        params.save()
+    return results
+
+
+def output_params(output_dir, mode, enhance_mode, options, processor=None):
+    """
+    OutputParams of output_dir for a run with these options. processor: the
+    run's own DocumentProcessor, if it has one in this process.
+    """
+    if processor is None:
+        from .processor import DocumentProcessor
+        # Only asked for output_digest; it never processes or logs anything
+        processor = DocumentProcessor(mode=mode, **dict(options or {}, activity_log=None))
+    return OutputParams(output_dir, processor, enhance_mode)
+
+
+def _plan_jobs(inputs, output_dir, resume, ext, multi=False, params=None):
+    """
+    Splits inputs into skipped results (up to date, with resume) and (input, output) jobs.
+    params: OutputParams; outputs written with other options are not up to date.
+    """
+    results = []
+    jobs = []
+    for input_path, rel_name in inputs:
+        output_path = output_path_for(rel_name, output_dir, ext)
+        if (resume and is_up_to_date(input_path, output_path, multi)
+                and (params is None or params.is_current(output_path, multi))):
+            results.append({"input": input_path, "output": output_path,
+                            "status": "skipped", "error": "", "seconds": 0.0})
+        else:
+            jobs.append((input_path, output_path))
+
+    if results:
+        logging.info(f"Resume: skipping {len(results)} up-to-date output(s)")
+    return results, jobs
+
+
+def _log_result(result, done, total):
+    if result["status"] == "ok":
+        logging.info(f"[{done}/{total}] {result['input']} ({result['seconds']:.2f}s)")
+    elif result["status"] == "rejected":
+        logging.warning(f"[{done}/{total}] {result['input']} rejected: {result['error']}")
+    else:
+        logging.error(f"[{done}/{total}] {result['input']} failed: {result['error']}")
+
+
+def _render_one(input_path, enhance_mode):
+    """
+    Worker side of run_combined: returns (enhanced image, result dict). Never raises.
+    """
+    start = time.perf_counter()
+    result = {"input": input_path, "status": "ok", "error": "", "seconds": 0.0}
+    image = None
+    try:
+        image, info = _worker_processor.render(input_path, enhance_mode=enhance_mode)
+        if info:
+            result.update(info)
+    except PreflightRejected as e:
+        result.update(status="rejected", reason=e.reason, error=str(e))
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    if _worker_processor is not None and _worker_processor.metrics.enabled:
+        result["metrics"] = _worker_processor.metrics.drain()
+    return image, result
+
+
+def run_combined(inputs, output_path, mode="auto", enhance_mode="scan", workers=None,
+                 options=None, metrics=None, dpi=300, resources=None):
+    """
+    Processes many images into one multi-page document (.pdf or .tif), pages in
+    input order. Pages are rendered over a process pool and streamed into the
+    writer as they come in order; at most ~2 pages per worker are in flight, so
+    memory stays flat however long the batch. Failed pages are left out.
+    Returns per-file result dicts like run_batch.
+    """
+    from .output import open_document
+    encode = dict((options or {}).get("encode_options") or {})
+    bilevel = enhance_mode == "scan" and encode.get("bilevel", True)
+
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    plan = (resources or ResourcePlan(workers=workers)).for_jobs(len(inputs))
+    window = 2 * plan.workers
+    logging.info(f"Combining {len(inputs)} page(s) into {output_path} on {plan.workers} worker(s) "
+                 f"x {plan.threads} thread(s)")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=plan.workers, initializer=_init_worker,
+                             initargs=(mode, options, metrics is not None, plan, plan.counter())) as pool, \
+            open_document(output_path, jpeg_quality=encode.get("jpeg_quality"), dpi=dpi) as document:
+        pending = {}
+        next_submit = 0
+        for index in range(len(inputs)):
+            # Keep the window full, then wait for the next page in order
+            while next_submit < len(inputs) and next_submit < index + window:
+                pending[next_submit] = _submit(pool, _render_one, inputs[next_submit][0], enhance_mode)
+                next_submit += 1
+            try:
+                image, result = pending.pop(index).result()
+            except BrokenProcessPool as e:
+                image, result = None, _crashed(inputs[index][0], output_path, e)
+            snapshot = result.pop("metrics", None)
+            if snapshot and metrics is not None:
+                metrics.merge(snapshot)
+            result["output"] = output_path
+            if result["status"] == "ok":
+                document.add_page(image, bilevel=bilevel)
+                result["page"] = document.pages
+                logging.info(f"[{index + 1}/{len(inputs)}] {result['input']} -> page {document.pages} "
+                             f"({result['seconds']:.2f}s)")
+            elif result["status"] == "rejected":
+                logging.warning(f"[{index + 1}/{len(inputs)}] {result['input']} rejected: {result['error']}")
+            else:
+                logging.error(f"[{index + 1}/{len(inputs)}] {result['input']} failed: {result['error']}")
+            results.append(result)
+            image = None
+
+    return results
+
+
+def write_summary(results, path):
+    """
+    Writes per-file results as CSV or JSON (chosen by file extension).
+    """
+    summary_dir = os.path.dirname(path)
+    if summary_dir:
+        os.makedirs(summary_dir, exist_ok=True)
+
+    if path.lower().endswith(".json"):
+        counts = {}
+        for r in results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"counts": counts, "files": results}, f, indent=2, default=str)
+        return
+
+    fields = []
+    for r in results:
+        for key in r:
+            if key not in fields:
+                fields.append(key)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+
+# Bump when a change to detection or enhancement makes cached results stale
+CACHE_VERSION = 1
+
+_ENTRY_SUFFIX = ".entry"
+_HEADER = struct.Struct("<I")  # length of the JSON info block that starts each entry
+_STALE_TMP_SECONDS = 3600
+
+
+class ResultCache:
+    """
+    On-disk, content-addressed cache of processing results, shared by every
+    process that points at the same directory.
+
+    Keys are derived from a hash of the input bytes plus the processing
+    parameters (see key()), so a resubmitted photo hits regardless of its file
+    name. Each entry is one file holding the info dict (corners, detector, ...)
+    and optionally the encoded output.
+    - writes go to a temp file and are renamed into place, so concurrent workers
+      never see a partial entry (last writer wins; both wrote the same result)
+    - hits refresh the entry's mtime; when the directory grows beyond max_mb the
+      least recently used entries are deleted down to 90% of the budget
+    - stats() reports hits, misses, stores and evictions of this instance plus
+      the current size on disk
+    """
+    def __init__(self, directory=None, max_mb=1024, store_outputs=True):
+        if directory is None:
+            from .utils import cache_dir
+            directory = os.path.join(cache_dir(), "results")
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.store_outputs = store_outputs
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._size = None  # Estimated bytes on disk (scanned on first store)
+
+    def __getstate__(self):
+        # Picklable for worker processes; each process keeps its own counters
+        state = dict(self.__dict__)
+        state.update(hits=0, misses=0, stores=0, evictions=0, _size=None)
+        return state
+
+    @staticmethod
+    def content_hash(data):
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    @staticmethod
+    def key(content_hash, params):
+        """
+        Entry key for a content hash and a JSON-serialisable parameter dict.
+        """
+        blob = json.dumps({"version": CACHE_VERSION, "params": params}, sort_keys=True)
+        return hashlib.blake2b(f"{content_hash}:{blob}".encode("utf-8"), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + _ENTRY_SUFFIX)
+
+    def get(self, key):
+        """
+        Returns (info dict, output bytes or None), or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            (info_len,) = _HEADER.unpack_from(blob)
+            info = json.loads(blob[_HEADER.size:_HEADER.size + info_len].decode("utf-8"))
+            output = blob[_HEADER.size + info_len:] or None
+        except (OSError, ValueError, struct.error):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # LRU: a hit makes the entry recent again
+        except OSError:
+            pass
+        self.hits += 1
+        return info, output
+
+    def put(self, key, info, output=None):
+        """
+        Stores an entry atomically. Best effort: a full or read-only disk only
+        means the result is not cached.
+        """
+        path = self._path(key)
+        info_blob = json.dumps(info).encode("utf-8")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(len(info_blob)))
+                f.write(info_blob)
+                if output:
+                    f.write(output)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.debug(f"Could not write cache entry {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.stores += 1
+
+        if self._size is None:
+            self._size = self._scan()[0]
+        else:
+            self._size += _HEADER.size + len(info_blob) + len(output or b"")
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """
+        (mtime, size, path) of every entry; removes temp files left by crashed writers.
+        """
+        entries = []
+        now = time.time()
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                files = list(os.scandir(shard.path))
+            except OSError:
+                continue
+            for entry in files:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # Evicted by another process meanwhile
+                if entry.name.endswith(_ENTRY_SUFFIX):
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                elif entry.name.endswith(".tmp") and now - st.st_mtime > _STALE_TMP_SECONDS:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+        return entries
+
+    def _scan(self):
+        entries = self._entries()
+        return sum(size for _, size, _ in entries), len(entries)
+
+    def evict(self, target_bytes=None):
+        """
+        Deletes least recently used entries until the cache is within target_bytes
+        (default 90% of max_mb). Safe to run from several processes at once.
+        """
+        if target_bytes is None:
+            target_bytes = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(s for _, s, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass  # Already removed by another process
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        self.evict(target_bytes=0)
+
+    def stats(self):
+        size, entries = self._scan()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_mb": round(size / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+        }
@@ -0,0 +1,275 @@
+import cv2
+import numpy as np
+
+
+def detect_watershed(image):
+    """
+    Robust Detection Strategy (Merged):
+    Uses Center-Seeded Watershed to handle complex backgrounds (grates, crumpled paper)
+    while maintaining precise edge detection.
+    1. Blur.
+    2. Gradient Calculation (Sobel).
+    3. Markers: Center = Paper, Corners = Background.
+    4. Watershed Segmentation.
+    5. Contour Approximation (Iterative).
+    Works on the (already downscaled) working image.
+    Returns: (4x2 quad or None, method) where method names the path that produced
+    the quad: 'approx', 'hull', 'min_area_rect' or 'full_frame' (quad is None).
+    """
+    h, w = image.shape[:2]
+
+    # 1. Blur & Grayscale
+    blurred = cv2.GaussianBlur(image, (5, 5), 0)
+    gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY)
+
+    # 2. Gradient (Sobel) to find edges/elevation
+    grad_x = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    gradient = cv2.magnitude(grad_x, grad_y)
+    gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+
+    # 3. Markers
+    markers = np.zeros((h, w), dtype=np.int32)
+
+    # Background Marker: Corners (assumed background)
+    cv2.circle(markers, (5, 5), 10, 1, -1)
+    cv2.circle(markers, (w-5, 5), 10, 1, -1)
+    cv2.circle(markers, (w-5, h-5), 10, 1, -1)
+    cv2.circle(markers, (5, h-5), 10, 1, -1)
+
+    # Foreground Marker: Center (assumed paper)
+    cx, cy = w // 2, h // 2
+    cv2.circle(markers, (cx, cy), 40, 2, -1)
+
+    # 4. Watershed
+    watershed_mask = cv2.watershed(blurred, markers)
+
+    # Extract Foreground (Label 2)
+    mask = np.zeros((h, w), dtype=np.uint8)
+    mask[watershed_mask == 2] = 255
+
+    # TIGHTEN: Reduced erosion to 1 to avoid cutting text, but keep edges clean
+    mask = cv2.erode(mask, None, iterations=1)
+
+    # 5. Find Contour of the "Center Blob"
+    cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+
+    if not cnts:
+        # Fallback for completely failed detection
+        print("Detection failed, returning full frame.")
+        return None, "full_frame"
+
+    c = max(cnts, key=cv2.contourArea)
+
+    # Approximate loop to find 4 points
+    peri = cv2.arcLength(c, True)
+
+    # Iterative Approximation
+    for epsilon_factor in np.linspace(0.02, 0.10, 10):
+        approx = cv2.approxPolyDP(c, epsilon_factor * peri, True)
+        if len(approx) == 4:
+            return approx.reshape(4, 2), "approx"
+
+    # Convex Hull Fallback
+    hull = cv2.convexHull(c)
+    peri_hull = cv2.arcLength(hull, True)
+    approx = cv2.approxPolyDP(hull, 0.04 * peri_hull, True)
+    if len(approx) == 4:
+        return approx.reshape(4, 2), "hull"
+
+    # Bounding Rect Fallback
+    rect = cv2.minAreaRect(c)
+    box = cv2.boxPoints(rect)
+    return np.int64(box).reshape(4, 2), "min_area_rect"
+
+
+def quad_confidence(edges, quad):
+    """
+    Scores how page-like a quad is, from 0 to 1. Product of:
+    - convexity: quad area vs its convex hull area
+    - area fraction: documents are expected to fill a good part of the frame
+    - corner angles: rectangles seen in perspective stay within 40-140 degrees
+    - edge support: share of the quad outline lying on detected edges
+    """
+    h, w = edges.shape[:2]
+    quad = np.asarray(quad, dtype=np.float32).reshape(4, 2)
+
+    area = cv2.contourArea(quad)
+    fraction = area / float(w * h)
+    if fraction > 0.98:
+        # Hugging the frame border: no real page boundary found
+        area_score = 0.0
+    else:
+        area_score = float(np.clip((fraction - 0.05) / 0.20, 0.0, 1.0))
+    return area_score * outline_score(edges, quad)
+
+
+def outline_score(edges, quad):
+    """
+    quad_confidence without the area term: convexity x corner angles x edge
+    support. Used where documents may be small (detect_multiple).
+    """
+    h, w = edges.shape[:2]
+    quad = np.asarray(quad, dtype=np.float32).reshape(4, 2)
+
+    area = cv2.contourArea(quad)
+    hull_area = cv2.contourArea(cv2.convexHull(quad))
+    if area <= 0 or hull_area <= 0:
+        return 0.0
+    convexity = area / hull_area
+
+    for i in range(4):
+        a = quad[i - 1] - quad[i]
+        b = quad[(i + 1) % 4] - quad[i]
+        cos = np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-6)
+        angle = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+        if angle < 40 or angle > 140:
+            return 0.0
+
+    # Sample the outline and count samples on (dilated) edge pixels
+    hits = total = 0
+    for i in range(4):
+        p0, p1 = quad[i], quad[(i + 1) % 4]
+        n = max(2, int(np.hypot(*(p1 - p0)) / 2))
+        t = np.linspace(0.0, 1.0, n, endpoint=False)[:, None]
+        pts = np.rint(p0 + t * (p1 - p0)).astype(int)
+        pts[:, 0] = np.clip(pts[:, 0], 0, w - 1)
+        pts[:, 1] = np.clip(pts[:, 1], 0, h - 1)
+        hits += np.count_nonzero(edges[pts[:, 1], pts[:, 0]])
+        total += n
+    edge_support = hits / float(total)
+
+    return float(convexity * edge_support)
+
+
+def outline_support(image, quad):
+    """
+    Edge support of a quad found by another method (watershed) on the working
+    image: outline_score with a few pixels of tolerance (those quads sit just
+    inside the page edge), corrected for the image's edge density so texture
+    or noise with edges everywhere does not count.
+    1 = outline entirely on edges, 0 = no better than chance.
+    """
+    edges = cv2.dilate(edge_map(image), None, iterations=2)
+    density = np.count_nonzero(edges) / float(edges.size)
+    if density >= 1.0:
+        return 0.0
+    return max(0.0, (outline_score(edges, quad) - density) / (1.0 - density))
+
+
+def edge_map(image):
+    """
+    Dilated Canny edges of the working image; the thresholds follow its global
+    contrast (Otsu).
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    high, _ = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    high = max(high, 20)
+    edges = cv2.Canny(gray, 0.5 * high, high)
+    return cv2.dilate(edges, None, iterations=1)
+
+
+def detect_fast(image):
+    """
+    Cheap first-pass detector for clean captures (page on a plain desk):
+    Canny edges + contour search for the best-scoring convex quadrilateral.
+    Works on the working image.
+    Returns: (4x2 quad or None, confidence)
+    """
+    edges = edge_map(image)
+
+    cnts = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+    cnts = sorted(cnts, key=cv2.contourArea, reverse=True)[:5]
+
+    best, best_score = None, 0.0
+    for c in cnts:
+        peri = cv2.arcLength(c, True)
+        approx = cv2.approxPolyDP(c, 0.02 * peri, True)
+        if len(approx) != 4 or not cv2.isContourConvex(approx):
+            continue
+        quad = approx.reshape(4, 2)
+        score = quad_confidence(edges, quad)
+        if score > best_score:
+            best, best_score = quad, score
+
+    return best, best_score
+
+
+def _contour_quad(c):
+    # Iterative approximation, then the minimum-area rectangle for near-rectangular blobs
+    peri = cv2.arcLength(c, True)
+    for epsilon_factor in np.linspace(0.02, 0.06, 5):
+        approx = cv2.approxPolyDP(c, epsilon_factor * peri, True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            return approx.reshape(4, 2).astype(np.float32)
+    box = cv2.boxPoints(cv2.minAreaRect(c))
+    if cv2.contourArea(c) >= 0.85 * cv2.contourArea(box):
+        return box.astype(np.float32)
+    return None
+
+
+def _overlaps(quad, accepted):
+    # Center inside an already accepted quad: the same document or one nested in it
+    cx, cy = quad.mean(axis=0)
+    for other, _ in accepted:
+        if cv2.pointPolygonTest(other.reshape(-1, 1, 2), (float(cx), float(cy)), False) >= 0:
+            return True
+        ox, oy = other.mean(axis=0)
+        if cv2.pointPolygonTest(quad.reshape(-1, 1, 2), (float(ox), float(oy)), False) >= 0:
+            return True
+    return False
+
+
+def detect_multiple(image, max_documents=10, min_area=0.01, min_score=0.5):
+    """
+    Finds every page-like quad (receipts, slips, cards on a table) in one pass
+    over the working image, instead of one center-seeded document:
+    1. Candidate outlines from two cheap masks of the same image:
+       - Canny edges (Otsu-derived thresholds) closed into outlines
+       - paper mask: pixels bright in every channel (Otsu on the per-pixel
+         minimum of B, G, R), opened to cut thin lines that touch the pages
+    2. Outer contours only, so text and content inside a page are ignored.
+    3. Each contour above min_area of the frame is approximated by a convex
+       quad and scored like detect_fast without its area term (convexity,
+       corner angles, edge support); overlapping candidates keep the best.
+    Returns a list of (4x2 quad, score), largest first, at most max_documents.
+    Touching documents merge into one outline and are not separated.
+    """
+    h, w = image.shape[:2]
+    edges = edge_map(image)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+    outlines = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+
+    b, g, r = cv2.split(image)
+    whiteness = cv2.GaussianBlur(cv2.min(cv2.min(b, g), r), (5, 5), 0)
+    _, paper = cv2.threshold(whiteness, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    paper = cv2.morphologyEx(paper, cv2.MORPH_CLOSE, kernel)  # Fill text holes
+    paper = cv2.morphologyEx(paper, cv2.MORPH_OPEN, kernel, iterations=2)
+
+    candidates = []
+    for mask in (outlines, paper):
+        cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+        for c in cnts:
+            if cv2.contourArea(c) < min_area * w * h:
+                continue
+            quad = _contour_quad(c)
+            if quad is None or cv2.contourArea(quad) > 0.98 * w * h:
+                continue  # Not four-sided, or the frame border
+            score = outline_score(edges, quad)
+            if score >= min_score:
+                candidates.append((quad, round(score, 3)))
+
+    # Best outline first; among equals the larger one
+    candidates.sort(key=lambda qs: (qs[1], cv2.contourArea(qs[0])), reverse=True)
+    found = []
+    for quad, score in candidates:
+        if not _overlaps(quad, found):
+            found.append((quad, score))
+        if len(found) >= max_documents:
+            break
+    found.sort(key=lambda qs: cv2.contourArea(qs[0]), reverse=True)
+    return found
@@ -1,5 +1,78 @@
 import cv2
 import numpy as np
+import threading
+from contextlib import contextmanager
+
+# Scan mode: adaptive threshold neighbourhood (odd) and offset
+SCAN_BLOCK_SIZE = 11
+SCAN_C = 2
+
+# Magic Color mode: CLAHE on the L channel
+CLAHE_CLIP_LIMIT = 3.0
+CLAHE_GRID = (8, 8)
+
+# Scratch buffers kept per thread, in total (larger requests get a one-off array)
+BUFFER_CACHE_MB = 64
+
+_local = threading.local()
+
+def get_clahe():
+    """
+    CLAHE object reused across calls (one per thread: cv2.CLAHE is not thread-safe).
+    """
+    clahe = getattr(_local, "clahe", None)
+    if clahe is None:
+        clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_GRID)
+        _local.clahe = clahe
+    return clahe
+
+def get_buffer(name, shape, dtype=np.uint8):
+    """
+    Per-thread scratch buffer, reallocated only when the requested shape changes.
+    A thread keeps at most BUFFER_CACHE_MB of them (none inside uncached_buffers()):
+    beyond that the array is allocated for this call only, so a worker that once
+    saw a huge page does not hold on to its buffers.
+    Only for intermediates: never return one to the caller.
+    """
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None:
+        buffers = _local.buffers = {}
+    buf = buffers.get(name)
+    if buf is not None and buf.shape == tuple(shape) and buf.dtype == dtype:
+        return buf
+    buffers.pop(name, None)
+    buf = np.empty(shape, dtype=dtype)
+    limit = getattr(_local, "limit", BUFFER_CACHE_MB * 1024 * 1024)
+    if buf.nbytes + sum(b.nbytes for b in buffers.values()) <= limit:
+        buffers[name] = buf
+    return buf
+
+@contextmanager
+def uncached_buffers():
+    """
+    get_buffer keeps nothing inside the block (memory budget set), and the
+    thread's cached buffers are dropped.
+    """
+    previous = getattr(_local, "limit", None)
+    _local.limit = 0
+    _local.buffers = {}
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _local.limit
+        else:
+            _local.limit = previous
+
+def clahe_lab_to_bgr(lab, out=None):
+    """
+    CLAHE on the L channel of a LAB image (modified in place), converted to BGR.
+    """
+    l = get_buffer("l", lab.shape[:2])
+    cv2.extractChannel(lab, 0, dst=l)
+    get_clahe().apply(l, dst=l)
+    cv2.insertChannel(l, lab, 0)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=out)
 
 def enhance_scan(image):
     """
@@ -13,7 +86,8 @@ def enhance_scan(image):
     # C: Constant subtracted from the mean.
     thresh = cv2.adaptiveThreshold(
         gray, 255, 
-        cv2.THRESH_BINARY, 11, 2
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, SCAN_BLOCK_SIZE, SCAN_C
     )
 
     return thresh
@@ -22,14 +96,8 @@ def enhance_magic_color(image):
     """
     Increases contrast and saturation for a 'Magic Color' look.
     """
-    # Simple contrast enhancement (CLAHE)
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    cl = clahe.apply(l)
-    
-    limg = cv2.merge((cl, a, b))
-    final = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
+    # Simple contrast enhancement (CLAHE) on L, in a reused LAB buffer
+    lab = get_buffer("lab", image.shape)
+    cv2.cvtColor(image, cv2.COLOR_BGR2LAB, dst=lab)
     
-    return final
+    return clahe_lab_to_bgr(lab)
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+from .rectify import order_points, output_size
+from .enhance import SCAN_BLOCK_SIZE, SCAN_C, get_buffer, clahe_lab_to_bgr
+
+# Extra source pixels around the quad so bilinear sampling at its edges is unchanged
+_ROI_MARGIN = 2
+
+
+def _quad_transform(image, pts):
+    """
+    Perspective matrix for the quad, expressed relative to the quad's bounding box
+    in the source, plus that box (x0, y0, x1, y1) and the output size.
+    """
+    rect = order_points(np.asarray(pts, dtype=np.float32))
+    width, height = output_size(rect)
+    dst = np.array([
+        [0, 0],
+        [width - 1, 0],
+        [width - 1, height - 1],
+        [0, height - 1]], dtype="float32")
+    M = cv2.getPerspectiveTransform(rect, dst)
+
+    h, w = image.shape[:2]
+    x0 = int(max(0, np.floor(rect[:, 0].min()) - _ROI_MARGIN))
+    y0 = int(max(0, np.floor(rect[:, 1].min()) - _ROI_MARGIN))
+    x1 = int(min(w, np.ceil(rect[:, 0].max()) + _ROI_MARGIN + 1))
+    y1 = int(min(h, np.ceil(rect[:, 1].max()) + _ROI_MARGIN + 1))
+
+    # Source coordinates inside the ROI are shifted by (x0, y0)
+    shift = np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]], dtype=np.float64)
+    return M @ shift, (x0, y0, x1, y1), (width, height)
+
+
+def rectify_scan(image, pts):
+    """
+    Fused four_point_transform + enhance_scan.
+    Converts only the quad's bounding box to gray and warps the single luma
+    channel (a third of the colour warp's traffic), then thresholds in place.
+    """
+    M, (x0, y0, x1, y1), size = _quad_transform(image, pts)
+    roi = image[y0:y1, x0:x1]
+
+    if roi.ndim == 3:
+        gray = get_buffer("gray_roi", roi.shape[:2])
+        cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=gray)
+    else:
+        gray = roi
+
+    out = cv2.warpPerspective(gray, M, size)
+    cv2.adaptiveThreshold(
+        out, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, SCAN_BLOCK_SIZE, SCAN_C,
+        dst=out
+    )
+    return out
+
+
+def rectify_color(image, pts):
+    """
+    Fused four_point_transform + enhance_magic_color.
+    Warps into a reused buffer, converts to LAB in place, applies the reused
+    CLAHE to L without split/merge and writes BGR into the returned output.
+    """
+    M, (x0, y0, x1, y1), (width, height) = _quad_transform(image, pts)
+    roi = image[y0:y1, x0:x1]
+
+    warped = get_buffer("warped", (height, width, 3))
+    cv2.warpPerspective(roi, M, (width, height), dst=warped)
+    cv2.cvtColor(warped, cv2.COLOR_BGR2LAB, dst=warped)
+    return clahe_lab_to_bgr(warped)
+
+
+def rectify_original(image, pts):
+    """
+    four_point_transform reading only the quad's bounding box.
+    """
+    M, (x0, y0, x1, y1), size = _quad_transform(image, pts)
+    return cv2.warpPerspective(image[y0:y1, x0:x1], M, size)
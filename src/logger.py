@@ -1,42 +1,196 @@
 import os
+import json
 import datetime
+import threading
+from contextlib import contextmanager
+from multiprocessing import util
+
+MARKDOWN_HEADER = ("# DocAUG Activity Log\n\n"
+                   "| Timestamp | Action | Input | Detection | Enhancement | Status |\n"
+                   "|---|---|---|---|---|---|\n")
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    Exclusive lock on path (a lock file) shared by every process on the machine.
+    """
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ~10s; keep waiting
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
 
 class ActivityLogger:
-    def __init__(self, log_file="logs/activity_log.md"):
-        self.enabled = True
+    """
+    Buffered activity log. log_process() only appends a record to an in-memory
+    buffer; a background thread writes the buffer every flush_interval seconds
+    (or as soon as max_buffer records are waiting), with one open/append per
+    batch instead of per image.
+
+    - log_file: JSON Lines, one record per processed image (timestamp, input,
+      modes, status, detector, image sizes, per-stage timings, ...)
+    - markdown_file: optional human-readable table in the original format
+    Writes hold an inter-process file lock, so batch workers and service workers
+    can share one log. Files are rotated by size like logging's
+    RotatingFileHandler: activity.jsonl -> activity.jsonl.1 ... .{backups}.
+    Picklable: worker processes get their own buffer and flush thread.
+    """
+    def __init__(self, log_file="logs/activity.jsonl", markdown_file=None, flush_interval=1.0,
+                 max_buffer=256, max_bytes=10 * 1024 * 1024, backups=5):
+        if log_file and log_file.endswith(".md") and markdown_file is None:
+            # Original signature: ActivityLogger("logs/activity_log.md")
+            log_file, markdown_file = None, log_file
         self.log_file = log_file
+        self.markdown_file = markdown_file
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = True
+        self._reset()
 
         try:
-            # Ensure log directory exists
-            log_dir = os.path.dirname(log_file)
-            if log_dir and not os.path.exists(log_dir):
-                os.makedirs(log_dir)
-            
-            # Initialize file with header if it doesn't exist
-            if not os.path.exists(self.log_file):
-                with open(self.log_file, "w") as f:
-                    f.write("# DocAUG Activity Log\n\n")
-                    f.write("| Timestamp | Action | Input | Detection | Enhancement | Status |\n")
-                    f.write("|---|---|---|---|---|---|\n")
-
-        except (OSError, PermissionError) as e:
+            # Ensure log directories exist
+            for path in (log_file, markdown_file):
+                log_dir = os.path.dirname(path) if path else ""
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+        except OSError as e:
             print(f"WARNING: Could not initialize logging (Permission Denied). Logging disabled. Error: {e}")
             self.enabled = False
 
-    def log_process(self, input_path, detect_mode, enhance_mode, status="Success"):
+    def _reset(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self._pid = os.getpid()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for key in ("_buffer", "_lock", "_wake", "_thread", "_closed", "_pid"):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _start(self):
+        # Caller holds the lock. Started on first use (and again after a fork)
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="DocAUG-activity-log", daemon=True)
+            self._thread.start()
+            # Flush on interpreter exit, including multiprocessing workers
+            util.Finalize(self, self.close, exitpriority=10)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def log(self, action, **fields):
         """
-        Logs a processing event.
+        Queues one record (JSON-serialisable fields); never blocks on I/O.
         """
-        if not self.enabled:
+        if not self.enabled or self._closed:
             return
+        record = {"timestamp": datetime.datetime.now().isoformat(timespec="milliseconds"),
+                  "action": action, "pid": os.getpid()}
+        record.update(fields)
+        with self._lock:
+            self._start()
+            self._buffer.append(record)
+            if len(self._buffer) >= self.max_buffer:
+                self._wake.set()
 
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        filename = os.path.basename(input_path) if input_path else "N/A"
-        
-        entry = f"| {timestamp} | Process Image | {filename} | {detect_mode} | {enhance_mode} | {status} |\n"
-        
+    def log_process(self, input_path, detect_mode, enhance_mode, status="Success", **fields):
+        """
+        Logs a processing event. Extra fields (detector, input_size, stages, ...)
+        go to the JSONL record.
+        """
+        self.log("process", input=input_path, detect_mode=detect_mode, enhance_mode=enhance_mode,
+                 status=status, **fields)
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
         try:
-            with open(self.log_file, "a") as f:
-                f.write(entry)
+            if self.log_file:
+                data = "".join(json.dumps(r, default=str) + "\n" for r in records)
+                self._append(self.log_file, data)
+            if self.markdown_file:
+                self._append(self.markdown_file, "".join(self._markdown_row(r) for r in records),
+                             header=MARKDOWN_HEADER)
         except Exception as e:
             print(f"Logging failed: {e}")
+
+    def _append(self, path, data, header=None):
+        data = data.encode("utf-8")
+        with _file_lock(path + ".lock"):
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            if size and self.max_bytes and size + len(data) > self.max_bytes:
+                self._rotate(path)
+                size = 0
+            with open(path, "ab") as f:
+                if size == 0 and header:
+                    f.write(header.encode("utf-8"))
+                f.write(data)
+
+    def _rotate(self, path):
+        # Caller holds the file lock
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    @staticmethod
+    def _markdown_row(record):
+        timestamp = record["timestamp"][:19].replace("T", " ")
+        action = "Process Image" if record["action"] == "process" else record["action"]
+        filename = os.path.basename(record["input"]) if record.get("input") else "N/A"
+        return (f"| {timestamp} | {action} | {filename} | {record.get('detect_mode', '')} | "
+                f"{record.get('enhance_mode', '')} | {record.get('status', '')} |\n")
+
+    def close(self):
+        """
+        Stops the flush thread and writes what is still buffered.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread() \
+                and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        self.flush()
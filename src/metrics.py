@@ -0,0 +1,289 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds (seconds for stage timings)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Megapixel buckets for image size histograms
+SIZE_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 12, 16, 24, 32, 48, 64, 100)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def to_dict(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count, "sum": self.sum}
+
+    def merge(self, data):
+        if list(self.buckets) != list(data["buckets"]):
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, data["counts"])]
+        self.count += data["count"]
+        self.sum += data["sum"]
+
+
+class Metrics:
+    """
+    Per-stage timings, counters and histograms for DocumentProcessor.
+
+    with metrics.stage("detect"):        # wall + CPU time of the block
+        ...
+    metrics.count("detections_total", detector="fast", method="contour")
+    metrics.observe("input_megapixels", 12.0, buckets=SIZE_BUCKETS)
+
+    Export with to_json() / to_prometheus(), or register sinks with add_sink(fn):
+    every event is passed to fn as a dict (kind, name, labels, value / wall / cpu).
+    Thread-safe; use NullMetrics (the default) for a no-op version.
+    """
+    enabled = True
+
+    def __init__(self, prefix="docaug"):
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.cpu_seconds = {}
+        self._sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self._sinks.remove(sink)
+
+    def _emit(self, event):
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"WARNING: metrics sink failed: {e}")
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """
+        Times a block. Failures are counted in stage_errors_total and re-raised.
+        """
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            labels["stage"] = name
+            key = _key("stage_seconds", labels)
+            with self._lock:
+                hist = self.histograms.get(key)
+                if hist is None:
+                    hist = self.histograms[key] = Histogram()
+                hist.observe(wall)
+                self.cpu_seconds[key] = self.cpu_seconds.get(key, 0.0) + cpu
+                if failed:
+                    err_key = _key("stage_errors_total", labels)
+                    self.counters[err_key] = self.counters.get(err_key, 0) + 1
+            if self._sinks:
+                self._emit({"kind": "stage", "name": name, "labels": labels,
+                            "wall": wall, "cpu": cpu, "failed": failed})
+
+    def count(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self._sinks:
+            self._emit({"kind": "count", "name": name, "labels": labels, "value": value})
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+        if self._sinks:
+            self._emit({"kind": "observe", "name": name, "labels": labels, "value": value})
+
+    # --- Export ----------------------------------------------------------
+
+    def _snapshot(self):
+        # Caller holds the lock
+        return {
+            "counters": [{"name": n, "labels": dict(l), "value": v}
+                         for (n, l), v in self.counters.items()],
+            "histograms": [dict(name=n, labels=dict(l), cpu_seconds=self.cpu_seconds.get((n, l)), **h.to_dict())
+                           for (n, l), h in self.histograms.items()],
+        }
+
+    def snapshot(self):
+        """
+        Plain-dict copy of everything recorded (JSON serialisable, mergeable).
+        """
+        with self._lock:
+            return self._snapshot()
+
+    def merge(self, snapshot):
+        """
+        Adds a snapshot (e.g. from a worker process) into these metrics.
+        """
+        with self._lock:
+            for c in snapshot["counters"]:
+                key = _key(c["name"], c["labels"])
+                self.counters[key] = self.counters.get(key, 0) + c["value"]
+            for h in snapshot["histograms"]:
+                key = _key(h["name"], h["labels"])
+                hist = self.histograms.get(key)
+                if hist is None:
+                    hist = self.histograms[key] = Histogram(h["buckets"])
+                hist.merge(h)
+                if h.get("cpu_seconds") is not None:
+                    self.cpu_seconds[key] = self.cpu_seconds.get(key, 0.0) + h["cpu_seconds"]
+
+    def drain(self):
+        """
+        Returns a snapshot and resets all values.
+        """
+        with self._lock:
+            snap = self._snapshot()
+            self.counters.clear()
+            self.histograms.clear()
+            self.cpu_seconds.clear()
+        return snap
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """
+        Prometheus text exposition format.
+        """
+        def fmt_labels(labels, extra=None):
+            items = list(labels.items()) + (list(extra.items()) if extra else [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        snap = self.snapshot()
+        lines = []
+        cpu_lines = []
+        seen = set()
+        for c in sorted(snap["counters"], key=lambda c: c["name"]):
+            name = f"{self.prefix}_{c['name']}"
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{fmt_labels(c['labels'])} {c['value']}")
+
+        for h in sorted(snap["histograms"], key=lambda h: h["name"]):
+            name = f"{self.prefix}_{h['name']}"
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(list(h["buckets"]) + ["+Inf"], h["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{fmt_labels(h['labels'], {'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{fmt_labels(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{fmt_labels(h['labels'])} {h['count']}")
+            if h.get("cpu_seconds") is not None:
+                cpu_lines.append(f"{self.prefix}_stage_cpu_seconds_total{fmt_labels(h['labels'])} {h['cpu_seconds']}")
+
+        if cpu_lines:
+            lines.append(f"# TYPE {self.prefix}_stage_cpu_seconds_total counter")
+            lines.extend(cpu_lines)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes JSON, or Prometheus text if path ends with .prom / .txt.
+        """
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+class StageRecorder:
+    """
+    Metrics sink that collects the stage timings of one call on the current
+    thread (e.g. to attach them to a per-image log record):
+
+        recorder = StageRecorder(); metrics.add_sink(recorder)
+        recorder.begin(); ...; stages = recorder.end()   # {"detect": ms, ...}
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def __call__(self, event):
+        stages = getattr(self._local, "stages", None)
+        if stages is not None and event["kind"] == "stage":
+            stages[event["name"]] = stages.get(event["name"], 0.0) + event["wall"] * 1000
+
+    def begin(self):
+        self._local.stages = {}
+
+    def end(self):
+        stages, self._local.stages = getattr(self._local, "stages", None) or {}, None
+        return {name: round(ms, 2) for name, ms in stages.items()}
+
+
+class _NullContext:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class NullMetrics:
+    """
+    Disabled instrumentation: same interface as Metrics, every call is a no-op.
+    """
+    enabled = False
+
+    def stage(self, name, **labels):
+        return _NULL_CONTEXT
+
+    def count(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        pass
+
+    def add_sink(self, sink):
+        raise RuntimeError("Metrics are disabled; pass metrics=Metrics() to enable them")
+
+    def snapshot(self):
+        return {"counters": [], "histograms": []}
+
+    def drain(self):
+        return self.snapshot()
+
+    def merge(self, snapshot):
+        pass
+
+
+NULL_METRICS = NullMetrics()
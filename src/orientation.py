@@ -0,0 +1,251 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Long side of the page used for the estimate
+ORIENTATION_SIZE = 1000
+
+# Below this many voting text lines the up/down call is not trusted at all;
+# confidence reaches its maximum at _FULL_LINES
+_MIN_LINES = 3
+_FULL_LINES = 12
+
+
+def _binarize(image, size=ORIENTATION_SIZE):
+    """
+    Downscaled, inverted binary page (ink = 255).
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    scale = size / float(max(h, w))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(round(w * scale)), int(round(h * scale))), interpolation=cv2.INTER_AREA)
+    ink = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+
+    # Drop long rules and borders: they are not text and dominate the profiles
+    for kernel in ((41, 1), (1, 41)):
+        lines = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, kernel))
+        ink = cv2.subtract(ink, lines)
+    return ink
+
+
+def _text_lines(ink, min_chars=5):
+    """
+    Groups character-like connected components into horizontal text lines.
+    Characters: a few pixels up to 5% of the page tall, at most 3x as wide as
+    tall and not too sparse; illustrations, photos and their speckle mostly
+    fail these tests or do not line up. Neighbouring characters are joined
+    along the row, and only thin, wide groups with min_chars characters count
+    as lines.
+    Returns a list of (tops, bottoms) arrays, one pair per line.
+    """
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    x, y, w, h, area = (stats[1:, i] for i in range(5))
+    fill = area / np.maximum(w * h, 1).astype(np.float64)
+    chars = (h >= 4) & (h <= 0.05 * ink.shape[0]) & (w <= 3 * h) & (area >= 6) & (fill >= 0.1)
+    if chars.sum() < min_chars:
+        return []
+    char_h = float(np.median(h[chars]))
+    chars &= h <= 3 * char_h
+
+    keep = np.zeros(n, np.uint8)
+    keep[1:][chars] = 255
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, int(round(0.8 * char_h))), 1))
+    joined = cv2.dilate(keep[labels], kernel)
+    _, line_labels, line_stats, _ = cv2.connectedComponentsWithStats(joined, connectivity=8)
+
+    index = np.flatnonzero(chars)
+    owner = line_labels[y[index] + h[index] // 2, x[index] + w[index] // 2]
+    lines = []
+    for label in np.unique(owner):
+        _, _, line_w, line_h, _ = line_stats[label]
+        members = index[owner == label]
+        if label == 0 or len(members) < min_chars or line_h > 2.5 * char_h or line_w < 4 * line_h:
+            continue
+        lines.append((y[members], y[members] + h[members]))
+    return lines
+
+
+def _line_votes(lines):
+    """
+    Up/down vote per text line. Upright Latin text has more characters reaching
+    above the x-height band (ascenders, capitals) than below the baseline
+    (descenders). Returns a list of +1 (upright) / -1 (upside down) votes;
+    lines without a clear difference do not vote.
+    """
+    votes = []
+    for tops, bottoms in lines:
+        top, base = np.median(tops), np.median(bottoms)
+        margin = 0.2 * (base - top)
+        if margin < 0.6:
+            continue
+        above = int(np.sum(tops < top - margin))
+        below = int(np.sum(bottoms > base + margin))
+        if above != below:
+            votes.append(1 if above > below else -1)
+    return votes
+
+
+def estimate_orientation(image):
+    """
+    Native text orientation estimate on a downscaled, binarised page, using
+    text-like connected components only (see _text_lines):
+    1. Text lines are horizontal when more characters group into horizontal
+       lines than into vertical ones (0/180 vs 90/270).
+    2. Up vs down from a per-line vote on ascenders vs descenders.
+    Confidence = axis margin x vote agreement x line count (full at
+    _FULL_LINES voting lines), so pages with little text or mostly graphics
+    stay below the threshold and go to Tesseract OSD.
+    Returns: dict with 'rotate' (clockwise degrees to apply: 0, 90, 180, 270, as
+    Tesseract OSD reports it), 'confidence' (0-1) and 'lines' (voting lines).
+    """
+    ink = _binarize(image)
+    if not np.any(ink):
+        return {"rotate": 0, "confidence": 0.0, "lines": 0}
+
+    lines = _text_lines(ink)
+    across = sum(len(t) for t, _ in _text_lines(np.ascontiguousarray(ink.T)))
+    along = sum(len(t) for t, _ in lines)
+    if along >= across:
+        rotate = 0
+    else:
+        rotate = 90
+        lines = _text_lines(cv2.rotate(ink, cv2.ROTATE_90_CLOCKWISE))
+    axis_confidence = abs(along - across) / float(max(along + across, 1))
+
+    votes = _line_votes(lines)
+    if sum(votes) < 0:
+        rotate += 180
+    if len(votes) < _MIN_LINES:
+        return {"rotate": rotate, "confidence": 0.0, "lines": len(votes)}
+    agreement = abs(sum(votes)) / float(len(votes))
+    confidence = axis_confidence * agreement * min(1.0, len(votes) / float(_FULL_LINES))
+    return {"rotate": rotate, "confidence": round(confidence, 3), "lines": len(votes)}
+
+
+class OrientationService:
+    """
+    Memoised, bounded orientation estimation for bulk work.
+    - The page is reduced once to a grayscale image of at most max_side pixels,
+      cropped to its ink; both estimators see only that (Tesseract gets a small
+      PNG to serialise instead of the full colour array).
+    - Results are cached by a hash of that image, so asking again for the same
+      page (the GUI's Auto-Orient button, re-runs) costs a hash.
+    - At most max_workers Tesseract processes run at once, however many threads
+      call estimate(); map() runs a batch through that many workers.
+    mode: 'auto' (native first, OSD below threshold), 'native' or 'tesseract'.
+    """
+    def __init__(self, mode='auto', threshold=0.5, max_workers=2, max_side=2000, max_entries=256):
+        self.mode = mode
+        self.threshold = threshold
+        self.max_workers = max(1, int(max_workers))
+        self.max_side = max_side
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._tesseract = threading.BoundedSemaphore(self.max_workers)
+        self._tesseract_configured = False
+
+    def _prepare(self, image):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape[:2]
+        scale = self.max_side / float(max(h, w))
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(round(w * scale)), int(round(h * scale))), interpolation=cv2.INTER_AREA)
+        key = hashlib.blake2b(gray.tobytes(), digest_size=16)
+        key.update(repr(image.shape).encode())
+        return gray, key.hexdigest()
+
+    def _crop(self, gray):
+        # Tight box around the ink (plus a margin) so OSD reads less blank paper
+        ink = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+        ys, xs = np.nonzero(ink)
+        if len(xs) == 0:
+            return gray
+        margin = 20
+        y0, y1 = max(0, ys.min() - margin), min(gray.shape[0], ys.max() + margin + 1)
+        x0, x1 = max(0, xs.min() - margin), min(gray.shape[1], xs.max() + margin + 1)
+        return gray[y0:y1, x0:x1]
+
+    def _osd(self, gray):
+        import pytesseract
+        if not self._tesseract_configured:
+            # Discovery runs on the first OSD call only (cached on disk between runs)
+            from .utils import find_tesseract
+            path = find_tesseract()
+            if path:
+                pytesseract.pytesseract.tesseract_cmd = path
+                logging.debug(f"Found Tesseract at {path}")
+            else:
+                logging.debug("Tesseract not found in common paths. Relying on System PATH.")
+            self._tesseract_configured = True
+        with self._tesseract:
+            results = pytesseract.image_to_osd(self._crop(gray), output_type=pytesseract.Output.DICT)
+        logging.debug(f"Tesseract OSD Result: {results}")
+        return {"rotate": results["rotate"], "confidence": results.get("orientation_conf"), "estimator": "tesseract"}
+
+    def _estimate(self, gray):
+        native = None
+        if self.mode != 'tesseract':
+            native = estimate_orientation(gray)
+            native["estimator"] = "native"
+            logging.debug(f"Native orientation estimate: {native}")
+            if self.mode == 'native' or native["confidence"] >= self.threshold:
+                return native
+        try:
+            return self._osd(gray)
+        except Exception as e:
+            if native is None:
+                raise
+            # Low-confidence guess beats no answer when Tesseract is unavailable
+            logging.warning(f"Tesseract OSD failed ({e}); using native estimate")
+            return native
+
+    def estimate(self, image):
+        """
+        Returns: dict with 'rotate' (clockwise degrees), 'confidence' (0-1 for native,
+        Tesseract's orientation_conf otherwise), 'estimator' ('native' / 'tesseract')
+        and 'cached' (True when served from the cache).
+        """
+        gray, key = self._prepare(image)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(result, cached=True)
+            self.misses += 1
+
+        result = self._estimate(gray)
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(result, cached=False)
+
+    def map(self, images):
+        """
+        Estimates a batch of images (arrays or paths) with max_workers threads;
+        Tesseract runs in its own processes, so threads are enough.
+        Results are returned in input order.
+        """
+        def run(image):
+            if isinstance(image, str):
+                image = cv2.imread(image)
+                if image is None:
+                    raise IOError("Could not read image")
+            return self.estimate(image)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(run, images))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
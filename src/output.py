@@ -0,0 +1,306 @@
+import io
+import os
+import zlib
+import cv2
+import numpy as np
+
+# Extensions written as multi-page documents
+DOCUMENT_EXTENSIONS = (".pdf", ".tif", ".tiff")
+
+
+def numbered_path(path, number):
+    """
+    scans/page.png -> scans/page_1.png (one output per document of a multi-document image).
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}_{number}{ext}"
+
+
+def temp_path(path, tag=""):
+    """
+    scans/page.png -> scans/.page.part<pid><tag>.png: the name an output is
+    written under before it is renamed into place. Hidden, so directory scans
+    (the watcher, glob patterns) never take it for an input; the extension is
+    kept so writers still pick the format from it.
+    """
+    directory, name = os.path.split(path)
+    root, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{root}.part{os.getpid()}{tag}{ext}")
+
+
+def documents_marker(path):
+    """
+    scans/page.png -> scans/.page.png.docs: written by process_all after the last
+    numbered output, with their file names (one per line). Its presence means the
+    set is complete.
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.docs")
+
+
+def read_documents_marker(path):
+    """
+    Numbered output paths listed in the marker of path, or None without a marker.
+    """
+    marker = documents_marker(path)
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            names = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return None
+    return [os.path.join(os.path.dirname(marker), name) for name in names]
+
+
+def is_bilevel(image):
+    """
+    True for single-channel uint8 images holding only 0 and 255 (scan mode output).
+    """
+    if image.ndim != 2 or image.dtype != np.uint8:
+        return False
+    return not np.any((image > 0) & (image < 255))
+
+
+def _cv2_params(ext, bilevel=False, jpeg_quality=None, png_compression=None):
+    params = []
+    if ext in (".jpg", ".jpeg") and jpeg_quality is not None:
+        params += [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+    if ext == ".png":
+        if png_compression is not None:
+            params += [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+        if bilevel:
+            params += [cv2.IMWRITE_PNG_BILEVEL, 1]
+    if ext in (".tif", ".tiff"):
+        params += [cv2.IMWRITE_TIFF_COMPRESSION, 5]  # LZW
+    return params
+
+
+def _to_pil(image, bilevel):
+    from PIL import Image
+    h, w = image.shape[:2]
+    if bilevel:
+        # Packed 1 bit per pixel, MSB first, 1 = white: PIL's native "1" layout
+        return Image.frombytes("1", (w, h), np.packbits(image > 127, axis=1).tobytes())
+    if image.ndim == 2:
+        return Image.fromarray(image)
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def _tiff_compression(bilevel, jpeg_quality):
+    if bilevel:
+        return {"compression": "group4"}
+    if jpeg_quality is not None:
+        return {"compression": "jpeg", "quality": int(jpeg_quality)}
+    return {"compression": "tiff_lzw"}
+
+
+def encode_image(image, ext, bilevel=False, jpeg_quality=None, png_compression=None):
+    """
+    Encodes image to bytes in the format of ext ('.png', '.jpg', '.tif', '.pdf', ...).
+    bilevel=True stores 0/255 images with 1 bit per pixel: 1-bit PNG, CCITT G4
+    TIFF (needs Pillow) or a 1-bit Flate image in PDF.
+    """
+    ext = ext.lower()
+    bilevel = bilevel and is_bilevel(image)
+    if ext == ".pdf":
+        buf = io.BytesIO()
+        with PdfWriter(buf, jpeg_quality=jpeg_quality) as pdf:
+            pdf.add_page(image, bilevel=bilevel)
+        return buf.getvalue()
+
+    if ext in (".tif", ".tiff") and bilevel:
+        try:
+            buf = io.BytesIO()
+            _to_pil(image, True).save(buf, format="TIFF", **_tiff_compression(True, None))
+            return buf.getvalue()
+        except ImportError:
+            print("WARNING: Pillow is not installed; writing 8-bit LZW TIFF instead of G4")
+
+    ok, encoded = cv2.imencode(ext, image, _cv2_params(ext, bilevel, jpeg_quality, png_compression))
+    if not ok:
+        raise IOError(f"Could not encode output as {ext}")
+    return encoded.tobytes()
+
+
+def write_image(path, image, bilevel=False, jpeg_quality=None, png_compression=None):
+    """
+    Writes one image, choosing the format from the extension (see encode_image).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf" or (ext in (".tif", ".tiff") and bilevel):
+        data = encode_image(image, ext, bilevel, jpeg_quality, png_compression)
+        with open(path, "wb") as f:
+            f.write(data)
+        return
+    params = _cv2_params(ext, bilevel and is_bilevel(image), jpeg_quality, png_compression)
+    if not cv2.imwrite(path, image, params):
+        raise IOError(f"Could not write output to {path}")
+
+
+class TiffWriter:
+    """
+    Multi-page TIFF written page by page (Pillow's AppendingTiffWriter), so only
+    the current page is in memory. Bilevel pages use CCITT G4, others LZW (or
+    JPEG when jpeg_quality is set).
+    """
+    def __init__(self, path, jpeg_quality=None):
+        try:
+            from PIL import TiffImagePlugin
+        except ImportError:
+            raise ImportError("Multi-page TIFF output needs Pillow (pip install Pillow)")
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self.pages = 0
+        self._tmp_path = temp_path(path)
+        self._file = TiffImagePlugin.AppendingTiffWriter(self._tmp_path, new=True)
+
+    def add_page(self, image, bilevel=False):
+        bilevel = bilevel and is_bilevel(image)
+        _to_pil(image, bilevel).save(self._file, format="TIFF", **_tiff_compression(bilevel, self.jpeg_quality))
+        self._file.newFrame()
+        self.pages += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class PdfWriter:
+    """
+    Minimal streaming PDF writer: one image per page, written to the file as soon
+    as it is added; only page offsets are kept until close() writes the page tree
+    and cross-reference table.
+    - bilevel pages: 1 bit per pixel, Flate compressed
+    - gray / colour pages: JPEG (DCTDecode), jpeg_quality (default 90)
+    dpi sets the page size: a 2480x3508 image at 300 dpi is an A4 page.
+    path may be a file path or a binary file object.
+    """
+    def __init__(self, path, dpi=300, jpeg_quality=None):
+        self.dpi = dpi
+        self.jpeg_quality = 90 if jpeg_quality is None else int(jpeg_quality)
+        self.pages = 0
+        self.path = None
+        self._tmp_path = None
+        if isinstance(path, str):
+            self.path = path
+            self._tmp_path = temp_path(path)
+            self._file = open(self._tmp_path, "wb")
+        else:
+            self._file = path
+        self._start = self._file.tell()
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3  # 1: catalog, 2: page tree (written last)
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self._file.write(data)
+
+    def _object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell() - self._start
+        self._write(f"{obj_id} 0 obj\n".encode())
+        self._write(body)
+        if stream is not None:
+            self._write(b"\nstream\n")
+            self._write(stream)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def add_page(self, image, bilevel=False):
+        h, w = image.shape[:2]
+        if bilevel and is_bilevel(image):
+            data = zlib.compress(np.packbits(image > 127, axis=1).tobytes(), 6)
+            colorspace, bits, filt = "/DeviceGray", 1, "/FlateDecode"
+        else:
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise IOError("Could not encode page as JPEG")
+            data = encoded.tobytes()
+            colorspace = "/DeviceGray" if image.ndim == 2 else "/DeviceRGB"
+            bits, filt = 8, "/DCTDecode"
+
+        width_pt = w * 72.0 / self.dpi
+        height_pt = h * 72.0 / self.dpi
+        image_id, content_id, page_id = self._new_id(), self._new_id(), self._new_id()
+
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace {colorspace} "
+            f"/BitsPerComponent {bits} /Filter {filt} /Length {len(data)} >>").encode(), data)
+        content = f"q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode(), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>").encode())
+        self._page_ids.append(page_id)
+        self.pages += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        kids = " ".join(f"{i} 0 R" for i in self._page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode())
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._file.tell() - self._start
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._write("".join(lines).encode())
+
+        if self._tmp_path is not None:
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        self._file = None
+
+    def abort(self):
+        if self._tmp_path is not None and self._file is not None:
+            self._file.close()
+            os.remove(self._tmp_path)
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def open_document(path, jpeg_quality=None, dpi=300):
+    """
+    Multi-page writer for path: PdfWriter for .pdf, TiffWriter for .tif/.tiff.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        return PdfWriter(path, dpi=dpi, jpeg_quality=jpeg_quality)
+    if ext in (".tif", ".tiff"):
+        return TiffWriter(path, jpeg_quality=jpeg_quality)
+    raise ValueError(f"Multi-page output must be .pdf or .tif, got {path}")
@@ -0,0 +1,276 @@
+import os
+import time
+import queue
+import threading
+from .source import ImageSource
+
+# End-of-stream marker passed between stages
+_STOP = object()
+
+STAGES = ("decode", "detect", "rectify", "encode")
+
+DEFAULT_WORKERS = {
+    "decode": 2,
+    "detect": 1,
+    "rectify": 1,
+    "encode": 2,
+}
+
+
+class PipelineItem:
+    """
+    One image travelling through the pipeline. Stages fill in fields;
+    once 'error' is set, later stages pass the item through untouched.
+    """
+    def __init__(self, index, input_path, output_path):
+        self.index = index
+        self.input_path = input_path
+        self.output_path = output_path
+        self.source = None
+        self.data = None
+        self.cache_keys = None
+        self.corners_cached = False
+        self.detection = None  # Cached detection, then the detector's info
+        self.corners = None
+        self.checks = None
+        self.refine = False
+        self.result = None
+        self.encoded = None
+        self.info = {}
+        self.error = None
+        self.exception = None
+        self.timings = {}
+        self.started = time.perf_counter()
+
+    def summary(self):
+        from .preflight import PreflightRejected
+        summary = {
+            "index": self.index,
+            "input": self.input_path,
+            "output": self.output_path,
+            "status": "ok",
+            "error": self.error or "",
+            "timings": self.timings,
+            "seconds": round(time.perf_counter() - self.started, 4),
+        }
+        if isinstance(self.exception, PreflightRejected):
+            summary.update(status="rejected", reason=self.exception.reason)
+        elif self.error:
+            summary["status"] = "failed"
+        summary.update(self.info)
+        return summary
+
+
+class Pipeline:
+    """
+    Streaming decode -> detect -> rectify -> encode pipeline over one
+    DocumentProcessor. Every stage runs in its own pool of threads and stages
+    are connected by bounded queues, so disk I/O and image coding overlap the
+    CPU-bound stages (OpenCV releases the GIL) while memory stays capped by the
+    queue depth.
+
+    The stages are the two halves of DocumentProcessor._render, so an image
+    gets the same treatment as in process(): reduced decode for detection,
+    locked corners, pre-flight, refinement, fused or tiled rectify + enhance,
+    the result cache and the activity log.
+
+    Usage:
+        pipe = Pipeline(processor, enhance_mode='color', workers={'detect': 2})
+        for result in pipe.run(pairs):   # pairs: iterable of (input, output)
+            print(result['input'], result['status'])
+
+    Results are yielded in completion order; result['index'] gives the input position.
+    """
+    def __init__(self, processor, enhance_mode='scan', workers=None, queue_size=4):
+        self.processor = processor
+        self.enhance_mode = enhance_mode
+        self.workers = dict(DEFAULT_WORKERS)
+        if workers:
+            unknown = set(workers) - set(STAGES)
+            if unknown:
+                raise ValueError(f"Unknown pipeline stage(s): {sorted(unknown)}")
+            self.workers.update(workers)
+        self.workers = {name: max(1, int(n)) for name, n in self.workers.items()}
+        self.queue_size = queue_size
+
+    # --- Stage functions -------------------------------------------------
+
+    def _decode(self, item):
+        processor = self.processor
+        if processor.result_cache is not None:
+            with processor.metrics.stage("read"):
+                with open(item.input_path, 'rb') as f:
+                    item.data = f.read()
+            ext = os.path.splitext(item.output_path)[1]
+            item.cache_keys, stored, item.detection = processor._cache_lookup(item.data, self.enhance_mode, ext)
+            item.corners_cached = item.detection is not None
+            if stored is not None:
+                item.encoded, item.info = stored
+                return
+            item.source = ImageSource.from_bytes(item.data)
+        else:
+            item.source = processor.open_image(item.input_path)
+        if item.detection is None:
+            # The reduced decode for detection, off the detect thread
+            item.source.working_image(processor.DETECT_HEIGHT)
+
+    def _detect(self, item):
+        if item.encoded is not None:
+            return
+        item.corners, item.detection, item.checks, item.refine = \
+            self.processor._render_detect(item.source, item.detection)
+
+    def _rectify(self, item):
+        if item.encoded is not None:
+            return
+        spill_dir = os.path.dirname(os.path.abspath(item.output_path))
+        item.result, item.info = self.processor._render_rectify(
+            item.source, item.corners, item.detection, item.checks, self.enhance_mode, spill_dir, item.refine)
+        item.source = None
+
+    def _encode(self, item):
+        from .output import write_image, encode_image, temp_path
+        processor = self.processor
+        out_dir = os.path.dirname(item.output_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        # Temp name + rename, so an interrupted run never leaves a truncated output
+        ext = os.path.splitext(item.output_path)[1]
+        tmp_path = temp_path(item.output_path, f"-{item.index}")
+        try:
+            if item.result is not None and processor.result_cache is not None:
+                with processor.metrics.stage("encode"):
+                    item.encoded = encode_image(item.result, ext, **processor._encode_kwargs(self.enhance_mode))
+                item.info = processor._cache_store(item.cache_keys, item.info, item.encoded,
+                                                   item.corners_cached)
+            if item.encoded is not None:
+                with open(tmp_path, 'wb') as f:
+                    f.write(item.encoded)
+            else:
+                with processor.metrics.stage("encode"):
+                    write_image(tmp_path, item.result, **processor._encode_kwargs(self.enhance_mode))
+            os.replace(tmp_path, item.output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if item.result is not None and processor.memory_budget_mb:
+                from .tiled import release_output
+                release_output(item.result)
+            item.result = item.encoded = item.data = None
+
+    # --- Plumbing --------------------------------------------------------
+
+    # Every run has its own `closed` event, so two runs of one Pipeline (or a
+    # generator abandoned while another run starts) never stop each other.
+
+    def _put(self, q, value, closed):
+        # Blocking put that gives up once the consumer has gone away
+        while not closed.is_set():
+            try:
+                q.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q, closed):
+        while not closed.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _stage_worker(self, name, func, q_in, q_out, state, closed):
+        while True:
+            item = self._get(q_in, closed)
+            if item is _STOP:
+                break
+            if item.error is None:
+                start = time.perf_counter()
+                try:
+                    func(item)
+                except Exception as e:
+                    item.exception = e
+                    item.error = f"{name}: {type(e).__name__}: {e}"
+                    item.source = item.result = item.encoded = item.data = None
+                item.timings[name] = round(time.perf_counter() - start, 4)
+            if not self._put(q_out, item, closed):
+                break
+
+        # The last worker of a stage to finish forwards end-of-stream downstream
+        with state["lock"]:
+            state["alive"] -= 1
+            last = state["alive"] == 0
+        if last:
+            for _ in range(state["downstream"]):
+                self._put(q_out, _STOP, closed)
+
+    def _feed(self, items, q_out, downstream, run):
+        closed = run["closed"]
+        try:
+            for index, (input_path, output_path) in enumerate(items):
+                if not self._put(q_out, PipelineItem(index, input_path, output_path), closed):
+                    return
+        except Exception as e:
+            run["feed_error"] = e
+        finally:
+            for _ in range(downstream):
+                self._put(q_out, _STOP, closed)
+
+    def _finish(self, item):
+        # Counted and logged like DocumentProcessor.process()
+        processor = self.processor
+        summary = item.summary()
+        processor.metrics.count("images_total", status="ok" if item.error is None else "failed")
+        if processor.activity_log is not None:
+            record = dict(item.info, output=item.output_path, seconds=summary["seconds"],
+                          stages={name: round(t * 1000, 2) for name, t in item.timings.items()})
+            processor._log_activity(item.input_path, self.enhance_mode, record, item.exception)
+        return summary
+
+    def run(self, items):
+        """
+        Generator: consumes (input_path, output_path) pairs lazily and yields
+        one summary dict per image as soon as it has been written
+        (status ok / failed / rejected, like batch results).
+        """
+        run = {"closed": threading.Event(), "feed_error": None}
+        closed = run["closed"]
+        funcs = {
+            "decode": self._decode,
+            "detect": self._detect,
+            "rectify": self._rectify,
+            "encode": self._encode,
+        }
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(STAGES) + 1)]
+        threads = [threading.Thread(target=self._feed, daemon=True,
+                                    args=(items, queues[0], self.workers[STAGES[0]], run))]
+
+        for i, name in enumerate(STAGES):
+            count = self.workers[name]
+            downstream = self.workers[STAGES[i + 1]] if i + 1 < len(STAGES) else 1
+            state = {"lock": threading.Lock(), "alive": count, "downstream": downstream}
+            for n in range(count):
+                threads.append(threading.Thread(
+                    target=self._stage_worker, name=f"{name}-{n}", daemon=True,
+                    args=(name, funcs[name], queues[i], queues[i + 1], state, closed)))
+
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                item = self._get(queues[-1], closed)
+                if item is _STOP:
+                    break
+                yield self._finish(item)
+        finally:
+            # Also reached when the caller stops iterating early
+            closed.set()
+            for t in threads:
+                t.join()
+
+        if run["feed_error"] is not None:
+            raise run["feed_error"]
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+from .rectify import order_points
+
+# Reason codes reported by PreflightRejected.reason
+BLURRY = "blurry"
+TOO_DARK = "too_dark"
+TOO_BRIGHT = "too_bright"
+LOW_CONTRAST = "low_contrast"
+NO_DOCUMENT = "no_document"
+DOCUMENT_TOO_SMALL = "document_too_small"
+IMPLAUSIBLE_QUAD = "implausible_quad"
+
+REASONS = (BLURRY, TOO_DARK, TOO_BRIGHT, LOW_CONTRAST, NO_DOCUMENT, DOCUMENT_TOO_SMALL, IMPLAUSIBLE_QUAD)
+
+
+class PreflightRejected(Exception):
+    """
+    Raised when an input fails the pre-flight checks.
+    reason: one of REASONS; checks: the measured values (sharpness, exposure, quad).
+    """
+    def __init__(self, reason, message, checks=None):
+        super().__init__(f"{reason}: {message}")
+        self.reason = reason
+        self.message = message
+        self.checks = checks or {}
+
+    def __reduce__(self):
+        return PreflightRejected, (self.reason, self.message, self.checks)
+
+
+def _interior_angles(quad):
+    angles = []
+    for i in range(4):
+        a, b, c = quad[i - 1], quad[i], quad[(i + 1) % 4]
+        u, v = a - b, c - b
+        cos = np.dot(u, v) / (np.linalg.norm(u) * np.linalg.norm(v) + 1e-9)
+        angles.append(np.degrees(np.arccos(np.clip(cos, -1.0, 1.0))))
+    return angles
+
+
+class Preflight:
+    """
+    Cheap input checks on the downscaled detection image, so a bad capture is
+    rejected in milliseconds instead of paying for the full-resolution decode,
+    warp and enhancement.
+
+    check_image (before detection):
+    - sharpness: variance of the Laplacian (min_sharpness)
+    - exposure: 95th percentile below dark_level -> too dark, 5th percentile
+      above bright_level -> washed out, 5-95 spread below min_contrast
+    check_quad (after detection):
+    - no quad found (full-frame fallback), or a watershed quad whose outline
+      has no edge support (outline below min_outline: a blob of background,
+      not a page), unless allow_full_frame
+    - quad covering less than min_area of the frame
+    - non-convex quad, a corner angle below min_angle, or a side ratio above
+      max_aspect (no real page looks like that)
+    """
+    def __init__(self, min_sharpness=30.0, dark_level=60, bright_level=230, min_contrast=40,
+                 min_area=0.1, min_angle=50.0, max_aspect=4.0, min_outline=0.25, allow_full_frame=False):
+        self.min_sharpness = min_sharpness
+        self.dark_level = dark_level
+        self.bright_level = bright_level
+        self.min_contrast = min_contrast
+        self.min_area = min_area
+        self.min_angle = min_angle
+        self.max_aspect = max_aspect
+        self.min_outline = min_outline
+        self.allow_full_frame = allow_full_frame
+
+    def check_image(self, image):
+        """
+        Sharpness and exposure of the working image. Returns the measured values;
+        raises PreflightRejected.
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        cdf = np.cumsum(hist) / hist.sum()
+        p5, p95 = int(np.searchsorted(cdf, 0.05)), int(np.searchsorted(cdf, 0.95))
+        checks = {"sharpness": round(sharpness, 1), "p5": p5, "p95": p95}
+
+        if p95 < self.dark_level:
+            raise PreflightRejected(TOO_DARK, f"95% of pixels are below {p95}", checks)
+        if p5 > self.bright_level:
+            raise PreflightRejected(TOO_BRIGHT, f"95% of pixels are above {p5}", checks)
+        if p95 - p5 < self.min_contrast:
+            raise PreflightRejected(LOW_CONTRAST, f"brightness spread {p95 - p5} < {self.min_contrast}", checks)
+        if sharpness < self.min_sharpness:
+            raise PreflightRejected(BLURRY, f"sharpness {sharpness:.1f} < {self.min_sharpness}", checks)
+        return checks
+
+    def check_quad(self, corners, size, detection, checks=None):
+        """
+        Plausibility of the detected quad (full-resolution corners, image
+        (width, height)). Adds to and returns checks; raises PreflightRejected.
+        """
+        checks = dict(checks or {})
+        if detection.get("method") == "full_frame":
+            if self.allow_full_frame:
+                return checks
+            raise PreflightRejected(NO_DOCUMENT, "no document outline found", checks)
+        outline = detection.get("outline")
+        if outline is not None:
+            checks["outline"] = outline
+            if outline < self.min_outline and not self.allow_full_frame:
+                raise PreflightRejected(NO_DOCUMENT, f"watershed quad has no outline (edge support "
+                                                     f"{outline:.2f} < {self.min_outline})", checks)
+
+        quad = order_points(np.asarray(corners, dtype=np.float32).reshape(4, 2)).astype(np.float64)
+        w, h = size
+        area = abs(cv2.contourArea(quad.astype(np.float32))) / float(w * h)
+        sides = [np.linalg.norm(quad[(i + 1) % 4] - quad[i]) for i in range(4)]
+        width, height = sides[0] + sides[2], sides[1] + sides[3]
+        aspect = float(max(width, height) / max(min(width, height), 1e-9))
+        angle = float(min(_interior_angles(quad)))
+        checks.update(area=round(area, 3), aspect=round(aspect, 2), min_angle=round(angle, 1))
+
+        if area < self.min_area:
+            raise PreflightRejected(DOCUMENT_TOO_SMALL, f"quad covers {area:.0%} of the frame", checks)
+        if not cv2.isContourConvex(quad.astype(np.float32)):
+            raise PreflightRejected(IMPLAUSIBLE_QUAD, "quad is not convex", checks)
+        if angle < self.min_angle:
+            raise PreflightRejected(IMPLAUSIBLE_QUAD, f"corner angle {angle:.0f} deg < {self.min_angle:.0f}", checks)
+        if aspect > self.max_aspect:
+            raise PreflightRejected(IMPLAUSIBLE_QUAD, f"side ratio {aspect:.1f} > {self.max_aspect}", checks)
+        return checks
@@ -1,50 +1,96 @@
 import cv2
 import numpy as np
-import pytesseract
 import os
-from .utils import get_device_info
+import time
+from contextlib import contextmanager, nullcontext
+from .source import ImageSource
+from .metrics import NULL_METRICS, SIZE_BUCKETS
 
 class DocumentProcessor:
-    def __init__(self, mode='auto'):
+    # Height of the working image used for detection
+    DETECT_HEIGHT = 500
+
+    def __init__(self, mode='auto', refine_corners=False, detector='cascade', confidence_threshold=0.6,
+                 cache_remaps=False, locked_corners=None, memory_budget_mb=None, metrics=None,
+                 orientation='auto', orientation_threshold=0.5, encode_options=None, result_cache=None,
+                 activity_log=None, preflight=None):
+        if detector not in ('cascade', 'fast', 'watershed'):
+            raise ValueError(f"Unknown detector: {detector}")
+        if orientation not in ('auto', 'native', 'tesseract'):
+            raise ValueError(f"Unknown orientation estimator: {orientation}")
         self.mode = mode
-        self.device_info = get_device_info()
-        print(f"Initialized DocumentProcessor on {self.device_info}")
-        
-        # Robust Tesseract Path Check
-        # 1. Check common Windows install location
-        # 2. Check User local install
-        # 3. Fallback to PATH (default behavior of pytesseract if not set)
-        
-        paths_to_check = [
-            r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-            r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-            os.path.expandvars(r"%LOCALAPPDATA%\Programs\Tesseract-OCR\tesseract.exe")
-        ]
-        
-        found_tess = False
-        for path in paths_to_check:
-            if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                print(f"DEBUG: Found Tesseract at {path}")
-                found_tess = True
-                break
-        
-        if not found_tess:
-            print("DEBUG: Tesseract not found in common paths. Relying on System PATH.")
+        # Instrumentation (src.metrics.Metrics); the default no-op version costs nothing
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        # Per-image activity log (src.logger.ActivityLogger); records stage timings
+        self.activity_log = activity_log
+        self._stage_recorder = None
+        if activity_log is not None:
+            from .metrics import Metrics, StageRecorder
+            if not self.metrics.enabled:
+                self.metrics = Metrics()
+            self._stage_recorder = StageRecorder()
+            self.metrics.add_sink(self._stage_recorder)
+        self.refine_corners = refine_corners
+        self.detector = detector
+        self.confidence_threshold = confidence_threshold
+        # Orientation: native estimate first, Tesseract OSD only below the threshold ('auto')
+        self._orientation_options = {"mode": orientation, "threshold": orientation_threshold}
+        self._orientation_service = None
+        # Output encoding: jpeg_quality, png_compression, bilevel (1-bit scan output, default on)
+        self.encode_options = dict(encode_options or {})
+        # Pre-flight quality gate (src.preflight.Preflight, True for defaults or a dict of thresholds)
+        self.preflight = preflight
+        if preflight is True or isinstance(preflight, dict):
+            from .preflight import Preflight
+            self.preflight = Preflight(**(preflight if isinstance(preflight, dict) else {}))
+        # Content-addressed result cache (src.cache.ResultCache or its directory)
+        self.result_cache = result_cache
+        if isinstance(result_cache, str):
+            from .cache import ResultCache
+            self.result_cache = ResultCache(result_cache)
+        # When set, rectify + enhance run in strips within this budget (very large scans)
+        self.memory_budget_mb = memory_budget_mb
+        # Fixed-camera stations: cached remap tables and an optional locked quad
+        self.remap_cache = None
+        if cache_remaps:
+            from .rectify import RemapCache
+            self.remap_cache = RemapCache()
+        self.locked_corners = None
+        if locked_corners is not None:
+            self.lock_corners(locked_corners)
+        # Optional subsystems (device probe, orientation/Tesseract) start on first use
+        self._device_info = None
+        print(f"Initialized DocumentProcessor ({mode})")
+
+    @property
+    def device_info(self):
+        """
+        Hardware backends (probed on first access, cached on disk between runs).
+        """
+        if self._device_info is None:
+            from .utils import get_device_info
+            self._device_info = get_device_info()
+            print(f"DEBUG: Device info: {self._device_info}")
+        return self._device_info
+
+    @property
+    def orientation_service(self):
+        if self._orientation_service is None:
+            from .orientation import OrientationService
+            self._orientation_service = OrientationService(**self._orientation_options)
+        return self._orientation_service
 
     def correct_orientation(self, image):
         """
-        Detects text orientation using Tesseract OSD and rotates the image.
+        Detects text orientation and rotates the image.
+        The native estimator (src.orientation) runs first; Tesseract OSD is only
+        called when its confidence is below orientation_threshold.
         Returns: Rotated Image, Boolean (True if rotated)
         """
         try:
-            # Get OSD (Orientation Script Detection)
-            # Output dict: {'PageNum': 0, 'Orientation': 0, 'Rotate': 0, ...}
-            # Rotate: Amount of rotation needed (0, 90, 180, 270)
-            results = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
-            print(f"DEBUG: Tesseract OSD Result: {results}")
-            rotation = results["rotate"]
-            
+            with self.metrics.stage("orientation"):
+                rotation = self.estimate_rotation(image)
+
             if rotation == 0:
                 print("DEBUG: Orientation is correct (0 deg).")
                 return image, False
@@ -66,125 +112,603 @@ class DocumentProcessor:
             # Raise it so GUI knows IT FAILED, not just "False" which means "Correct"
             raise e
 
+    def estimate_rotation(self, image):
+        """
+        Clockwise rotation (0, 90, 180, 270) that makes the text upright.
+        """
+        result = self.orientation_service.estimate(image)
+        self.metrics.count("orientation_total", estimator=result["estimator"],
+                           cached=str(result["cached"]).lower())
+        return result["rotate"]
+
     def load_image(self, path):
-        return cv2.imread(path)
+        with self.metrics.stage("decode"):
+            return cv2.imread(path)
 
-    def process(self, image_path, output_path):
-        img = self.load_image(image_path)
-        if img is None:
-            raise FileNotFoundError(f"Image not found at {image_path}")
-        
-        # 1. Detect
-        contours = self.detect_document(img)
-        
-        # 2. Rectify
-        warped = self.rectify(img, contours)
-        
-        # 3. Enhance
-        final = self.enhance(warped)
-        
-        cv2.imwrite(output_path, final)
+    def open_image(self, path):
+        """
+        Returns a lazily decoded ImageSource: detection uses a reduced-resolution
+        decode and the full image is only decoded when the warp needs it.
+        """
+        return ImageSource(path)
+
+    def process(self, image_path, output_path, enhance_mode='scan'):
+        with self._activity(image_path, enhance_mode, output=output_path) as record:
+            try:
+                with self.metrics.stage("total"):
+                    info = self._process(image_path, output_path, enhance_mode)
+            except Exception:
+                self.metrics.count("images_total", status="failed")
+                raise
+            self.metrics.count("images_total", status="ok")
+            record.update(info)
+        return info
+
+    @contextmanager
+    def _activity(self, input_name, enhance_mode, **fields):
+        """
+        Logs one processed image to activity_log (if set) with its status, the
+        info dict the block puts into the yielded record and the stage timings.
+        """
+        record = dict(fields)
+        if self.activity_log is None:
+            yield record
+            return
+        self._stage_recorder.begin()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield record
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            record["stages"] = self._stage_recorder.end()
+            self._log_activity(input_name, enhance_mode, record, error)
+
+    def _log_activity(self, input_name, enhance_mode, record, error=None):
+        """
+        Writes one activity log record; error is the exception that stopped the image, if any.
+        """
+        status = "Success"
+        if error is not None:
+            from .preflight import PreflightRejected
+            status = "Rejected" if isinstance(error, PreflightRejected) else "Failed"
+            record["error"] = f"{type(error).__name__}: {error}"
+            if isinstance(error, PreflightRejected):
+                record.update(reason=error.reason, preflight=error.checks)
+        self.activity_log.log_process(input_name, self.detector, enhance_mode, status, **record)
+
+    def _process(self, image_path, output_path, enhance_mode):
+        from .output import write_image, temp_path
+        # Write to a temp name and rename, so an interrupted run never leaves a
+        # truncated output that --resume would treat as done.
+        ext = os.path.splitext(output_path)[1]
+        tmp_path = temp_path(output_path)
+        if self.result_cache is not None:
+            with self.metrics.stage("read"):
+                with open(image_path, 'rb') as f:
+                    data = f.read()
+            encoded, info = self._encode_cached(data, enhance_mode, ext,
+                                                spill_dir=os.path.dirname(os.path.abspath(output_path)))
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(encoded)
+                os.replace(tmp_path, output_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            print(f"Saved to {output_path}")
+            return info
+
+        source = self.open_image(image_path)
+        final, info = self._render(source, enhance_mode,
+                                   spill_dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            with self.metrics.stage("encode"):
+                write_image(tmp_path, final, **self._encode_kwargs(enhance_mode))
+            os.replace(tmp_path, output_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            if self.memory_budget_mb:
+                from .tiled import release_output
+                release_output(final)
         print(f"Saved to {output_path}")
+        return info
 
-    def detect_document(self, img):
+    def process_bytes(self, data, enhance_mode='scan', ext='.png'):
         """
-        Robust Detection Strategy (Merged):
-        Uses Center-Seeded Watershed to handle complex backgrounds (grates, crumpled paper) 
-        while maintaining precise edge detection.
-        1. Resize & Blur.
-        2. Gradient Calculation (Sobel).
-        3. Markers: Center = Paper, Corners = Background.
-        4. Watershed Segmentation.
-        5. Contour Approximation (Iterative).
-        """
-        # Resize for speed and noise reduction
-        target_height = 500
-        ratio = img.shape[0] / float(target_height)
-        image = cv2.resize(img, (int(img.shape[1] / ratio), target_height))
-        h, w = image.shape[:2]
-        
-        # 1. Blur & Grayscale
-        blurred = cv2.GaussianBlur(image, (5, 5), 0)
-        gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY)
-        
-        # 2. Gradient (Sobel) to find edges/elevation
-        grad_x = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
-        gradient = cv2.magnitude(grad_x, grad_y)
-        gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
-        
-        # 3. Markers
-        markers = np.zeros((h, w), dtype=np.int32)
-        
-        # Background Marker: Corners (assumed background)
-        cv2.circle(markers, (5, 5), 10, 1, -1)
-        cv2.circle(markers, (w-5, 5), 10, 1, -1)
-        cv2.circle(markers, (w-5, h-5), 10, 1, -1)
-        cv2.circle(markers, (5, h-5), 10, 1, -1)
-        
-        # Foreground Marker: Center (assumed paper)
-        cx, cy = w // 2, h // 2
-        cv2.circle(markers, (cx, cy), 40, 2, -1)
-        
-        # 4. Watershed
-        watershed_mask = cv2.watershed(blurred, markers)
-        
-        # Extract Foreground (Label 2)
-        mask = np.zeros((h, w), dtype=np.uint8)
-        mask[watershed_mask == 2] = 255
-        
-        # TIGHTEN: Reduced erosion to 1 to avoid cutting text, but keep edges clean
-        mask = cv2.erode(mask, None, iterations=1)
-        
-        # 5. Find Contour of the "Center Blob"
-        cnts = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cnts = cnts[0] if len(cnts) == 2 else cnts[1]
-        
-        if not cnts:
-            # Fallback for completely failed detection
-            print("Detection failed, returning full frame.")
-            return np.array([[[0, 0]], [[img.shape[1], 0]], [[img.shape[1], img.shape[0]]], [[0, img.shape[0]]]]).reshape(4, 2)
-            
-        c = max(cnts, key=cv2.contourArea)
-        
-        # Approximate loop to find 4 points
-        peri = cv2.arcLength(c, True)
-        screenCnt = None
-        
-        # Iterative Approximation
-        for epsilon_factor in np.linspace(0.02, 0.10, 10):
-            approx = cv2.approxPolyDP(c, epsilon_factor * peri, True)
-            if len(approx) == 4:
-                screenCnt = approx
-                break
+        In-memory version of process(): decodes encoded image bytes and returns
+        (encoded output bytes, info dict). No temporary files are involved.
+        ext picks the output format ('.png', '.jpg', '.tif', '.pdf', ...).
+        """
+        from .output import encode_image
+        with self._activity(None, enhance_mode, input_bytes=len(data), format=ext) as record:
+            try:
+                with self.metrics.stage("total"):
+                    if self.result_cache is not None:
+                        encoded, info = self._encode_cached(data, enhance_mode, ext)
+                    else:
+                        source = ImageSource.from_bytes(data)
+                        final, info = self._render(source, enhance_mode)
+                        with self.metrics.stage("encode"):
+                            encoded = encode_image(final, ext, **self._encode_kwargs(enhance_mode))
+            except Exception:
+                self.metrics.count("images_total", status="failed")
+                raise
+            self.metrics.count("images_total", status="ok")
+            record.update(info, output_bytes=len(encoded))
+        return encoded, info
+
+    def render(self, image_path, enhance_mode='scan'):
+        """
+        process() without writing: returns (enhanced image, info dict), e.g. to
+        add the page to a multi-page document (src.output.open_document).
+        """
+        with self._activity(image_path, enhance_mode) as record:
+            try:
+                with self.metrics.stage("total"):
+                    final, info = self._render(self.open_image(image_path), enhance_mode)
+            except Exception:
+                self.metrics.count("images_total", status="failed")
+                raise
+            self.metrics.count("images_total", status="ok")
+            record.update(info)
+        return final, info
+
+    def process_all(self, image_path, output_path, enhance_mode='scan', max_documents=10):
+        """
+        Multi-document version of process(): every document found in the image
+        (see detect_all) is rectified, enhanced and written to a numbered output,
+        output_path -> <name>_1.png, <name>_2.png, ...
+        Returns a list of info dicts (one per document, with 'output'). The list of
+        outputs is written last (src.output.documents_marker), so resume can tell
+        a complete set from an interrupted one.
+        """
+        from .output import write_image, numbered_path, documents_marker, read_documents_marker, temp_path
+        with self._activity(image_path, enhance_mode, output=output_path) as record:
+            try:
+                with self.metrics.stage("total"):
+                    documents = self.render_all(image_path, enhance_mode, max_documents=max_documents)
+                    previous = read_documents_marker(output_path) or []
+                    marker = documents_marker(output_path)
+                    if os.path.exists(marker):
+                        os.remove(marker)  # Incomplete until the last output is written
+                    infos = []
+                    for number, (final, info) in enumerate(documents, 1):
+                        path = numbered_path(output_path, number)
+                        tmp_path = temp_path(path)
+                        with self.metrics.stage("encode"):
+                            write_image(tmp_path, final, **self._encode_kwargs(enhance_mode))
+                        os.replace(tmp_path, path)
+                        infos.append(dict(info, output=path))
+                        print(f"Saved to {path}")
+                    outputs = [i["output"] for i in infos]
+                    for path in previous:
+                        if path not in outputs and os.path.exists(path):
+                            os.remove(path)  # An earlier run found more documents
+                    tmp_path = f"{marker}.part{os.getpid()}"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write("".join(os.path.basename(p) + "\n" for p in outputs))
+                    os.replace(tmp_path, marker)
+            except Exception:
+                self.metrics.count("images_total", status="failed")
+                raise
+            self.metrics.count("images_total", status="ok")
+            record.update(documents=len(infos), outputs=outputs)
+        return infos
+
+    def render_all(self, image, enhance_mode='scan', max_documents=10, workers=None):
+        """
+        Detects every document in one pass and rectifies + enhances them in
+        parallel threads (OpenCV releases the GIL), sharing one full-resolution
+        decode. image: path, BGR array or ImageSource.
+        Returns a list of (enhanced image, info dict) in reading order.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        if isinstance(image, str):
+            source = self.open_image(image)
+        elif isinstance(image, ImageSource):
+            source = image
+        else:
+            source = ImageSource.from_array(image)
+
+        checks = self._preflight(source) if self.preflight is not None else None
+        documents = self.detect_all(source, max_documents=max_documents)
+        with self.metrics.stage("decode"):
+            img = source.full()
+        self.metrics.observe("input_megapixels", img.shape[0] * img.shape[1] / 1e6, buckets=SIZE_BUCKETS)
+        if self.refine_corners:
+            documents = [(self.refine(img, corners), info) for corners, info in documents]
+
+        def render_one(document):
+            corners, info = document
+            final = self.rectify_enhance(img, corners, enhance_mode)
+            info = dict(info)
+            info["corners"] = np.round(np.asarray(corners, dtype=np.float64), 1).tolist()
+            info["input_size"] = [img.shape[1], img.shape[0]]
+            info["output_size"] = [final.shape[1], final.shape[0]]
+            if checks is not None:
+                info["preflight"] = checks
+            return final, info
+
+        # Within the OpenCV thread budget of this process (see src.resources)
+        workers = workers or min(len(documents), max(1, cv2.getNumThreads()))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(render_one, documents))
+        else:
+            results = [render_one(d) for d in documents]
+        img = None
+        source.release()
+        return results
+
+    def detect_all(self, img, max_documents=10):
+        """
+        Finds all documents in one pass over the working image (several receipts
+        or slips in one photo, see detect.detect_multiple). Falls back to the
+        single-document detect() when no page-like quad stands out.
+        Accepts a BGR array or an ImageSource.
+        Returns a list of (4x2 corners in full-resolution coordinates, info dict),
+        top to bottom, then left to right.
+        """
+        from .detect import detect_multiple
+        source = img if isinstance(img, ImageSource) else ImageSource.from_array(img)
+        with self.metrics.stage("detect_multi"):
+            image, scale_x, scale_y = source.working_image(self.DETECT_HEIGHT)
+            found = detect_multiple(image, max_documents=max_documents)
+        if found:
+            self.metrics.count("detections_total", detector="multi", method="contour", value=len(found))
+            documents = []
+            for quad, score in found:
+                corners = quad.reshape(4, 2) * np.array([scale_x, scale_y])
+                documents.append((corners, {"detector": "multi", "method": "contour", "confidence": score}))
+            # Reading order: by centre row band (a fifth of the height), then by x
+            band = source.height / 5.0
+            documents.sort(key=lambda d: (int(d[0][:, 1].mean() // band), d[0][:, 0].mean()))
+        else:
+            corners, info = self.detect(source)
+            if self.preflight is not None:
+                self._preflight(source, corners, info)
+            documents = [(corners, info)]
+        for number, (_, info) in enumerate(documents, 1):
+            info["document"] = number
+        return documents
+
+    def _encode_kwargs(self, enhance_mode):
+        options = dict(self.encode_options)
+        # Scan output is 0/255: store it with 1 bit per pixel where the format allows
+        options["bilevel"] = enhance_mode == 'scan' and options.get("bilevel", True)
+        return options
+
+    def _cache_params(self, enhance_mode=None, ext=None):
+        # Everything the cached result depends on besides the input bytes
+        params = {
+            "detector": self.detector,
+            "confidence_threshold": self.confidence_threshold,
+            "refine_corners": bool(self.refine_corners),
+            "locked_corners": None if self.locked_corners is None else self.locked_corners.tolist(),
+            "detect_height": self.DETECT_HEIGHT,
+        }
+        if enhance_mode is not None:
+            # The output also depends on the warp path, and it exists only if it passed pre-flight
+            # with these thresholds (so an output hit needs no new check)
+            params.update(enhance_mode=enhance_mode, ext=ext.lower(), opencv=cv2.__version__,
+                          encode=self._encode_kwargs(enhance_mode),
+                          memory_budget_mb=self.memory_budget_mb,
+                          remap_cache=self.remap_cache is not None,
+                          preflight=None if self.preflight is None else vars(self.preflight))
+        return params
+
+    def output_digest(self, enhance_mode, ext):
+        """
+        Short digest of everything an output depends on besides its input (the
+        result cache parameters): batch runs store it beside their outputs, so
+        resume can tell an output written with other options from a fresh one.
+        """
+        import json
+        import hashlib
+        blob = json.dumps(self._cache_params(enhance_mode, ext), sort_keys=True)
+        return hashlib.blake2b(blob.encode("utf-8"), digest_size=12).hexdigest()
+
+    def _encode_cached(self, data, enhance_mode, ext, spill_dir=None):
+        """
+        Encoded output for image bytes through the result cache: a stored output is
+        returned as is; otherwise cached corners skip detection, and the new
+        corners (and output, if store_outputs) are stored.
+        Returns (encoded bytes, info dict with 'cached': 'output' / 'corners' / None).
+        """
+        from .output import encode_image
+        keys, stored, detection = self._cache_lookup(data, enhance_mode, ext)
+        if stored is not None:
+            return stored
+
+        final, info = self._render(ImageSource.from_bytes(data), enhance_mode, spill_dir=spill_dir,
+                                   detection=detection)
+        try:
+            with self.metrics.stage("encode"):
+                encoded = encode_image(final, ext, **self._encode_kwargs(enhance_mode))
+        finally:
+            if self.memory_budget_mb:
+                from .tiled import release_output
+                release_output(final)
+        return encoded, self._cache_store(keys, info, encoded, detection is not None)
+
+    def _cache_lookup(self, data, enhance_mode, ext):
+        """
+        Looks image bytes up in the result cache.
+        Returns (keys for _cache_store, (encoded, info) of a stored output or None,
+        cached detection or None).
+        """
+        cache = self.result_cache
+        with self.metrics.stage("cache_lookup"):
+            content = cache.content_hash(data)
+            output_key = cache.key(content, self._cache_params(enhance_mode, ext))
+            entry = cache.get(output_key) if cache.store_outputs else None
+            if entry is not None and entry[1] is not None:
+                self.metrics.count("result_cache_total", kind="output", result="hit")
+                return None, (entry[1], dict(entry[0], cached="output")), None
+            corners_key = cache.key(content, self._cache_params())
+            detection = cache.get(corners_key)
+        self.metrics.count("result_cache_total", kind="corners", result="miss" if detection is None else "hit")
+        return (output_key, corners_key), None, None if detection is None else detection[0]
+
+    def _cache_store(self, keys, info, encoded, corners_cached):
+        """
+        Stores a rendered result under the keys from _cache_lookup. Returns the info dict
+        with 'cached' set.
+        """
+        cache = self.result_cache
+        output_key, corners_key = keys
+        with self.metrics.stage("cache_store"):
+            if not corners_cached:
+                cache.put(corners_key, info)
+            if cache.store_outputs:
+                cache.put(output_key, info, encoded)
+        return dict(info, cached="corners" if corners_cached else None)
+
+    def _render(self, source, enhance_mode, spill_dir=None, detection=None):
+        contours, detection, checks, refine = self._render_detect(source, detection)
+        return self._render_rectify(source, contours, detection, checks, enhance_mode, spill_dir, refine)
+
+    def _render_detect(self, source, detection=None):
+        """
+        First half of _render: pre-flight and detection on the reduced decode, unless a
+        cached detection is given. Returns (corners, detection info, pre-flight checks,
+        whether the corners still need refining).
+        """
+        if detection is not None:
+            detection = dict(detection)
+            detection.pop("preflight", None)
+            contours = np.asarray(detection.pop("corners"), dtype=np.float32)
+            checks = None
+            if self.preflight is not None:
+                # Cached corners skip detection, not the quality gate
+                checks = self._preflight(source)
+                checks = self._preflight(source, contours, detection, checks)
+            return contours, detection, checks, False
+        checks = None
+        if self.preflight is not None:
+            checks = self._preflight(source)
+        contours, detection = self.detect(source)
+        if self.preflight is not None:
+            checks = self._preflight(source, contours, detection, checks)
+        return contours, detection, checks, self.refine_corners and self.locked_corners is None
+
+    def _render_rectify(self, source, contours, detection, checks, enhance_mode, spill_dir=None, refine=False):
+        """
+        Second half of _render: full-resolution decode, optional refinement, rectify +
+        enhance. Releases the source. Returns (enhanced image, info dict).
+        """
+        with self.metrics.stage("decode"):
+            img = source.full()
+        self.metrics.observe("input_megapixels", img.shape[0] * img.shape[1] / 1e6, buckets=SIZE_BUCKETS)
+        if refine:
+            contours = self.refine(img, contours)
+
+        if self.memory_budget_mb:
+            # Tiled rectify + enhance within the memory budget
+            final = self.rectify_enhance_tiled(img, contours, enhance_mode, spill_dir=spill_dir)
+        else:
+            # Rectify + Enhance (fused per output mode)
+            final = self.rectify_enhance(img, contours, enhance_mode)
+        img = None
+        source.release()
         
-        if screenCnt is None:
-            # Convex Hull Fallback
-            hull = cv2.convexHull(c)
-            peri_hull = cv2.arcLength(hull, True)
-            approx = cv2.approxPolyDP(hull, 0.04 * peri_hull, True)
-            if len(approx) == 4:
-                screenCnt = approx
+        self.metrics.observe("output_megapixels", final.shape[0] * final.shape[1] / 1e6, buckets=SIZE_BUCKETS)
+        info = dict(detection)
+        info["corners"] = np.round(np.asarray(contours, dtype=np.float64), 1).tolist()
+        info["input_size"] = list(source.size)
+        info["output_size"] = [final.shape[1], final.shape[0]]
+        if checks is not None:
+            info["preflight"] = checks
+        return final, info
+
+    def _preflight(self, source, corners=None, detection=None, checks=None):
+        """
+        Pre-flight checks on the detection-size working image (before detection)
+        or on the detected quad (after). Raises src.preflight.PreflightRejected,
+        so a bad capture never reaches the full-resolution decode.
+        """
+        from .preflight import PreflightRejected
+        try:
+            with self.metrics.stage("preflight"):
+                if corners is None:
+                    return self.preflight.check_image(source.working_image(self.DETECT_HEIGHT)[0])
+                return self.preflight.check_quad(corners, source.size, detection, checks)
+        except PreflightRejected as e:
+            self.metrics.count("preflight_rejected_total", reason=e.reason)
+            raise
+
+    def detect(self, img, detector=None):
+        """
+        Detector cascade. The fast Canny/contour detector runs first; the
+        center-seeded watershed only runs when its confidence is below
+        confidence_threshold (or when a single detector is forced via 'detector';
+        the detector argument overrides it for this call).
+        Accepts a BGR array or an ImageSource (which avoids the full-resolution decode).
+        Returns: (4x2 corners in full-resolution coordinates, info dict) where info
+        reports the detector used ('fast' / 'watershed'), the method that produced
+        the quad and the fast detector's confidence.
+        """
+        if self.locked_corners is not None:
+            # Calibrated fixed-camera station: no detection at all
+            self.metrics.count("detections_total", detector="locked", method="locked")
+            return self.locked_corners.copy(), {"detector": "locked", "method": "locked", "confidence": None}
+
+        with self.metrics.stage("detect"):
+            corners, info = self._detect(img, detector or self.detector)
+        self.metrics.count("detections_total", detector=info["detector"] or "none", method=info["method"])
+        return corners, info
+
+    def _detect(self, img, detector):
+        from .detect import detect_fast, detect_watershed, outline_support
+
+        source = img if isinstance(img, ImageSource) else ImageSource.from_array(img)
+
+        # Resize for speed and noise reduction (reduced decode for files)
+        with self.metrics.stage("detect_prepare"):
+            full_w, full_h = source.size
+            image, scale_x, scale_y = source.working_image(self.DETECT_HEIGHT)
+
+        info = {"detector": None, "method": None, "confidence": None}
+        quad = None
+
+        if detector in ('cascade', 'fast'):
+            with self.metrics.stage("detect_fast"):
+                quad, confidence = detect_fast(image)
+            info["confidence"] = round(confidence, 3)
+            if quad is not None and (detector == 'fast' or confidence >= self.confidence_threshold):
+                info["detector"], info["method"] = "fast", "contour"
             else:
-                # Bounding Rect Fallback
-                rect = cv2.minAreaRect(c)
-                box = cv2.boxPoints(rect)
-                screenCnt = np.int64(box)
-                screenCnt = screenCnt.reshape(4, 1, 2)
-            
-        return screenCnt.reshape(4, 2) * ratio
+                quad = None
+
+        if quad is None and detector != 'fast':
+            with self.metrics.stage("detect_watershed"):
+                quad, method = detect_watershed(image)
+                if quad is not None:
+                    # Watershed always returns a region; pre-flight checks it is a page
+                    info["outline"] = round(outline_support(image, quad), 3)
+            info["detector"], info["method"] = "watershed", method
 
+        if quad is None:
+            info["method"] = "full_frame"
+            corners = np.array([[0, 0], [full_w, 0], [full_w, full_h], [0, full_h]])
+            return corners, info
+
+        return quad.reshape(4, 2) * np.array([scale_x, scale_y]), info
+
+    def detect_document(self, img):
+        """
+        Returns the 4 document corners in full-resolution coordinates (see detect()).
+        """
+        return self.detect(img)[0]
+
+    def lock_corners(self, corners):
+        """
+        Locks the document quad (e.g. for a copy stand): detect() then returns these
+        corners without looking at the image, and rectification uses cached remap
+        tables. Pass None to unlock.
+        """
+        if corners is None:
+            self.locked_corners = None
+            return
+        from .rectify import RemapCache, order_points
+        self.locked_corners = order_points(np.asarray(corners, dtype=np.float32).reshape(4, 2))
+        if self.remap_cache is None:
+            self.remap_cache = RemapCache(quantum=0)  # The quad never jitters: keep it exact
+
+    def calibrate(self, img):
+        """
+        Detects the document once on a calibration capture (path, array or ImageSource)
+        and locks its corners for all following images.
+        Returns the locked corners.
+        """
+        if isinstance(img, str):
+            img = self.open_image(img)
+        self.lock_corners(None)
+        corners = self.detect_document(img)
+        if self.refine_corners:
+            full = img.full() if isinstance(img, ImageSource) else img
+            corners = self.refine(full, corners)
+        self.lock_corners(corners)
+        return self.locked_corners.copy()
+
+    def refine(self, img, contours):
+        """
+        Refines coarse corners from detect_document against the full-resolution image,
+        searching only narrow bands around each side.
+        """
+        from .refine import refine_corners
+        # Coarse corners are accurate to a few working-image pixels
+        search = int(np.ceil(3 * img.shape[0] / float(self.DETECT_HEIGHT)))
+        with self.metrics.stage("refine"):
+            return refine_corners(img, contours, search=search)
 
     def rectify(self, img, contours):
-        from .rectify import four_point_transform
-        return four_point_transform(img, contours)
+        with self.metrics.stage("rectify"):
+            if self.remap_cache is not None:
+                return self.remap_cache.warp(img, contours)
+            from .rectify import four_point_transform
+            return four_point_transform(img, contours)
+
+    def rectify_enhance(self, img, contours, mode='scan'):
+        """
+        Same result as enhance(rectify(img, contours), mode) with less memory traffic:
+        scan mode warps only luma, color mode reuses its CLAHE and LAB buffers.
+        """
+        if self.remap_cache is not None:
+            # Cached remap tables are in full-image coordinates
+            return self.enhance(self.rectify(img, contours), mode=mode)
+
+        from .fused import rectify_scan, rectify_color, rectify_original
+        with self.metrics.stage("rectify_enhance", mode=mode), self._scratch():
+            if mode == 'scan':
+                return rectify_scan(img, contours)
+            elif mode == 'color':
+                return rectify_color(img, contours)
+            return rectify_original(img, contours)
+
+    def rectify_enhance_tiled(self, img, contours, mode='scan', spill_dir=None):
+        """
+        Rectifies and enhances in strips so peak memory stays near memory_budget_mb.
+        If the output itself exceeds the budget and spill_dir is given, it is written
+        into an np.memmap-backed temp file there (release with tiled.release_output).
+        """
+        from .tiled import rectify_enhance_tiled, allocate_output, output_nbytes
+        from .rectify import order_points, output_size
+        budget_mb = self.memory_budget_mb or 256
+
+        out = None
+        if spill_dir is not None and output_nbytes(contours, mode) > budget_mb * 1024 * 1024:
+            import tempfile
+            width, height = output_size(order_points(np.asarray(contours, dtype=np.float32)))
+            shape = (height, width) if mode == 'scan' else (height, width, 3)
+            fd, path = tempfile.mkstemp(suffix=".npy", dir=spill_dir)
+            os.close(fd)
+            out = allocate_output(shape, path=path)
+        with self.metrics.stage("rectify_enhance_tiled", mode=mode), self._scratch():
+            return rectify_enhance_tiled(img, contours, mode=mode, out=out, memory_mb=budget_mb)
+
+    def _scratch(self):
+        # With a memory budget, no scratch buffer outlives the call (src.enhance.get_buffer)
+        if self.memory_budget_mb:
+            from .enhance import uncached_buffers
+            return uncached_buffers()
+        return nullcontext()
 
     def enhance(self, img, mode='scan'):
         from .enhance import enhance_scan, enhance_magic_color
-        if mode == 'scan':
-            return enhance_scan(img)
-        elif mode == 'color':
-            return enhance_magic_color(img)
-        elif mode == 'original':
-            return img # Return rectified but not enhanced
-        return img
+        with self.metrics.stage("enhance", mode=mode), self._scratch():
+            if mode == 'scan':
+                return enhance_scan(img)
+            elif mode == 'color':
+                return enhance_magic_color(img)
+            elif mode == 'original':
+                return img # Return rectified but not enhanced
+            return img
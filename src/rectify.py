@@ -1,5 +1,10 @@
 import cv2
 import numpy as np
+import threading
+from collections import OrderedDict
+
+# cv2.remap and its CV_16SC2 tables hold coordinates in signed 16 bits
+SHRT_MAX = 32767
 
 def order_points(pts):
     """
@@ -24,17 +29,9 @@ def four_point_transform(image, pts):
     Applies perspective transform to obtain a top-down view.
     """
     rect = order_points(pts)
-    (tl, tr, br, bl) = rect
     
-    # Compute width of new image
-    widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
-    widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
-    maxWidth = max(int(widthA), int(widthB))
-    
-    # Compute height of new image
-    heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
-    heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
-    maxHeight = max(int(heightA), int(heightB))
+    # Compute size of new image
+    maxWidth, maxHeight = output_size(rect)
     
     # Destination points
     dst = np.array([
@@ -48,3 +45,95 @@ def four_point_transform(image, pts):
     warped = cv2.warpPerspective(image, M, (maxWidth, maxHeight))
     
     return warped
+
+def output_size(rect):
+    """
+    Size (width, height) of the top-down view for ordered corners.
+    """
+    (tl, tr, br, bl) = rect
+    widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
+    widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
+    heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
+    heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
+    return max(int(widthA), int(widthB)), max(int(heightA), int(heightB))
+
+class RemapCache:
+    """
+    LRU of precomputed rectification maps for fixed-camera setups.
+    For a given quad the perspective warp is turned once into fixed-point remap
+    tables (cv2.convertMaps -> CV_16SC2), which are then applied with cv2.remap,
+    skipping getPerspectiveTransform and the per-pixel floating point projection.
+    Corners are quantised to 'quantum' pixels, so detections that jitter by a
+    pixel or two share an entry; quantum=0 keeps them exact (locked corners,
+    which never jitter). Each entry costs ~6 bytes per output pixel.
+    Sources or outputs with a side of SHRT_MAX pixels or more are beyond
+    cv2.remap; warp() takes the exact four_point_transform path for them.
+    """
+    def __init__(self, max_entries=4, quantum=2.0):
+        self.max_entries = max_entries
+        self.quantum = float(quantum)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build(self, rect):
+        max_width, max_height = output_size(rect)
+        dst = np.array([
+            [0, 0],
+            [max_width - 1, 0],
+            [max_width - 1, max_height - 1],
+            [0, max_height - 1]], dtype="float32")
+        M_inv = cv2.getPerspectiveTransform(dst, rect)
+
+        # Project every output pixel back into the source image
+        xs = np.arange(max_width, dtype=np.float32)
+        ys = np.arange(max_height, dtype=np.float32)[:, None]
+        w = M_inv[2, 0] * xs + M_inv[2, 1] * ys + M_inv[2, 2]
+        map_x = ((M_inv[0, 0] * xs + M_inv[0, 1] * ys + M_inv[0, 2]) / w).astype(np.float32)
+        map_y = ((M_inv[1, 0] * xs + M_inv[1, 1] * ys + M_inv[1, 2]) / w).astype(np.float32)
+        map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        return map1, map2
+
+    def maps(self, pts, src_shape):
+        """
+        Returns the (map1, map2) fixed-point tables for pts on an image of src_shape.
+        """
+        rect = order_points(np.asarray(pts, dtype=np.float32))
+        if self.quantum > 0:
+            rect = (np.round(rect / self.quantum) * self.quantum).astype(np.float32)
+        key = (tuple(rect.ravel().tolist()), tuple(src_shape[:2]))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = self._build(rect)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def warp(self, image, pts):
+        """
+        four_point_transform through the cached tables. Not bit-identical to it:
+        the warp uses the quantised corners (each moved by up to quantum / 2
+        pixels, which can also change the output size by a pixel), and the
+        fixed-point tables interpolate at 1/32 pixel. With quantum=0 only the
+        interpolation differs.
+        """
+        rect = order_points(np.asarray(pts, dtype=np.float32))
+        if max(image.shape[:2]) >= SHRT_MAX or max(output_size(rect)) >= SHRT_MAX:
+            return four_point_transform(image, rect)
+        map1, map2 = self.maps(pts, image.shape)
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
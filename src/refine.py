@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+from .rectify import order_points
+
+
+def _edge_points(image, p0, p1, search, samples):
+    """
+    Samples short profiles across the edge p0->p1 (normal direction, +/- search px)
+    and returns the sub-pixel location of the strongest gradient on each profile.
+    Only the pixels under the profiles are read, never the whole image.
+    """
+    d = p1 - p0
+    length = np.hypot(d[0], d[1])
+    u = d / length
+    n = np.array([-u[1], u[0]], dtype=np.float32)
+
+    # Skip the ends of the edge: near the corners the profiles cross the other edge
+    t = np.linspace(0.1, 0.9, samples, dtype=np.float32) * length
+    centres = p0[None, :] + t[:, None] * u[None, :]
+    offsets = np.arange(-search, search + 1, dtype=np.float32)
+
+    grid = centres[:, None, :] + offsets[None, :, None] * n[None, None, :]
+    map_x = np.ascontiguousarray(grid[..., 0], dtype=np.float32)
+    map_y = np.ascontiguousarray(grid[..., 1], dtype=np.float32)
+    profiles = cv2.remap(image, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    if profiles.ndim == 3:
+        profiles = cv2.cvtColor(profiles, cv2.COLOR_BGR2GRAY)
+    profiles = cv2.GaussianBlur(profiles.astype(np.float32), (5, 3), 0)
+
+    grad = np.abs(np.diff(profiles, axis=1))
+    k = np.argmax(grad, axis=1)
+    rows = np.arange(len(k))
+    peak = grad[rows, k]
+
+    # Parabolic sub-pixel peak
+    left = grad[rows, np.maximum(k - 1, 0)]
+    right = grad[rows, np.minimum(k + 1, grad.shape[1] - 1)]
+    denom = left - 2 * peak + right
+    delta = np.where(np.abs(denom) > 1e-6, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0)
+    delta = np.clip(delta, -0.5, 0.5)
+    offset = offsets[k] + 0.5 + delta
+
+    # Drop weak profiles (e.g. where the page edge is occluded or blends in)
+    keep = peak >= 0.5 * np.median(peak)
+    points = centres[keep] + offset[keep, None] * n[None, :]
+    return points.astype(np.float32)
+
+
+def _intersect(l1, l2):
+    # Lines as (vx, vy, x0, y0) from cv2.fitLine
+    (vx1, vy1, x1, y1), (vx2, vy2, x2, y2) = l1, l2
+    det = vx1 * (-vy2) - vy1 * (-vx2)
+    if abs(det) < 1e-6:
+        return None
+    s = ((x2 - x1) * (-vy2) - (y2 - y1) * (-vx2)) / det
+    return np.array([x1 + s * vx1, y1 + s * vy1], dtype=np.float32)
+
+
+def refine_corners(image, pts, search=16, samples=24):
+    """
+    Coarse-to-fine corner refinement.
+    Takes the coarse quad from the low-res detector and, for each side, locates
+    the page edge at full resolution inside a narrow band (+/- search px) around
+    it, fits a robust line through the edge points and intersects neighbouring
+    lines to get sub-pixel corners.
+    Corners that cannot be refined (weak edge, implausible jump) keep their
+    coarse position.
+    Returns the corners ordered: top-left, top-right, bottom-right, bottom-left.
+    """
+    rect = order_points(np.asarray(pts, dtype=np.float32))
+    search = int(max(2, search))
+
+    lines = []
+    for i in range(4):
+        p0, p1 = rect[i], rect[(i + 1) % 4]
+        if np.hypot(*(p1 - p0)) < 4 * search:
+            lines.append(None)
+            continue
+        points = _edge_points(image, p0, p1, search, samples)
+        if len(points) < 3:
+            lines.append(None)
+            continue
+        lines.append(cv2.fitLine(points, cv2.DIST_HUBER, 0, 0.01, 0.01).ravel())
+
+    refined = rect.copy()
+    for i in range(4):
+        # Corner i joins side (i-1) -> i and side i -> (i+1)
+        prev_line, next_line = lines[i - 1], lines[i]
+        if prev_line is None or next_line is None:
+            continue
+        corner = _intersect(prev_line, next_line)
+        if corner is not None and np.hypot(*(corner - rect[i])) <= 2 * search:
+            refined[i] = corner
+
+    return refined
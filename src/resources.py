@@ -0,0 +1,109 @@
+import os
+import logging
+
+_affinity_warned = False
+
+
+def available_cores():
+    """
+    Cores this process may run on: the CPU affinity mask (taskset, cgroup
+    cpusets) where the OS has one, else os.cpu_count(). DOCAUG_CORES overrides it.
+    """
+    override = os.environ.get("DOCAUG_CORES")
+    if override:
+        return max(1, int(override))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ResourcePlan:
+    """
+    How the CPU cores are split between our own workers (pool processes or
+    threads) and OpenCV's internal threads inside each worker
+    (cv2.setNumThreads). Every pool applies the plan in its workers, so the
+    total stays at about one busy thread per core instead of workers x cores.
+
+    cores: total budget (default: available_cores())
+    workers: parallel workers (default: cores // threads)
+    threads: OpenCV threads per worker (default: cores // workers, at least 1)
+    affinity: pin worker i to its own block of `threads` cores (Linux only)
+
+    With neither workers nor threads given, a pool uses one worker per core
+    with single-threaded OpenCV: whole images in parallel scale better than
+    OpenCV's per-call parallelism on the small working images. A single
+    processor (CLI, GUI) uses ResourcePlan(workers=1): all cores for OpenCV.
+    """
+    def __init__(self, cores=None, workers=None, threads=None, affinity=False):
+        self.cores = max(1, int(cores or available_cores()))
+        self._threads = threads
+        if workers is None:
+            workers = max(1, self.cores // max(1, threads or 1))
+        self.workers = max(1, int(workers))
+        self.threads = max(1, int(threads)) if threads else max(1, self.cores // self.workers)
+        self.affinity = affinity
+
+    def __repr__(self):
+        return (f"ResourcePlan(cores={self.cores}, workers={self.workers}, threads={self.threads}"
+                f"{', affinity=True' if self.affinity else ''})")
+
+    def for_jobs(self, jobs):
+        """
+        The plan for a pool with only `jobs` tasks: fewer workers, and the spare
+        cores go to OpenCV threads (unless threads was set explicitly).
+        """
+        workers = max(1, min(self.workers, jobs))
+        if workers == self.workers:
+            return self
+        return ResourcePlan(self.cores, workers, self._threads, self.affinity)
+
+    def counter(self, ctx=None):
+        """
+        Shared worker counter for apply_worker (only needed with affinity).
+        Pass it to the pool's initializer arguments.
+        """
+        if not self.affinity:
+            return None
+        import multiprocessing as mp
+        return (ctx or mp).Value("i", 0)
+
+    def apply(self, index=None):
+        """
+        Applies the plan to the calling process: OpenCV thread count and, with
+        affinity and a worker index, the CPU mask.
+        """
+        import cv2
+        cv2.setNumThreads(self.threads)
+        if self.affinity and index is not None:
+            self._pin(index)
+
+    def _pin(self, index):
+        global _affinity_warned
+        if not hasattr(os, "sched_setaffinity"):
+            if not _affinity_warned:
+                logging.warning("CPU affinity is not supported on this platform; ignoring --affinity")
+                _affinity_warned = True
+            return
+        allowed = sorted(os.sched_getaffinity(0))
+        start = (index * self.threads) % len(allowed)
+        block = [allowed[(start + i) % len(allowed)] for i in range(min(self.threads, len(allowed)))]
+        try:
+            os.sched_setaffinity(0, block)
+        except OSError as e:
+            logging.warning(f"Could not set CPU affinity for worker {index}: {e}")
+
+
+def apply_worker(plan, counter=None):
+    """
+    Pool initializer helper: applies plan in a worker process, taking the next
+    worker index from counter (see ResourcePlan.counter).
+    """
+    if plan is None:
+        return
+    index = None
+    if counter is not None:
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+    plan.apply(index)
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import batch
+from .metrics import Metrics
+from .preflight import PreflightRejected
+from .resources import ResourcePlan
+from .source import DecodeError
+
+ENHANCE_MODES = ("scan", "color", "original")
+OUTPUT_FORMATS = {"png": ".png", "jpg": ".jpg", "jpeg": ".jpg", "webp": ".webp", "tif": ".tif", "tiff": ".tif",
+                  "pdf": ".pdf"}
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _warm_worker():
+    """
+    Runs each output mode once on a small synthetic page, so OpenCV's lazy
+    initialisation (thread pool, colour tables) happens before the first request.
+    """
+    import cv2
+    import numpy as np
+    image = np.full((240, 320, 3), 90, np.uint8)
+    cv2.rectangle(image, (60, 40), (260, 200), (235, 235, 235), -1)
+    data = cv2.imencode(".png", image)[1].tobytes()
+    processor = batch._worker_processor
+    # Warm-up is not activity, the synthetic page would fail a quality gate and
+    # its results do not belong in the user's cache
+    activity_log, processor.activity_log = processor.activity_log, None
+    preflight, processor.preflight = processor.preflight, None
+    result_cache, processor.result_cache = processor.result_cache, None
+    try:
+        for mode in ENHANCE_MODES:
+            processor.process_bytes(data, enhance_mode=mode)
+    finally:
+        processor.activity_log = activity_log
+        processor.preflight = preflight
+        processor.result_cache = result_cache
+    processor.metrics.drain()
+    return os.getpid()
+
+
+def _pool_context():
+    """
+    Start method of the worker pools. Workers forked from the serving process
+    would inherit the listening socket and open client connections (a pool is
+    restarted while serving), so on POSIX they come from a fork server started
+    with the first pool, before any socket exists.
+    """
+    import multiprocessing as mp
+    if "forkserver" in mp.get_all_start_methods():
+        return mp.get_context("forkserver")
+    return mp.get_context()
+
+
+def _process_request(data, enhance_mode, ext):
+    """
+    Runs one upload inside a worker (warm processor from batch._init_worker).
+    Never raises: errors are reported in the result (status rejected / invalid:
+    the input's fault; failed: ours).
+    """
+    start = time.perf_counter()
+    result = {"status": "ok", "error": "", "output": None, "info": None}
+    processor = batch._worker_processor
+    try:
+        result["output"], result["info"] = processor.process_bytes(data, enhance_mode=enhance_mode, ext=ext)
+    except PreflightRejected as e:
+        result.update(status="rejected", reason=e.reason, checks=e.checks, error=str(e))
+    except DecodeError as e:
+        result.update(status="invalid", error=str(e))
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    if processor.metrics.enabled:
+        result["metrics"] = processor.metrics.drain()
+    return result
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class DocumentServer:
+    """
+    Local HTTP service (asyncio, stdlib only) in front of a pool of warm
+    DocumentProcessor worker processes.
+
+    POST /process?enhance=scan&format=png[&response=json|image]
+        Body: encoded image bytes (JPEG, PNG, ...), decoded in memory.
+        response=json (default): {"detector", "method", "confidence", "corners",
+        "seconds", "format", "image": base64 output}
+        response=image: the encoded output, info JSON in the X-DocAUG-Info header.
+        Undecodable bodies get 422; inputs rejected by the pre-flight gate get 422
+        with {"error", "reason", "checks"}. Failures inside the processor are 500.
+    GET /health   -> worker and queue status (JSON)
+    GET /metrics  -> Prometheus text (server counters + merged worker stage timings)
+
+    At most workers + max_queue requests are admitted; beyond that the server
+    answers 503 with Retry-After instead of queueing without bound.
+    If a worker process dies, its requests get 500 and the pool is replaced.
+    resources: src.resources.ResourcePlan (default: `workers` processes, the
+    remaining cores as OpenCV threads).
+    """
+    def __init__(self, host="127.0.0.1", port=8080, workers=None, max_queue=None, mode="auto",
+                 enhance_mode="scan", options=None, max_body_mb=64, resources=None):
+        self.host = host
+        self.port = port
+        self.resources = resources or ResourcePlan(workers=workers)
+        self.workers = self.resources.workers
+        self.max_queue = self.workers * 2 if max_queue is None else max_queue
+        self.mode = mode
+        self.enhance_mode = enhance_mode
+        self.options = options
+        self.max_body = max_body_mb * 1024 * 1024
+        self.metrics = Metrics()
+        self.in_flight = 0
+        self.started = None
+        self._pool = None
+        self._server = None
+        self.restarts = 0
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    async def _start_pool(self):
+        loop = asyncio.get_running_loop()
+        ctx = _pool_context()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=batch._init_worker,
+                                         initargs=(self.mode, self.options, True, self.resources,
+                                                   self.resources.counter(ctx)))
+        # Spawn and warm every worker
+        pids = await asyncio.gather(*[loop.run_in_executor(self._pool, _warm_worker)
+                                      for _ in range(self.workers)])
+        logging.info(f"Warmed {len(set(pids))} worker process(es)")
+
+    async def _restart_pool(self, broken):
+        if self._pool is not broken:
+            return  # Another request already replaced it
+        self.restarts += 1
+        self.metrics.count("worker_restarts_total")
+        logging.warning("A worker process died; restarting the worker pool")
+        # Let the old pool's threads finish first: forking workers while they still
+        # hold locks can deadlock the new workers
+        await asyncio.get_running_loop().run_in_executor(None, partial(broken.shutdown, wait=True,
+                                                                       cancel_futures=True))
+        try:
+            await self._start_pool()
+        except BrokenProcessPool as e:
+            logging.error(f"Worker pool restart failed: {e}")
+
+    async def start(self):
+        # Warm every worker before accepting requests
+        await self._start_pool()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started = time.time()
+        logging.info(f"Serving on http://{self.host}:{self.port} "
+                     f"({self.workers} workers x {self.resources.threads} threads, queue {self.max_queue})")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    # --- HTTP ------------------------------------------------------------
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, close=True)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                keep_alive = await self._dispatch(reader, writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader, writer, method, target, headers, keep_alive):
+        start = time.perf_counter()
+        url = urlsplit(target)
+        route = url.path.rstrip("/") or "/"
+        try:
+            if route == "/health":
+                status, body, extra = 200, self.health(), None
+            elif route == "/metrics":
+                status, body, extra = 200, self.metrics.to_prometheus(), None
+            elif route == "/process":
+                if method != "POST":
+                    raise HTTPError(405, "Use POST with the image bytes as the body")
+                status, body, extra = await self._process(reader, url, headers)
+            else:
+                raise HTTPError(404, f"Unknown endpoint: {url.path}")
+        except HTTPError as e:
+            status, body = e.status, dict(e.details or {}, error=str(e))
+            extra = {"Retry-After": "1"} if e.status == 503 else None
+        except Exception as e:
+            logging.error(f"Request failed: {e}", exc_info=True)
+            status, body, extra = 500, {"error": f"{type(e).__name__}: {e}"}, None
+
+        if route == "/process" and status != 200 and "content-length" in headers:
+            # The body may not have been consumed; the connection cannot be reused
+            keep_alive = False
+        if route not in ("/health", "/metrics", "/process"):
+            route = "other"  # Keep label cardinality bounded
+        self.metrics.count("http_requests_total", route=route, status=str(status))
+        self.metrics.observe("http_request_seconds", time.perf_counter() - start, route=route)
+        await self._respond(writer, status, body, extra, close=not keep_alive)
+        return keep_alive
+
+    async def _respond(self, writer, status, body, extra_headers=None, close=False):
+        if isinstance(body, (bytes, bytearray)):
+            content_type, payload = "application/octet-stream", body
+        elif isinstance(body, str):
+            content_type, payload = "text/plain; version=0.0.4", body.encode("utf-8")
+        else:
+            content_type, payload = "application/json", json.dumps(body).encode("utf-8")
+
+        headers = {"Content-Type": content_type, "Content-Length": str(len(payload))}
+        if extra_headers:
+            headers.update(extra_headers)
+        if close:
+            headers["Connection"] = "close"
+        head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    # --- Endpoints -------------------------------------------------------
+
+    def health(self):
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "threads_per_worker": self.resources.threads,
+            "worker_restarts": self.restarts,
+            "in_flight": self.in_flight,
+            "capacity": self.capacity,
+            "uptime_seconds": round(time.time() - self.started, 1) if self.started else 0.0,
+        }
+
+    async def _process(self, reader, url, headers):
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        enhance_mode = query.get("enhance", self.enhance_mode)
+        if enhance_mode not in ENHANCE_MODES:
+            raise HTTPError(400, f"Unknown enhance mode: {enhance_mode}")
+        fmt = query.get("format", "png").lower()
+        if fmt not in OUTPUT_FORMATS:
+            raise HTTPError(400, f"Unknown output format: {fmt}")
+        response = query.get("response", "json")
+        if response not in ("json", "image"):
+            raise HTTPError(400, f"Unknown response type: {response}")
+
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length is required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HTTPError(413, f"Body larger than {self.max_body // (1024 * 1024)} MB")
+
+        # Backpressure: refuse before reading the body rather than queue without bound
+        if self.in_flight >= self.capacity:
+            self.metrics.count("rejected_total", reason="queue_full")
+            raise HTTPError(503, "Server busy, retry later")
+        if length <= 0:
+            raise HTTPError(400, "Empty body")
+
+        # Reserve the slot before awaiting anything, so concurrent uploads cannot
+        # all pass the check
+        self.in_flight += 1
+        try:
+            data = await reader.readexactly(length)
+            loop = asyncio.get_running_loop()
+            pool = self._pool
+            try:
+                result = await loop.run_in_executor(pool, _process_request, data, enhance_mode,
+                                                    OUTPUT_FORMATS[fmt])
+            except BrokenProcessPool:
+                await self._restart_pool(pool)
+                raise HTTPError(500, "Worker process died while processing the request")
+        finally:
+            self.in_flight -= 1
+
+        snapshot = result.pop("metrics", None)
+        if snapshot:
+            self.metrics.merge(snapshot)
+        if result["status"] == "rejected":
+            # Pre-flight rejection: machine-readable reason code and the measured values
+            raise HTTPError(422, result["error"], {"reason": result["reason"], "checks": result["checks"]})
+        if result["status"] == "invalid":
+            raise HTTPError(422, result["error"])
+        if result["status"] != "ok":
+            logging.error(f"Processing failed: {result['error']}")
+            raise HTTPError(500, result["error"])
+
+        info = dict(result["info"], seconds=result["seconds"], format=fmt)
+        if response == "image":
+            return 200, result["output"], {"X-DocAUG-Info": json.dumps(info)}
+        info["image"] = base64.b64encode(result["output"]).decode("ascii")
+        return 200, info, None
+
+
+def serve(host="127.0.0.1", port=8080, **kwargs):
+    """
+    Runs a DocumentServer until interrupted.
+    """
+    server = DocumentServer(host=host, port=port, **kwargs)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logging.info("Server stopped")
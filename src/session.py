@@ -0,0 +1,92 @@
+import logging
+import threading
+import numpy as np
+from .source import ImageSource
+
+
+class ProcessingSession:
+    """
+    Stage results for one loaded image, computed on first use and reused after:
+    corners -> warped (rectified) image -> enhanced result per mode.
+    Changing the output style only re-runs enhancement; a new image gets a new
+    session. Not thread-safe on its own: use it from a single worker thread.
+    """
+    def __init__(self, processor, image):
+        self.processor = processor
+        self.image = image
+        self.source = ImageSource.from_array(image)  # Caches the detection working image
+        self._corners = None
+        self._warped = None
+        self._results = {}
+        self._previews = {}
+
+    def corners(self):
+        if self._corners is None:
+            self._corners = self.processor.detect_document(self.source)
+        return self._corners
+
+    def warped(self):
+        if self._warped is None:
+            self._warped = self.processor.rectify(self.image, self.corners())
+        return self._warped
+
+    def result(self, mode):
+        if mode not in self._results:
+            self._results[mode] = self.processor.enhance(self.warped(), mode=mode)
+        return self._results[mode]
+
+    def has_result(self, mode):
+        return mode in self._results
+
+    def preview(self, mode):
+        """
+        Low-resolution result for display: the detection working image (already
+        decoded and cached) is rectified and enhanced instead of the full image.
+        """
+        if mode not in self._previews:
+            proxy, scale_x, scale_y = self.source.working_image(self.processor.DETECT_HEIGHT)
+            pts = np.asarray(self.corners(), dtype=np.float32).reshape(4, 2) / np.float32([scale_x, scale_y])
+            self._previews[mode] = self.processor.rectify_enhance(proxy, pts, mode)
+        return self._previews[mode]
+
+
+class CoalescingWorker:
+    """
+    A single background thread for GUI jobs. submit() replaces any job that has
+    not started yet, so rapid clicks collapse into the latest request; a job that
+    is already running can check is_stale(generation) and drop its result.
+    Jobs are called as fn(*args, generation).
+    """
+    def __init__(self, name="DocAUG-worker"):
+        self.name = name
+        self._pending = None
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, fn, *args):
+        with self._cond:
+            self._generation += 1
+            if self._pending is not None:
+                logging.debug("Dropping superseded job")
+            self._pending = (self._generation, fn, args)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return self._generation
+
+    def is_stale(self, generation):
+        return generation != self._generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                generation, fn, args = self._pending
+                self._pending = None
+            try:
+                fn(*args, generation)
+            except Exception as e:
+                print(f"ERROR: Background job failed: {e}")
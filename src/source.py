@@ -0,0 +1,188 @@
+import io
+import os
+import struct
+import cv2
+import numpy as np
+
+# Reduced JPEG decode flags by scale denominator (libjpeg DCT scaling)
+REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+# JPEG start-of-frame markers carrying the image size
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_image_size(path):
+    """
+    Reads (width, height) from a JPEG or PNG header without decoding pixels.
+    Returns None for other formats or unreadable files.
+    """
+    try:
+        with open(path, "rb") as f:
+            return _read_size(f)
+    except OSError:
+        return None
+
+
+def _read_size(f):
+    try:
+        head = f.read(26)
+        if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+
+        if head[:2] != b"\xff\xd8":
+            return None
+
+        # Walk JPEG segments until a SOF marker
+        f.seek(2)
+        while True:
+            byte = f.read(1)
+            while byte and byte != b"\xff":
+                byte = f.read(1)
+            while byte == b"\xff":
+                byte = f.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                continue  # Stand-alone markers have no length
+            length = struct.unpack(">H", f.read(2))[0]
+            if marker in _JPEG_SOF:
+                h, w = struct.unpack(">xHH", f.read(5))
+                return w, h
+            f.seek(length - 2, os.SEEK_CUR)
+    except struct.error:
+        return None
+
+
+class DecodeError(ValueError):
+    """
+    Encoded image bytes that OpenCV cannot decode (bad upload, not an error of ours).
+    """
+
+
+class ImageSource:
+    """
+    Lazily decoded image.
+    Detection only needs a ~500px working copy, so for files it is decoded with
+    libjpeg's reduced (1/2, 1/4, 1/8) decoding instead of decoding the full
+    12-48MP image and resizing it. The full-resolution pixels are decoded only
+    when full() is called (e.g. by the perspective warp).
+    Working images are cached per target height, so repeated detection calls on
+    the same source (GUI preview, re-runs) cost nothing.
+    Encoded bytes (e.g. an upload) work like a file, decoded in memory.
+    """
+    def __init__(self, path=None, image=None, data=None):
+        if path is None and image is None and data is None:
+            raise ValueError("ImageSource needs a path, an image or encoded data")
+        self.path = path
+        self.data = None if data is None else np.frombuffer(data, dtype=np.uint8)
+        self._full = image
+        self._working = {}
+        self._size = None
+        if image is not None:
+            self._size = (image.shape[1], image.shape[0])
+        elif path is not None:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"Image not found at {path}")
+            self._size = read_image_size(path)
+        else:
+            self._size = _read_size(io.BytesIO(data))
+
+    @classmethod
+    def from_array(cls, image):
+        return cls(image=image)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data=data)
+
+    def _decode(self, flags=cv2.IMREAD_COLOR):
+        if self.data is not None:
+            img = cv2.imdecode(self.data, flags)
+            if img is None:
+                raise DecodeError("Could not decode image data")
+            return img
+        img = cv2.imread(self.path, flags)
+        if img is None:
+            raise FileNotFoundError(f"Image not found at {self.path}")
+        return img
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def size(self):
+        """
+        Full-resolution (width, height). May trigger a decode if the header was unreadable.
+        """
+        if self._size is None:
+            self.full()
+        return self._size
+
+    @property
+    def is_decoded(self):
+        return self._full is not None
+
+    def full(self):
+        """
+        Returns the full-resolution BGR image, decoding it on first use.
+        """
+        if self._full is None:
+            img = self._decode()
+            self._full = img
+            self._size = (img.shape[1], img.shape[0])
+        return self._full
+
+    def release(self):
+        """
+        Drops the full-resolution pixels (working images are kept).
+        """
+        if self.path is not None or self.data is not None:
+            self._full = None
+
+    def _reduced_decode(self, target_height):
+        # Largest libjpeg scale that still leaves at least target_height rows.
+        # Both sides are checked since EXIF rotation may swap them.
+        w, h = self._size
+        for factor in (8, 4, 2):
+            if min(w, h) / factor >= target_height:
+                small = self._decode(REDUCED_FLAGS[factor])
+                # cv2.imread applies EXIF orientation, the header size does not
+                sh, sw = small.shape[:2]
+                if abs(sh / sw - h / w) > abs(sh / sw - w / h):
+                    self._size = (h, w)
+                return small
+        return None
+
+    def working_image(self, target_height=500):
+        """
+        Returns (image, scale_x, scale_y): a copy resized to target_height rows and
+        the factors that map its coordinates back to full resolution.
+        """
+        cached = self._working.get(target_height)
+        if cached is not None:
+            return cached
+
+        base = None
+        if self._full is None and self._size is not None:
+            base = self._reduced_decode(target_height)
+        if base is None:
+            base = self.full()
+
+        full_w, full_h = self.size
+        ratio = base.shape[0] / float(target_height)
+        work_w = max(1, int(base.shape[1] / ratio))
+        image = cv2.resize(base, (work_w, target_height))
+
+        cached = (image, full_w / float(work_w), full_h / float(target_height))
+        self._working[target_height] = cached
+        return cached
@@ -0,0 +1,310 @@
+import os
+import time
+import logging
+import cv2
+import numpy as np
+
+from .rectify import order_points
+
+
+class CornerTracker:
+    """
+    Follows a document quad between video frames without re-detecting it.
+    Feature points inside the quad and around its corners are tracked with
+    pyramidal Lucas-Kanade optical flow (forward-backward checked); a RANSAC
+    homography of the surviving points moves the four corners, so corners on
+    blank paper or off-screen are still carried along.
+    Works on small grayscale frames (coordinates in that space).
+    """
+    def __init__(self, max_points=200, min_points=12):
+        self.max_points = max_points
+        self.min_points = min_points
+        self.corners = None
+        self.confidence = 0.0
+        self._prev = None
+        self._points = None
+        self._seeded = 0
+
+    def reset(self, gray, corners):
+        self.corners = np.asarray(corners, dtype=np.float32).reshape(4, 2)
+        self.confidence = 1.0
+        self._prev = gray
+        self._seed(gray)
+
+    def _seed(self, gray):
+        # Quad interior plus a margin, so corner neighbourhoods (page edges) count
+        mask = np.zeros(gray.shape, np.uint8)
+        cv2.fillConvexPoly(mask, self.corners.astype(np.int32), 255)
+        mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 15)))
+        points = cv2.goodFeaturesToTrack(gray, self.max_points, 0.01, 7, mask=mask)
+        self._points = points.reshape(-1, 2).astype(np.float32) if points is not None else np.empty((0, 2), np.float32)
+        self._seeded = len(self._points)
+
+    def track(self, gray):
+        """
+        Moves the corners to the new frame. Returns the tracking confidence
+        (0..1: share of points that survived and agree on one homography);
+        0 means the document was lost.
+        """
+        if self.corners is None or len(self._points) < self.min_points:
+            self.confidence = 0.0
+            return 0.0
+
+        lk = dict(winSize=(21, 21), maxLevel=3,
+                  criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        p0 = self._points.reshape(-1, 1, 2)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(self._prev, gray, p0, None, **lk)
+        back, status_back, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev, p1, None, **lk)
+        fb_error = np.linalg.norm((back - p0).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < 1.0)
+        self._prev = gray
+
+        if good.sum() < self.min_points:
+            self.confidence = 0.0
+            return 0.0
+        src, dst = p0.reshape(-1, 2)[good], p1.reshape(-1, 2)[good]
+        H, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 3.0)
+        if H is None:
+            self.confidence = 0.0
+            return 0.0
+        inliers = inliers.ravel().astype(bool)
+
+        corners = cv2.perspectiveTransform(self.corners.reshape(-1, 1, 2), H).reshape(4, 2)
+        if not cv2.isContourConvex(corners.astype(np.float32)):
+            self.confidence = 0.0
+            return 0.0
+        self.corners = corners
+        self._points = dst[inliers]
+        self.confidence = float(inliers.sum()) / len(p0)
+
+        # Points drift off and die over time; re-seed from the tracked quad
+        if len(self._points) < self._seeded // 2:
+            self._seed(gray)
+        return self.confidence
+
+
+class StreamScanner:
+    """
+    Scans documents from a video stream (camera or file), frame by frame:
+
+        scanner = StreamScanner(processor)
+        for frame in frames:
+            result = scanner.feed(frame)     # a finished document or None
+        result = scanner.finish()
+
+    Full detection (processor.detect) only runs on keyframes: the first frame,
+    every keyframe_interval frames and whenever tracking confidence drops below
+    min_confidence. In between, CornerTracker follows the quad and the corners
+    are smoothed with an exponential moving average.
+
+    A document counts as held still once its smoothed corners moved less than
+    stable_px (tracking resolution) for stable_frames frames in a row. Of those
+    stable frames the sharpest one (variance of the Laplacian inside the quad)
+    is kept, and rectify + enhance run once, on that frame, when the document
+    leaves the view, is replaced by another one, or the stream ends.
+
+    Keyframes use the fast detector by default: the watershed fallback always
+    returns a quad (it assumes the page is in the centre), so it cannot tell an
+    empty view from a document. A fast detection counts when its confidence
+    reaches the processor's confidence_threshold.
+    """
+    def __init__(self, processor, enhance_mode='scan', keyframe_interval=30, min_confidence=0.5,
+                 smoothing=0.5, stable_frames=8, stable_px=1.5, track_height=360, min_area=0.05,
+                 detector='fast'):
+        self.processor = processor
+        self.enhance_mode = enhance_mode
+        self.detector = detector
+        self.keyframe_interval = keyframe_interval
+        self.min_confidence = min_confidence
+        self.smoothing = smoothing
+        self.stable_frames = stable_frames
+        self.stable_px = stable_px
+        self.track_height = track_height
+        self.min_area = min_area
+
+        self.tracker = CornerTracker()
+        self.frames = 0
+        self.keyframes = 0
+        self.documents = 0
+        self.elapsed = 0.0
+        self._reset_document()
+
+    def _reset_document(self):
+        self._smoothed = None
+        self._since_keyframe = 0
+        self._still = 0
+        self._detection = None
+        self._best = None  # (sharpness, frame index, full frame, corners in full resolution)
+
+    @property
+    def tracking(self):
+        return self._smoothed is not None
+
+    def _detect(self, frame, scale):
+        """
+        Full detection; returns corners in tracking coordinates or None.
+        """
+        self.keyframes += 1
+        with self.processor.metrics.stage("stream_detect"):
+            corners, info = self.processor.detect(frame, detector=self.detector)
+        if info["method"] == "full_frame":
+            return None, info
+        if info["detector"] == "fast" and info["confidence"] < self.processor.confidence_threshold:
+            return None, info
+        corners = order_points(np.asarray(corners, dtype=np.float32).reshape(4, 2)) * scale
+        h, w = frame.shape[:2]
+        if cv2.contourArea(corners) < self.min_area * w * h * scale * scale:
+            return None, info
+        return corners, info
+
+    def feed(self, frame):
+        """
+        Processes one BGR frame. Returns a finished document (see _emit) or None.
+        """
+        start = time.perf_counter()
+        self.frames += 1
+        scale = self.track_height / frame.shape[0]
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        result = None
+        active = False
+        if self.tracking:
+            with self.processor.metrics.stage("stream_track"):
+                active = self.tracker.track(gray) >= self.min_confidence
+        self._since_keyframe += 1
+
+        if not active or self._since_keyframe >= self.keyframe_interval:
+            corners, info = self._detect(frame, scale)
+            self._since_keyframe = 0
+            if corners is not None:
+                if self.tracking and self._moved(corners):
+                    result = self._emit()  # Another document
+                if not self.tracking:
+                    self._detection = info
+                self.tracker.reset(gray, corners)
+                active = True
+            elif not active:
+                result = self._emit()  # Lost and not found again: the document left the view
+
+        if active:
+            self._update(frame, gray, scale)
+        self.elapsed += time.perf_counter() - start
+        return result
+
+    def _moved(self, corners):
+        # New detection far from the tracked quad: a different document
+        diagonal = np.linalg.norm(np.ptp(self._smoothed, axis=0))
+        return np.mean(np.linalg.norm(corners - self._smoothed, axis=1)) > 0.1 * diagonal
+
+    def _update(self, frame, gray, scale):
+        corners = self.tracker.corners
+        if self._smoothed is None:
+            self._smoothed = corners.copy()
+            motion = np.inf
+        else:
+            smoothed = self.smoothing * corners + (1 - self.smoothing) * self._smoothed
+            motion = np.max(np.linalg.norm(smoothed - self._smoothed, axis=1))
+            self._smoothed = smoothed
+
+        self._still = self._still + 1 if motion < self.stable_px else 0
+        if self._still < self.stable_frames:
+            return
+
+        x, y, w, h = cv2.boundingRect(self._smoothed.astype(np.int32))
+        roi = gray[max(y, 0):y + h, max(x, 0):x + w]
+        if roi.size == 0:
+            return
+        sharpness = float(cv2.Laplacian(roi, cv2.CV_32F).var())
+        if self._best is None or sharpness > self._best[0]:
+            self._best = (sharpness, self.frames, frame.copy(), self._smoothed / scale)
+
+    def _emit(self):
+        """
+        Rectifies and enhances the best stable frame of the current document.
+        Returns a dict (document, frame, sharpness, corners, detector, image) or
+        None if the document never held still.
+        """
+        best, detection = self._best, self._detection
+        self._reset_document()
+        if best is None:
+            return None
+        sharpness, index, frame, corners = best
+        self.documents += 1
+        final = self.processor.rectify_enhance(frame, corners, self.enhance_mode)
+        return {
+            "document": self.documents,
+            "frame": index,
+            "sharpness": round(sharpness, 1),
+            "corners": np.round(corners.astype(np.float64), 1).tolist(),
+            "detector": detection["detector"] if detection else None,
+            "image": final,
+        }
+
+    def finish(self):
+        """
+        Ends the stream: emits the document still in view, if any.
+        """
+        return self._emit()
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "tracked_frames": self.frames - self.keyframes,
+            "documents": self.documents,
+            "fps": round(self.frames / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+
+def open_capture(source):
+    """
+    cv2.VideoCapture for a video file, a stream URL or a camera index ("0").
+    """
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video source: {source}")
+    return capture
+
+
+def scan_stream(source, output_dir, processor, enhance_mode='scan', ext='.png', max_frames=None, **options):
+    """
+    Scans every document shown in a video file or camera stream and writes each
+    one (best stable frame, rectified + enhanced) to output_dir/doc_001.png, ...
+    options: StreamScanner keyword arguments.
+    Returns (list of result dicts without images, scanner stats).
+    """
+    from .output import write_image
+    os.makedirs(output_dir, exist_ok=True)
+    scanner = StreamScanner(processor, enhance_mode=enhance_mode, **options)
+    capture = open_capture(source)
+    results = []
+
+    def save(result):
+        if result is None:
+            return
+        path = os.path.join(output_dir, f"doc_{result['document']:03d}{ext}")
+        write_image(path, result.pop("image"), **processor._encode_kwargs(enhance_mode))
+        result["output"] = path
+        results.append(result)
+        logging.info(f"Document {result['document']}: frame {result['frame']} "
+                     f"(sharpness {result['sharpness']}) -> {path}")
+
+    try:
+        try:
+            while max_frames is None or scanner.frames < max_frames:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                save(scanner.feed(frame))
+        except KeyboardInterrupt:
+            logging.info("Stream interrupted")  # Ctrl+C ends a camera scan
+        save(scanner.finish())
+    finally:
+        capture.release()
+
+    stats = scanner.stats()
+    source_fps = capture.get(cv2.CAP_PROP_FPS)
+    if source_fps > 0:
+        stats["source_fps"] = round(source_fps, 1)
+    return results, stats
@@ -0,0 +1,213 @@
+import os
+import cv2
+import numpy as np
+from .rectify import order_points, output_size
+from .enhance import SCAN_BLOCK_SIZE, SCAN_C, CLAHE_CLIP_LIMIT, CLAHE_GRID
+
+# Rough working-set bytes per output pixel of one strip, by mode
+# (warped BGR + intermediates + output rows)
+_BYTES_PER_PIXEL = {
+    "scan": 6,
+    "color": 40,  # LAB strip, float LUT interpolation buffers
+    "original": 3,
+}
+
+# Below this many output rows tiling is not worth it
+_MIN_ROWS = 64
+
+
+def allocate_output(shape, dtype=np.uint8, path=None):
+    """
+    Preallocates the output: in memory, or as an np.memmap-backed .npy file
+    when a path is given (pages can then be written back instead of held in RAM).
+    """
+    if path is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def output_nbytes(pts, mode):
+    """
+    Size in bytes of the enhanced output for these corners.
+    """
+    width, height = output_size(order_points(np.asarray(pts, dtype=np.float32)))
+    return width * height * (1 if mode == "scan" else 3)
+
+
+def release_output(out):
+    """
+    Closes a memmap-backed output and deletes its backing file.
+    """
+    if isinstance(out, np.memmap):
+        path = out.filename
+        out._mmap.close()
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _strip_rows(width, mode, memory_mb, context):
+    budget = max(1, memory_mb) * 1024 * 1024
+    rows = budget // (width * _BYTES_PER_PIXEL[mode]) - 2 * context
+    return int(max(16, rows))
+
+
+def _warp_rows(image, M, width, y0, y1):
+    # Shift the homography so output row y0 becomes row 0 of the strip
+    T = np.array([[1, 0, 0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+    return cv2.warpPerspective(image, T @ M, (width, y1 - y0))
+
+
+def _clahe_luts(hist, tile_pixels):
+    """
+    Per-tile CLAHE lookup tables from tile histograms (same algorithm and
+    float32 arithmetic as cv2.CLAHE).
+    hist: (tiles_y, tiles_x, 256) int64
+    """
+    clip = max(int(CLAHE_CLIP_LIMIT * tile_pixels / 256), 1)
+    luts = np.empty(hist.shape, dtype=np.float32)
+    scale = np.float32(255.0 / tile_pixels)
+    for ty in range(hist.shape[0]):
+        for tx in range(hist.shape[1]):
+            h = hist[ty, tx].copy()
+            excess = int(np.maximum(h - clip, 0).sum())
+            np.minimum(h, clip, out=h)
+            h += excess // 256
+            residual = excess % 256
+            if residual:
+                step = max(256 // residual, 1)
+                idx = np.arange(0, 256, step)[:residual]
+                h[idx] += 1
+            luts[ty, tx] = np.clip(np.rint(np.cumsum(h).astype(np.float32) * scale), 0, 255)
+    return luts
+
+
+def _clahe_weights(start, count, tile, tiles):
+    # Tile indices and weights along one axis, in float32 like cv2.CLAHE
+    f = np.arange(start, start + count, dtype=np.float32) * (np.float32(1) / np.float32(tile)) - np.float32(0.5)
+    t1 = np.floor(f).astype(np.int32)
+    a = f - t1.astype(np.float32)
+    return np.maximum(t1, 0), np.minimum(t1 + 1, tiles - 1), a, np.float32(1) - a
+
+
+def _clahe_apply_rows(l_rows, y0, luts, tile_w, tile_h):
+    """
+    Bilinear interpolation between the four nearest tile LUTs (as cv2.CLAHE does)
+    for rows y0.. of the L channel.
+    """
+    tiles_y, tiles_x = luts.shape[:2]
+    rows, width = l_rows.shape
+    tx1, tx2, xa, xa1 = _clahe_weights(0, width, tile_w, tiles_x)
+    ty1, ty2, ya, ya1 = (v[:, None] for v in _clahe_weights(y0, rows, tile_h, tiles_y))
+
+    v = l_rows
+    top = luts[ty1, tx1, v] * xa1 + luts[ty1, tx2, v] * xa
+    bottom = luts[ty2, tx1, v] * xa1 + luts[ty2, tx2, v] * xa
+    return np.clip(np.rint(top * ya1 + bottom * ya), 0, 255).astype(np.uint8)
+
+
+def rectify_enhance_tiled(image, pts, mode="scan", out=None, memory_mb=256):
+    """
+    Memory-bounded four_point_transform + enhancement.
+    The output is produced in horizontal strips sized to memory_mb, written into
+    'out' (a preallocated array or np.memmap, allocated if None). Strips carry the
+    overlap the filters need, so the result matches the untiled path:
+    - scan: adaptive threshold neighbourhood rows above/below each strip
+    - color: two passes; the first streams the L channel into global per-tile
+      histograms, the second applies the interpolated CLAHE tables per strip
+    - original: warp only
+    Returns 'out'.
+    """
+    if mode not in _BYTES_PER_PIXEL:
+        raise ValueError(f"Unknown enhancement mode: {mode}")
+
+    rect = order_points(np.asarray(pts, dtype=np.float32))
+    width, height = output_size(rect)
+    dst = np.array([
+        [0, 0],
+        [width - 1, 0],
+        [width - 1, height - 1],
+        [0, height - 1]], dtype="float32")
+    M = cv2.getPerspectiveTransform(rect, dst)
+
+    shape = (height, width) if mode == "scan" else (height, width, 3)
+    if out is None:
+        out = allocate_output(shape)
+    elif out.shape != shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {shape}")
+
+    context = SCAN_BLOCK_SIZE // 2 if mode == "scan" else 0
+    step = _strip_rows(width, mode, memory_mb, context)
+
+    if mode == "color" and (height < _MIN_ROWS or width < _MIN_ROWS):
+        # Too small for the tile bookkeeping: run the regular path in one go
+        from .enhance import enhance_magic_color
+        out[:] = enhance_magic_color(_warp_rows(image, M, width, 0, height))
+        return out
+
+    if mode == "color":
+        _tiled_magic_color(image, M, width, height, out, step)
+        return out
+
+    for y0 in range(0, height, step):
+        y1 = min(height, y0 + step)
+        if mode == "original":
+            out[y0:y1] = _warp_rows(image, M, width, y0, y1)
+            continue
+
+        # Warp with context rows so the threshold neighbourhood is complete
+        c0, c1 = max(0, y0 - context), min(height, y1 + context)
+        gray = cv2.cvtColor(_warp_rows(image, M, width, c0, c1), cv2.COLOR_BGR2GRAY)
+        thresh = cv2.adaptiveThreshold(
+            gray, 255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY, SCAN_BLOCK_SIZE, SCAN_C
+        )
+        out[y0:y1] = thresh[y0 - c0:y0 - c0 + (y1 - y0)]
+
+    return out
+
+
+def _tiled_magic_color(image, M, width, height, out, step):
+    tiles_x, tiles_y = CLAHE_GRID
+
+    # cv2.CLAHE pads (BORDER_REFLECT_101) to a multiple of the grid; when either
+    # side needs it, both get tiles - size % tiles, i.e. a whole extra row or
+    # column of tile widths on a side that was already a multiple
+    pad_x = pad_y = 0
+    if width % tiles_x or height % tiles_y:
+        pad_x = tiles_x - width % tiles_x
+        pad_y = tiles_y - height % tiles_y
+    tile_w = (width + pad_x) // tiles_x
+    tile_h = (height + pad_y) // tiles_y
+    hist = np.zeros((tiles_y, tiles_x, 256), dtype=np.int64)
+
+    def accumulate(l_rows, y0):
+        if pad_x:
+            l_rows = cv2.copyMakeBorder(l_rows, 0, 0, 0, pad_x, cv2.BORDER_REFLECT_101)
+        for ty in range(y0 // tile_h, min(tiles_y, (y0 + len(l_rows) - 1) // tile_h + 1)):
+            r0 = max(ty * tile_h, y0) - y0
+            r1 = min((ty + 1) * tile_h, y0 + len(l_rows)) - y0
+            block = l_rows[r0:r1].reshape(r1 - r0, tiles_x, tile_w).transpose(1, 0, 2)
+            for tx in range(tiles_x):
+                hist[ty, tx] += np.bincount(block[tx].ravel(), minlength=256)
+
+    # Pass 1: warp, convert to LAB straight into the output, collect L histograms
+    for y0 in range(0, height, step):
+        y1 = min(height, y0 + step)
+        lab = cv2.cvtColor(_warp_rows(image, M, width, y0, y1), cv2.COLOR_BGR2LAB)
+        out[y0:y1] = lab
+        accumulate(lab[:, :, 0], y0)
+
+    if pad_y:
+        # Reflected rows below the page (read back from the output)
+        mirrored = np.ascontiguousarray(out[height - 2:height - 2 - pad_y:-1, :, 0])
+        accumulate(mirrored, height)
+
+    luts = _clahe_luts(hist, tile_w * tile_h)
+
+    # Pass 2: apply the interpolated tables to L and convert back in place
+    for y0 in range(0, height, step):
+        y1 = min(height, y0 + step)
+        lab = np.array(out[y0:y1])
+        lab[:, :, 0] = _clahe_apply_rows(lab[:, :, 0], y0, luts, tile_w, tile_h)
+        out[y0:y1] = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
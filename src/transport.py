@@ -0,0 +1,297 @@
+import os
+import time
+import queue
+import logging
+import multiprocessing as mp
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+# Reference to a frame in a FrameRing: slot index plus array layout. Tiny to pickle.
+FrameHandle = namedtuple("FrameHandle", ["slot", "shape", "dtype"])
+
+
+def _attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Children share the creator's resource tracker, so registering the block
+        # again is harmless; only the creator unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """
+    Fixed pool of image slots in one multiprocessing.shared_memory block.
+    Producers take a free slot, write a frame into it and pass the FrameHandle to
+    another process, which maps the same memory with view() (no copy, no pickling
+    of pixels) and hands the slot back with release(). Slots are reused, so no
+    per-image allocation happens; when all slots are in use, acquire() blocks,
+    which bounds memory and throttles the producer.
+
+    Create in the parent (FrameRing(slots, slot_bytes)), pass ring.spec() to child
+    processes and FrameRing.attach(spec) there. Only the creator unlinks (close()).
+    """
+    def __init__(self, slots, slot_bytes, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.slots = slots
+        self.slot_bytes = int(slot_bytes)
+        self.owner = True
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._free = ctx.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def spec(self):
+        """
+        Picklable description for FrameRing.attach (pass as Process args).
+        """
+        return (self._shm.name, self.slots, self.slot_bytes, self._free)
+
+    @classmethod
+    def attach(cls, spec):
+        name, slots, slot_bytes, free = spec
+        ring = cls.__new__(cls)
+        ring.slots = slots
+        ring.slot_bytes = slot_bytes
+        ring.owner = False
+        ring._shm = _attach_shared_memory(name)
+        ring._free = free
+        return ring
+
+    def fits(self, shape, dtype=np.uint8):
+        return int(np.prod(shape)) * np.dtype(dtype).itemsize <= self.slot_bytes
+
+    def acquire(self, shape, dtype=np.uint8, timeout=None):
+        """
+        Takes a free slot (blocking) and returns (handle, writable view).
+        """
+        if not self.fits(shape, dtype):
+            raise ValueError(f"Frame of shape {shape} does not fit a {self.slot_bytes // (1024 * 1024)} MB slot")
+        slot = self._free.get(timeout=timeout)
+        handle = FrameHandle(slot, tuple(shape), np.dtype(dtype).str)
+        return handle, self.view(handle)
+
+    def put(self, image, timeout=None):
+        """
+        Copies image into a free slot; returns its handle.
+        """
+        handle, view = self.acquire(image.shape, image.dtype, timeout=timeout)
+        view[...] = image
+        return handle
+
+    def view(self, handle):
+        """
+        NumPy array over the slot's shared memory (valid until release()).
+        """
+        return np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=self._shm.buf,
+                          offset=handle.slot * self.slot_bytes)
+
+    def release(self, handle):
+        self._free.put(handle.slot)
+
+    def close(self):
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+def _decoder(jobs, task_queue, result_queue, ring_spec, workers):
+    """
+    Decoder process: reads files straight into input-ring slots.
+    """
+    cv2.setNumThreads(1)  # imread only; the cores belong to the workers
+    ring = FrameRing.attach(ring_spec)
+    try:
+        for index, input_path, output_path in jobs:
+            start = time.perf_counter()
+            image = cv2.imread(input_path)
+            if image is None:
+                result_queue.put((index, _failed(input_path, output_path, "Could not read image", start), None))
+                continue
+            if not ring.fits(image.shape):
+                result_queue.put((index, _failed(input_path, output_path,
+                                                 f"Image {image.shape[1]}x{image.shape[0]} exceeds the frame slot size",
+                                                 start), None))
+                continue
+            handle = ring.put(image)
+            del image
+            task_queue.put((index, input_path, output_path, handle, time.perf_counter() - start))
+    finally:
+        for _ in range(workers):
+            task_queue.put(None)
+        ring.close()
+
+
+def _failed(input_path, output_path, error, start):
+    return {"input": input_path, "output": output_path, "status": "failed", "error": error,
+            "seconds": round(time.perf_counter() - start, 4)}
+
+
+def _worker(task_queue, result_queue, in_spec, out_spec, mode, enhance_mode, options, collect_metrics,
+            resources=None, index=None):
+    """
+    Worker process: detect + rectify + enhance on the shared input frame, write
+    the result into an output-ring slot and send back its handle.
+    """
+    if resources is not None:
+        resources.apply(index)
+    from .processor import DocumentProcessor
+    from .metrics import Metrics
+    from .preflight import PreflightRejected
+    from .source import ImageSource
+    processor = DocumentProcessor(mode=mode, metrics=Metrics() if collect_metrics else None, **(options or {}))
+    in_ring, out_ring = FrameRing.attach(in_spec), FrameRing.attach(out_spec)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            index, input_path, output_path, handle, decode_seconds = task
+            start = time.perf_counter()
+            result = {"input": input_path, "output": output_path, "status": "ok", "error": ""}
+            out_handle = None
+            image = None
+            try:
+                image = in_ring.view(handle)
+                final, info = processor._render(ImageSource.from_array(image), enhance_mode)
+                image = None  # Views must be gone before the slot is reused or the ring closed
+                in_ring.release(handle)
+                handle = None
+                result.update(info)
+                if out_ring.fits(final.shape):
+                    out_handle = out_ring.put(final)
+                else:
+                    result["image"] = final  # Too large for a slot: sent by copy
+            except PreflightRejected as e:
+                result.update(status="rejected", reason=e.reason, error=str(e))
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                image = None
+                if handle is not None:
+                    in_ring.release(handle)
+            result["seconds"] = round(decode_seconds + time.perf_counter() - start, 4)
+            if processor.metrics.enabled:
+                result["metrics"] = processor.metrics.drain()
+            result_queue.put((index, result, out_handle))
+    finally:
+        in_ring.close()
+        out_ring.close()
+
+
+def run_batch_shared(inputs, output_dir, mode="auto", enhance_mode="scan", workers=None,
+                     resume=True, ext=None, options=None, metrics=None, slots=None, slot_mb=64,
+                     resources=None):
+    """
+    Same contract as batch.run_batch, but decoding happens in a dedicated process
+    and frames travel through shared-memory rings (FrameRing) instead of being
+    pickled: decoder -> input ring -> workers -> output ring -> writer threads here.
+    slots: frames in flight per ring (default 2 per worker); slot_mb: slot size,
+    which caps the frame size (64 MB holds ~21MP BGR).
+    resources: src.resources.ResourcePlan for the workers, as in run_batch.
+    """
+    from .batch import output_params, _plan_jobs
+    from .resources import ResourcePlan
+
+    params = output_params(output_dir, mode, enhance_mode, options)
+    results, jobs = _plan_jobs(inputs, output_dir, resume, ext, params=params)
+    jobs = [(i, input_path, output_path) for i, (input_path, output_path) in enumerate(jobs)]
+    if not jobs:
+        return results
+
+    plan = (resources or ResourcePlan(workers=workers)).for_jobs(len(jobs))
+    workers = plan.workers
+    slots = slots or 2 * workers
+    logging.info(f"Processing {len(jobs)} image(s) on {workers} worker(s) x {plan.threads} thread(s), "
+                 f"shared-memory transport ({slots} x {slot_mb} MB slots per ring)")
+
+    ctx = mp.get_context()
+    in_ring = FrameRing(slots, slot_mb * 1024 * 1024, ctx)
+    out_ring = FrameRing(slots, slot_mb * 1024 * 1024, ctx)
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+
+    processes = [ctx.Process(target=_decoder, args=(jobs, task_queue, result_queue, in_ring.spec(), workers),
+                             name="DocAUG-decode", daemon=True)]
+    for i in range(workers):
+        processes.append(ctx.Process(
+            target=_worker,
+            args=(task_queue, result_queue, in_ring.spec(), out_ring.spec(),
+                  mode, enhance_mode, options, metrics is not None, plan, i),
+            name=f"DocAUG-worker-{i}", daemon=True))
+    for p in processes:
+        p.start()
+
+    from .output import write_image, temp_path
+    encode = dict((options or {}).get("encode_options") or {})
+    encode["bilevel"] = enhance_mode == "scan" and encode.get("bilevel", True)
+
+    def write(result, out_handle):
+        # Writer thread: encode straight from the shared slot, then hand it back
+        output_path = result["output"]
+        tmp_path = None
+        try:
+            image = out_ring.view(out_handle) if out_handle is not None else result.pop("image")
+            out_dir = os.path.dirname(output_path)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+            tmp_path = temp_path(output_path)
+            write_image(tmp_path, image, **encode)
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            if out_handle is not None:
+                out_ring.release(out_handle)
+        return result
+
+    pending = len(jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as writers:
+            futures = []
+            while pending:
+                try:
+                    index, result, out_handle = result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes[1:]):
+                        raise RuntimeError("Shared-memory workers exited before finishing the batch")
+                    continue
+                pending -= 1
+                snapshot = result.pop("metrics", None)
+                if snapshot and metrics is not None:
+                    metrics.merge(snapshot)
+                if result["status"] == "ok":
+                    futures.append(writers.submit(write, result, out_handle))
+                elif result["status"] == "rejected":
+                    results.append(result)
+                    logging.warning(f"{result['input']} rejected: {result['error']}")
+                else:
+                    results.append(result)
+                    logging.error(f"{result['input']} failed: {result['error']}")
+
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if result["status"] == "ok":
+                    params.record(result["output"])
+                    logging.info(f"{result['input']} ({result['seconds']:.2f}s)")
+                else:
+                    logging.error(f"{result['input']} failed: {result['error']}")
+    finally:
+        for p in processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        in_ring.close()
+        out_ring.close()
+        params.save()
+
+    return results
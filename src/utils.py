@@ -1,12 +1,56 @@
-import cv2
-import platform
+import os
+import json
+import shutil
 import logging
 
-def get_device_info():
+# Common Tesseract install locations checked before the system PATH
+TESSERACT_PATHS = [
+    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+    os.path.expandvars(r"%LOCALAPPDATA%\Programs\Tesseract-OCR\tesseract.exe"),
+]
+
+_DISCOVERY_FILE = "discovery.json"
+
+
+def cache_dir():
     """
-    Detects available hardware acceleration.
-    Returns: dict of available backends.
+    Per-user cache directory (DOCAUG_CACHE_DIR overrides it).
     """
+    override = os.environ.get("DOCAUG_CACHE_DIR")
+    if override:
+        return override
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "DocAUG")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "docaug")
+
+
+def _load_discovery():
+    try:
+        with open(os.path.join(cache_dir(), _DISCOVERY_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_discovery(key, value):
+    # Best effort: a read-only home directory just means probing every run
+    data = _load_discovery()
+    data[key] = value
+    try:
+        directory = cache_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, _DISCOVERY_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.debug(f"Could not write discovery cache: {e}")
+
+
+def _probe_devices():
+    import cv2
     info = {
         "cpu": True,
         "cuda": False,
@@ -26,8 +70,8 @@ def get_device_info():
     except Exception as e:
         logging.warning(f"CUDA detection failed: {e}")
 
-    # Check OpenVINO (simple check via cv2 backend support, 
-    # robust check usually involves trying to load a network, 
+    # Check OpenVINO (simple check via cv2 backend support,
+    # robust check usually involves trying to load a network,
     # but we will assume logic based on imports later)
     # For now, we manually flag OpenVINO availability if cv2 has it.
     try:
@@ -39,3 +83,41 @@ def get_device_info():
         pass
 
     return info
+
+
+def get_device_info(refresh=False):
+    """
+    Detects available hardware acceleration.
+    The result is cached on disk per OpenCV version, since probing CUDA can
+    initialise the driver; pass refresh=True to probe again.
+    Returns: dict of available backends.
+    """
+    import cv2
+    cached = _load_discovery().get("devices")
+    if not refresh and cached and cached.get("opencv") == cv2.__version__:
+        return cached["info"]
+
+    info = _probe_devices()
+    _save_discovery("devices", {"opencv": cv2.__version__, "info": info})
+    return info
+
+
+def find_tesseract(refresh=False):
+    """
+    Path of the Tesseract executable, or None if it is not installed.
+    Checks the common install locations, then the system PATH. The result is
+    cached on disk and re-checked only if the cached executable disappeared.
+    """
+    cached = _load_discovery().get("tesseract")
+    if not refresh and cached and cached.get("path") and os.path.exists(cached["path"]):
+        return cached["path"]
+
+    found = None
+    for path in TESSERACT_PATHS:
+        if os.path.exists(path):
+            found = path
+            break
+    if found is None:
+        found = shutil.which("tesseract")
+    _save_discovery("tesseract", {"path": found})
+    return found
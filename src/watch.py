@@ -0,0 +1,344 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from . import batch
+from .resources import ResourcePlan
+
+INDEX_NAME = ".docaug-index.sqlite"
+
+# A file in flight during this many worker crashes is recorded as failed
+# instead of being retried again
+MAX_CRASHES = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    status TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    seconds REAL,
+    processed_at REAL
+)
+"""
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    blake2b of the file contents, read in chunks (same digest as ResultCache.content_hash).
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FileIndex:
+    """
+    Persistent record of every input the watcher has handled (SQLite, stdlib):
+    relative name -> size, mtime, content hash, status (done / failed /
+    rejected / adopted), output path(s) and error. Survives restarts, so a
+    file is only processed again when its contents change.
+    """
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    def load(self):
+        """
+        {name: (size, mtime_ns, hash)} of every indexed file.
+        """
+        rows = self._db.execute("SELECT name, size, mtime_ns, hash FROM files")
+        return {name: (size, mtime_ns, digest) for name, size, mtime_ns, digest in rows}
+
+    def get(self, name):
+        row = self._db.execute("SELECT name, size, mtime_ns, hash, status, output, error, seconds, processed_at "
+                               "FROM files WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        keys = ("name", "size", "mtime_ns", "hash", "status", "output", "error", "seconds", "processed_at")
+        return dict(zip(keys, row))
+
+    def record(self, name, size, mtime_ns, digest, status, output=None, error=None, seconds=None):
+        self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (name, size, mtime_ns, digest, status, output, error, seconds, time.time()))
+
+    def touch(self, name, size, mtime_ns):
+        """
+        New size / mtime for an entry whose contents did not change.
+        """
+        self._db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE name = ?", (size, mtime_ns, name))
+
+    def counts(self):
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    def close(self):
+        self._db.close()
+
+
+class HotFolder:
+    """
+    Watches a drop directory and processes new or changed images as they arrive,
+    over a pool of warm DocumentProcessor workers that lives as long as the
+    watcher.
+
+    - Polling with os.scandir (no extra dependency): each poll costs one stat
+      per file, compared against the in-memory copy of the index, so an idle
+      folder costs next to nothing.
+    - A file is taken once its size and mtime have not changed for `settle`
+      seconds, so scanners still writing a page are left alone.
+    - New files, and files whose size or mtime changed, are hashed; a file whose
+      contents match the index entry (touched, copied over itself) is not
+      processed again.
+    - Outputs are written under a hidden temp name and renamed (output.temp_path),
+      so the scan, which skips dot files, never picks up a half-written output.
+      With archive_dir, finished inputs are then moved there, keeping their
+      sub-directory; otherwise they stay and are marked done in the index.
+    - Files without an index entry whose output is already newer are adopted
+      instead of reprocessed (e.g. the first run over a folder that a cron job
+      used to handle).
+    - If a worker process dies, the pool is replaced and the files that were in
+      flight are retried one at a time; a file caught in MAX_CRASHES crashes is
+      recorded as failed, so one poisonous input cannot stop the watcher.
+    The output and archive directories may sit inside the drop folder (they
+    are skipped), but neither may be the drop folder itself.
+    """
+    def __init__(self, input_dir, output_dir, mode="auto", enhance_mode="scan", ext=None, options=None,
+                 resources=None, recursive=False, interval=1.0, settle=2.0, archive_dir=None,
+                 index_path=None, multi=False):
+        for name, directory in (("output", output_dir), ("archive", archive_dir)):
+            if directory and os.path.realpath(directory) == os.path.realpath(input_dir):
+                # Outputs would land next to (or overwrite) the inputs and be picked up again
+                raise ValueError(f"The {name} directory must differ from the watched directory")
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.mode = mode
+        self.enhance_mode = enhance_mode
+        self.ext = ext
+        self.options = options
+        self.resources = resources or ResourcePlan()
+        self.recursive = recursive
+        self.interval = interval
+        self.settle = settle
+        self.archive_dir = archive_dir
+        self.multi = multi
+        self.index = FileIndex(index_path or os.path.join(output_dir, INDEX_NAME))
+        self._known = self.index.load()
+        self._pending = {}   # name -> (size, mtime_ns, unchanged since)
+        self._in_flight = {}  # future -> (name, path, size, mtime_ns, hash)
+        self._pool = None
+        self._broken = False
+        self._crashes = {}  # name -> worker crashes while it was in flight
+        self._retry = []  # Jobs lost with a broken pool, retried before new files
+        # Directories inside the drop folder that are ours, never inputs
+        self._skip_dirs = {os.path.realpath(d) for d in (output_dir, archive_dir) if d}
+        self.processed = 0
+        self.failed = 0
+
+    def _walk(self):
+        """
+        Yields (name relative to input_dir, path, stat) of every candidate image.
+        """
+        stack = [self.input_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir():
+                        if self.recursive and os.path.realpath(entry.path) not in self._skip_dirs:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.name.lower().endswith(batch.IMAGE_EXTENSIONS):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # Removed between listing and stat
+                yield os.path.relpath(entry.path, self.input_dir), entry.path, st
+
+    def scan(self):
+        """
+        One poll. Returns [(name, path, size, mtime_ns)] of files that are new
+        or changed and have settled.
+        """
+        now = time.monotonic()
+        busy = {job[0] for job in self._in_flight.values()}
+        seen = set()
+        ready = []
+        for name, path, st in self._walk():
+            seen.add(name)
+            known = self._known.get(name)
+            if name in busy or (known and known[:2] == (st.st_size, st.st_mtime_ns)):
+                continue
+            stamp = (st.st_size, st.st_mtime_ns)
+            pending = self._pending.get(name)
+            if pending is None or pending[:2] != stamp:
+                self._pending[name] = stamp + (now,)  # New or still being written
+            elif st.st_size > 0 and now - pending[2] >= self.settle:
+                del self._pending[name]
+                ready.append((name, path) + stamp)
+        for name in list(self._pending):
+            if name not in seen:
+                del self._pending[name]  # Deleted or renamed before it settled
+        return ready
+
+    def _submit(self, name, path, size, mtime_ns):
+        try:
+            digest = file_hash(path)
+        except OSError as e:
+            logging.warning(f"Could not read {path}: {e}")
+            return
+        known = self._known.get(name)
+        if known and known[2] == digest:
+            # Same contents (touched, or dropped again): just note the new stat
+            self.index.touch(name, size, mtime_ns)
+            self._known[name] = (size, mtime_ns, digest)
+            self._archive(name, path)
+            return
+
+        output_path = batch.output_path_for(name, self.output_dir, self.ext)
+        if known is None and batch.is_up_to_date(path, output_path, self.multi):
+            self.index.record(name, size, mtime_ns, digest, "adopted", output=output_path)
+            self._known[name] = (size, mtime_ns, digest)
+            self._archive(name, path)
+            return
+
+        try:
+            future = self._pool.submit(batch._process_one, path, output_path, self.enhance_mode, self.multi)
+        except BrokenProcessPool:
+            self._broken = True  # Not indexed: the next scan finds the file again
+            return
+        self._in_flight[future] = (name, path, size, mtime_ns, digest)
+
+    def _collect(self, futures):
+        for future in futures:
+            name, path, size, mtime_ns, digest = self._in_flight.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                self._broken = True
+                self._crashes[name] = self._crashes.get(name, 0) + 1
+                if self._crashes[name] < MAX_CRASHES:
+                    logging.warning(f"{name}: worker process died, will retry")
+                    self._retry.append((name, path, size, mtime_ns))
+                    continue
+                result = batch._crashed(path, None, e)
+            self._crashes.pop(name, None)
+            result.pop("metrics", None)
+            status = "done" if result["status"] == "ok" else result["status"]
+            self.index.record(name, size, mtime_ns, digest, status, output=result.get("output"),
+                              error=result.get("error") or None, seconds=result.get("seconds"))
+            self._known[name] = (size, mtime_ns, digest)
+            if status == "done":
+                self.processed += 1
+                logging.info(f"{name} -> {result['output']} ({result['seconds']:.2f}s)")
+                self._archive(name, path)
+            else:
+                self.failed += 1
+                logging.warning(f"{name} {status}: {result['error']}")
+
+    def _archive(self, name, path):
+        if not self.archive_dir:
+            return
+        target = os.path.join(self.archive_dir, name)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)  # A rename unless the archive is on another volume
+        except OSError as e:
+            logging.warning(f"Could not archive {path}: {e}")
+
+    def _start_pool(self):
+        from .server import _warm_worker
+        plan = self.resources
+        self._pool = ProcessPoolExecutor(max_workers=plan.workers, initializer=batch._init_worker,
+                                         initargs=(self.mode, self.options, False, plan, plan.counter()))
+        for future in [self._pool.submit(_warm_worker) for _ in range(plan.workers)]:
+            future.result()
+        self._broken = False
+
+    def _restart_pool(self):
+        """
+        Replaces a broken pool. Every job of a broken pool has already failed,
+        so the in-flight files are collected (retried or recorded) first.
+        """
+        logging.warning("A worker process died; restarting the worker pool")
+        if self._in_flight:
+            self._collect(wait(self._in_flight).done)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._start_pool()
+
+    def start(self):
+        """
+        Starts and warms the worker pool.
+        """
+        self._start_pool()
+        logging.info(f"Watching {self.input_dir} -> {self.output_dir} "
+                     f"({self.resources.workers} warm worker(s), {len(self._known)} file(s) indexed)")
+
+    def poll(self, timeout=None):
+        """
+        Scans once, submits settled files and collects results finished within
+        timeout seconds. Returns the number of files waiting or in flight.
+        """
+        if self._retry:
+            # Crash victims run one at a time, alone, so a second crash is the file's own
+            if not self._in_flight:
+                self._submit(*self._retry.pop(0))
+        else:
+            for job in self.scan():
+                self._submit(*job)
+        if self._in_flight:
+            done, _ = wait(self._in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        elif timeout:
+            time.sleep(timeout)
+        if self._broken:
+            self._restart_pool()
+        return len(self._pending) + len(self._in_flight) + len(self._retry)
+
+    def run(self, stop=None, once=False):
+        """
+        Watches until stop (a threading.Event) is set or Ctrl+C. once=True
+        returns as soon as everything currently in the folder is done.
+        """
+        stop = stop or threading.Event()
+        self.start()
+        try:
+            while not stop.is_set():
+                busy = self.poll(timeout=self.interval)
+                if once and not busy:
+                    break
+        except KeyboardInterrupt:
+            logging.info("Watch interrupted")
+        finally:
+            self.close()
+
+    def close(self):
+        if self._pool is not None:
+            # Finish what is running, so outputs and index stay in step
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._collect([f for f in list(self._in_flight) if f.done() and not f.cancelled()])
+            self._pool = None
+        self.index.close()
+        logging.info(f"Watch stopped: {self.processed} processed, {self.failed} failed or rejected")